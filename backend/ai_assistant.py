@@ -0,0 +1,168 @@
+"""
+AI assistant providers
+Pluggable text-generation providers behind a bounded thread pool, with a
+per-call timeout and a circuit breaker so a slow or failing model never
+blocks the event loop or piles up requests.
+"""
+import abc
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+MAX_WORKERS = 4
+CALL_TIMEOUT_SECONDS = 30.0
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT_SECONDS = 60.0
+
+SYSTEM_CONTEXT = """You are an AI assistant helping field enumerators with data collection issues.
+Only answer questions related to:
+- Field data collection procedures
+- Survey questionnaire guidance
+- Technical issues with the app
+- Data entry best practices
+- Location/GPS troubleshooting
+
+If the question is not related to field data collection, politely decline to answer."""
+
+
+def build_prompt(question: str) -> str:
+    return f"{SYSTEM_CONTEXT}\n\nQuestion: {question}\n\nAnswer:"
+
+
+class AIUnavailable(Exception):
+    """No answer could be produced (breaker open, timeout or provider error)"""
+
+
+class AIProvider(abc.ABC):
+    """Blocking text generation; called from a worker thread"""
+    name = "base"
+
+    @abc.abstractmethod
+    def generate(self, prompt: str) -> str:
+        """Answer text for `prompt`"""
+
+
+class GeminiProvider(AIProvider):
+    name = "gemini"
+
+    def __init__(self, api_key: str, model_name: str = "gemini-1.5-flash"):
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model_name)
+
+    def generate(self, prompt: str) -> str:
+        return self.model.generate_content(prompt).text
+
+
+class StubProvider(AIProvider):
+    """Local provider for development and tests: canned answer, optional delay"""
+    name = "stub"
+
+    def __init__(self, answer: str = "This is a stub answer.", delay: float = 0.0):
+        self.answer = answer
+        self.delay = delay
+
+    def generate(self, prompt: str) -> str:
+        if self.delay:
+            time.sleep(self.delay)
+        return self.answer
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls for
+    `reset_timeout` seconds; then lets a single trial call through (half-open).
+    """
+
+    def __init__(self, failure_threshold: int = FAILURE_THRESHOLD, reset_timeout: float = RESET_TIMEOUT_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_running:
+            self._trial_running = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_running = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class AIAnswerService:
+    def __init__(
+        self,
+        provider: Optional[AIProvider],
+        max_workers: int = MAX_WORKERS,
+        timeout: float = CALL_TIMEOUT_SECONDS,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.provider = provider
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ai")
+        # Calls beyond the pool size wait here instead of queueing inside the executor
+        self._slots = asyncio.Semaphore(max_workers)
+
+    @property
+    def available(self) -> bool:
+        return self.provider is not None
+
+    async def answer(self, question: str) -> str:
+        if self.provider is None:
+            raise AIUnavailable("No AI provider configured")
+        if not self.breaker.allow():
+            raise AIUnavailable("AI provider temporarily disabled after repeated failures")
+
+        loop = asyncio.get_running_loop()
+        try:
+            # The timeout also covers waiting for a free slot
+            async with asyncio.timeout(self.timeout):
+                await self._slots.acquire()
+                try:
+                    future = self._executor.submit(self.provider.generate, build_prompt(question))
+                except BaseException:
+                    self._slots.release()
+                    raise
+                # A timed-out call keeps its worker thread busy until generate() returns, so the
+                # slot is freed when the thread finishes, not when this await is cancelled
+                future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._slots.release))
+                text = await asyncio.wrap_future(future)
+        except TimeoutError:
+            self.breaker.record_failure()
+            raise AIUnavailable(f"AI provider timed out after {self.timeout:g}s")
+        except Exception as e:
+            self.breaker.record_failure()
+            logger.error(f"AI provider {self.provider.name} error: {e}")
+            raise AIUnavailable(str(e))
+
+        self.breaker.record_success()
+        return text
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,206 @@
+"""
+AI answer cache
+Near-duplicate question cache: questions are canonicalised, shingled into
+character n-grams and indexed with MinHash + LSH banding so rephrasings of
+an already answered question reuse its answer. A near-duplicate only counts
+when it has the same negation and modals ("boleh" never answers "tidak
+boleh"), which shingle overlap alone cannot tell. Entries expire after a TTL
+and the least recently used are evicted past a size limit. Persistence is
+left to the caller (see `entry_to_doc` / `load`).
+"""
+import zlib
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+
+from text_normalize import MODALS, NEGATIONS, canonicalize
+
+NUM_PERM = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+MIN_SHARED_BANDS = 2
+SHINGLE_SIZE = 4
+SIMILARITY_THRESHOLD = 0.8
+MAX_ENTRIES = 5000
+TTL = timedelta(days=7)
+# Bumped when canonical keys change; persisted entries of another version are not loaded
+KEY_VERSION = 2
+
+_PRIME = (1 << 61) - 1
+# Fixed seed: signatures are persisted, so the permutations must not change between runs
+_rng = np.random.default_rng(20240601)
+# Coefficients below 2^32 keep (a * x + b) for 32-bit x inside uint64
+_A = _rng.integers(1, 1 << 32, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, 1 << 32, NUM_PERM, dtype=np.uint64)
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> List[int]:
+    padded = f" {text} "
+    if len(padded) <= size:
+        return [zlib.crc32(padded.encode("utf-8"))]
+    return list({zlib.crc32(padded[i:i + size].encode("utf-8")) for i in range(len(padded) - size + 1)})
+
+
+def minhash(text: str) -> np.ndarray:
+    """MinHash signature (NUM_PERM uint64 values) of a canonical text"""
+    x = np.asarray(shingles(text), dtype=np.uint64)
+    hashed = (_A[:, None] * x[None, :] + _B[:, None]) % _PRIME
+    return hashed.min(axis=1)
+
+
+def similarity(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the underlying shingle sets"""
+    return float(np.count_nonzero(sig_a == sig_b)) / len(sig_a)
+
+
+def qualifiers(key: str) -> Tuple[bool, FrozenSet[str]]:
+    """Whether a canonical question is negated, and its modals"""
+    tokens = set(key.split())
+    return bool(tokens & NEGATIONS), frozenset(tokens & MODALS)
+
+
+def _band_keys(signature: np.ndarray) -> List[Tuple[int, bytes]]:
+    return [
+        (band, signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND].tobytes())
+        for band in range(BANDS)
+    ]
+
+
+class AnswerCache:
+    def __init__(self, max_entries: int = MAX_ENTRIES, ttl: timedelta = TTL,
+                 threshold: float = SIMILARITY_THRESHOLD):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        # canonical question -> entry, least recently used first
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._buckets: Dict[Tuple[int, bytes], set] = {}
+        self.lookups = 0
+        self.hits = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _index(self, key: str, signature: np.ndarray):
+        for band_key in _band_keys(signature):
+            self._buckets.setdefault(band_key, set()).add(key)
+
+    def remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for band_key in _band_keys(entry["signature"]):
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def _expired(self, entry: Dict[str, Any], now: datetime) -> bool:
+        return now - entry["created_at"] > self.ttl
+
+    def lookup(self, question: str) -> Optional[Dict[str, Any]]:
+        """Cached entry for the question or a near-duplicate of it"""
+        self.lookups += 1
+        key = canonicalize(question)
+        if not key:
+            return None
+        now = datetime.utcnow()
+
+        entry = self._entries.get(key)
+        if entry is None:
+            signature = minhash(key)
+            collisions = Counter()
+            for band_key in _band_keys(signature):
+                collisions.update(self._buckets.get(band_key, ()))
+            # A pair at the threshold similarity shares several bands; one shared band is mostly noise
+            wanted = qualifiers(key)
+            candidates = [k for k, n in collisions.items() if n >= MIN_SHARED_BANDS and qualifiers(k) == wanted]
+            if candidates:
+                matrix = np.stack([self._entries[k]["signature"] for k in candidates])
+                scores = np.count_nonzero(matrix == signature[None, :], axis=1) / NUM_PERM
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    entry = self._entries[candidates[best]]
+
+        if entry is None:
+            return None
+        if self._expired(entry, now):
+            self.remove(entry["key"])
+            return None
+
+        self._entries.move_to_end(entry["key"])
+        entry["last_used_at"] = now
+        entry["hits"] += 1
+        self.hits += 1
+        return entry
+
+    def put(self, question: str, response: str) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+        """Store an answer; returns the entry (None if the text is empty) and the evicted keys"""
+        key = canonicalize(question)
+        if not key:
+            return None, []
+        now = datetime.utcnow()
+        self.remove(key)
+        entry = {
+            "key": key,
+            "response": response,
+            "signature": minhash(key),
+            "created_at": now,
+            "last_used_at": now,
+            "hits": 0,
+        }
+        self._entries[key] = entry
+        self._index(key, entry["signature"])
+
+        evicted = []
+        while len(self._entries) > self.max_entries:
+            old_key = next(iter(self._entries))
+            self.remove(old_key)
+            evicted.append(old_key)
+        return entry, evicted
+
+    def load(self, docs: List[Dict[str, Any]]):
+        """Restore entries from persisted docs, oldest use first"""
+        now = datetime.utcnow()
+        for doc in sorted(docs, key=lambda d: d["last_used_at"]):
+            if doc.get("key_version") != KEY_VERSION:
+                continue
+            entry = {
+                "key": doc["_id"],
+                "response": doc["response"],
+                "signature": np.asarray(doc["signature"], dtype=np.uint64),
+                "created_at": doc["created_at"],
+                "last_used_at": doc["last_used_at"],
+                "hits": doc.get("hits", 0),
+            }
+            if self._expired(entry, now):
+                continue
+            self.remove(entry["key"])
+            self._entries[entry["key"]] = entry
+            self._index(entry["key"], entry["signature"])
+        while len(self._entries) > self.max_entries:
+            self.remove(next(iter(self._entries)))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+        }
+
+
+def entry_to_doc(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Mongo document for an entry; signature values are below 2^61 so fit int64"""
+    return {
+        "_id": entry["key"],
+        "response": entry["response"],
+        "signature": entry["signature"].astype(np.int64).tolist(),
+        "created_at": entry["created_at"],
+        "last_used_at": entry["last_used_at"],
+        "hits": entry["hits"],
+        "key_version": KEY_VERSION,
+    }
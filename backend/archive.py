@@ -0,0 +1,178 @@
+"""
+Hot/cold archive
+Moves documents older than a cutoff from a hot collection into
+`<name>_archive` and serves newest-first pages that read the archive only
+when the requested range reaches past the archive boundary (the newest
+cutoff archived so far: every archived document is older than it).
+"""
+import json
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+
+BATCH_SIZE = 1000
+COUNT_CACHE_SIZE = 1000
+DUPLICATE_KEY = 11000
+
+
+def archive_name(name: str) -> str:
+    return f"{name}_archive"
+
+
+def with_range(query: Dict[str, Any], field: str, since: Optional[datetime], until: Optional[datetime]) -> Dict[str, Any]:
+    if since is None and until is None:
+        return query
+    bounds = {}
+    if since is not None:
+        bounds["$gte"] = since
+    if until is not None:
+        bounds["$lt"] = until
+    return {"$and": [query, {field: bounds}]}
+
+
+class Archiver:
+    def __init__(self, db, state_collection: str = "archive_state", time_field: str = "timestamp"):
+        self.db = db
+        self.state = state_collection
+        self.time_field = time_field
+        self.boundaries: Dict[str, datetime] = {}
+        # Archived documents only change when the archiver runs, so their counts are cached until then
+        self._counts: "OrderedDict[str, int]" = OrderedDict()
+
+    async def load(self):
+        async for state in self.db[self.state].find():
+            self.boundaries[state["_id"]] = state["archived_before"]
+
+    async def archive(
+        self,
+        name: str,
+        cutoff: datetime,
+        keep: Optional[Dict[str, Any]] = None,
+        batch_size: int = BATCH_SIZE,
+        on_batch: Optional[Callable[[List[Dict[str, Any]]], Awaitable[None]]] = None,
+    ) -> int:
+        """
+        Move documents older than `cutoff` (excluding those matching `keep`) to
+        the archive; returns how many moved. `on_batch` gets each moved batch.
+        Safe to re-run after an interruption: documents already copied are
+        skipped on insert and then deleted.
+        """
+        # Publish the boundary first so reads during the run already fall through
+        state = await self.db[self.state].find_one_and_update(
+            {"_id": name},
+            {"$max": {"archived_before": cutoff}, "$set": {"last_run_at": datetime.utcnow()}},
+            upsert=True, return_document=ReturnDocument.AFTER
+        )
+        self.boundaries[name] = state["archived_before"]
+
+        query: Dict[str, Any] = {self.time_field: {"$lt": cutoff}}
+        if keep:
+            query = {"$and": [query, {"$nor": [keep]}]}
+        hot, cold = self.db[name], self.db[archive_name(name)]
+        moved = 0
+        while True:
+            docs = await hot.find(query).sort(self.time_field, 1).limit(batch_size).to_list(batch_size)
+            if not docs:
+                break
+            try:
+                await cold.insert_many(docs, ordered=False)
+            except BulkWriteError as e:
+                if any(err.get("code") != DUPLICATE_KEY for err in e.details.get("writeErrors", [])):
+                    raise
+            await hot.delete_many({"_id": {"$in": [doc["_id"] for doc in docs]}})
+            moved += len(docs)
+            self._forget_counts(name)
+            if on_batch:
+                await on_batch(docs)
+
+        await self.db[self.state].update_one({"_id": name}, {"$inc": {"moved": moved}})
+        return moved
+
+    def _needs_archive(self, name: str, hot: List[Dict[str, Any]], wanted: int, since: Optional[datetime]) -> bool:
+        boundary = self.boundaries.get(name)
+        if boundary is None or (since is not None and since >= boundary):
+            return False
+        # A full page whose oldest hot document is at or after the boundary cannot contain archived ones
+        return len(hot) < wanted or self._time(hot[-1]) < boundary
+
+    def _time(self, doc: Dict[str, Any]) -> datetime:
+        return doc.get(self.time_field) or datetime.min
+
+    async def find_page(
+        self,
+        name: str,
+        query: Dict[str, Any],
+        limit: int,
+        offset: int = 0,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> List[Dict[str, Any]]:
+        """Newest-first page over the hot collection and, when needed, its archive"""
+        query = with_range(query, self.time_field, since, until)
+        wanted = offset + limit
+        hot = await self.db[name].find(query).sort(self.time_field, -1).limit(wanted).to_list(wanted)
+        if not self._needs_archive(name, hot, wanted, since):
+            return hot[offset:]
+
+        cold = await self.db[archive_name(name)].find(query).sort(self.time_field, -1).limit(wanted).to_list(wanted)
+        # A document can sit in both tiers while a batch is being moved
+        seen = {doc["_id"] for doc in hot}
+        merged = hot + [doc for doc in cold if doc["_id"] not in seen]
+        merged.sort(key=self._time, reverse=True)
+        return merged[offset:wanted]
+
+    async def find_one(
+        self, name: str, query: Dict[str, Any], projection: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """A document from the hot collection, else from the archive once it has run"""
+        doc = await self.db[name].find_one(query, projection)
+        if doc is None and name in self.boundaries:
+            doc = await self.db[archive_name(name)].find_one(query, projection)
+        return doc
+
+    async def find_ids(self, name: str, ids: List[Any], query: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Documents by `_id` from both tiers (newest first); the archive is read only for ids not found hot"""
+        query = {"$and": [query or {}, {"_id": {"$in": ids}}]}
+        docs = await self.db[name].find(query).to_list(None)
+        if name in self.boundaries and len(docs) < len(ids):
+            found = {doc["_id"] for doc in docs}
+            missing = [i for i in ids if i not in found]
+            docs += await self.db[archive_name(name)].find(
+                {"$and": [query, {"_id": {"$in": missing}}]}
+            ).to_list(None)
+        docs.sort(key=self._time, reverse=True)
+        return docs
+
+    async def count(
+        self,
+        name: str,
+        query: Dict[str, Any],
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ) -> int:
+        query = with_range(query, self.time_field, since, until)
+        total = await self.db[name].count_documents(query)
+        boundary = self.boundaries.get(name)
+        if boundary is None or (since is not None and since >= boundary):
+            return total
+
+        key = name + json.dumps(query, sort_keys=True, default=str)
+        archived = self._counts.get(key)
+        if archived is None:
+            archived = await self.db[archive_name(name)].count_documents(query)
+            self._counts[key] = archived
+            while len(self._counts) > COUNT_CACHE_SIZE:
+                self._counts.popitem(last=False)
+        else:
+            self._counts.move_to_end(key)
+        return total + archived
+
+    def _forget_counts(self, name: str):
+        for key in [k for k in self._counts if k.startswith(name + "{")]:
+            del self._counts[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: {"archived_before": boundary} for name, boundary in self.boundaries.items()}
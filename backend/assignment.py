@@ -0,0 +1,191 @@
+"""
+Respondent auto-assignment
+Capacity-constrained balanced k-means over respondent coordinates, with
+clusters matched to enumerators by their last known position.
+"""
+import math
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+MAX_ITERATIONS = 25
+
+
+def project(lats: np.ndarray, lons: np.ndarray, ref_lat: float) -> np.ndarray:
+    """Equirectangular projection to km; accurate enough at survey-area scale"""
+    scale = math.radians(1) * EARTH_RADIUS_KM
+    return np.column_stack([
+        lons * scale * math.cos(math.radians(ref_lat)),
+        lats * scale,
+    ])
+
+
+def unproject(xy: np.ndarray, ref_lat: float) -> np.ndarray:
+    """Inverse of project(); returns (lat, lon) rows"""
+    scale = math.radians(1) * EARTH_RADIUS_KM
+    return np.column_stack([
+        xy[:, 1] / scale,
+        xy[:, 0] / (scale * math.cos(math.radians(ref_lat))),
+    ])
+
+
+def _sq_distances(points: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    """(n, k) squared euclidean distances without materialising n*k*2 diffs"""
+    p2 = np.einsum("ij,ij->i", points, points)[:, None]
+    c2 = np.einsum("ij,ij->i", centers, centers)[None, :]
+    return np.maximum(p2 + c2 - 2.0 * points @ centers.T, 0.0)
+
+
+def kmeans_pp_init(points: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    centers = np.empty((k, 2))
+    centers[0] = points[rng.integers(len(points))]
+    closest = _sq_distances(points, centers[:1])[:, 0]
+    for i in range(1, k):
+        total = closest.sum()
+        if total == 0:
+            centers[i] = points[rng.integers(len(points))]
+        else:
+            centers[i] = points[rng.choice(len(points), p=closest / total)]
+        closest = np.minimum(closest, _sq_distances(points, centers[i:i + 1])[:, 0])
+    return centers
+
+
+def capacitated_assign(sq_dist: np.ndarray, capacities: np.ndarray) -> np.ndarray:
+    """
+    Assign every point to a cluster without exceeding capacities.
+
+    Runs vectorized proposal rounds: each pending point proposes to its
+    nearest cluster that still has room, and every cluster accepts its
+    closest proposers up to its remaining capacity. Rejected points only
+    happen when a cluster fills up, so there are at most k rounds.
+    """
+    n, k = sq_dist.shape
+    labels = np.full(n, -1, dtype=np.int64)
+    remaining = capacities.astype(np.int64).copy()
+    pending = np.arange(n)
+
+    while len(pending):
+        d = np.where(remaining[None, :] > 0, sq_dist[pending], np.inf)
+        choice = np.argmin(d, axis=1)
+        best = d[np.arange(len(pending)), choice]
+
+        order = np.lexsort((best, choice))
+        pending, choice = pending[order], choice[order]
+        rank = np.arange(len(choice)) - np.searchsorted(choice, choice, side="left")
+        accept = rank < remaining[choice]
+
+        labels[pending[accept]] = choice[accept]
+        remaining -= np.bincount(choice[accept], minlength=k)
+        pending = pending[~accept]
+    return labels
+
+
+def balanced_kmeans(points: np.ndarray, k: int, capacity: int, max_iter: int = MAX_ITERATIONS, seed: int = 0):
+    """Lloyd iterations with a capacity-constrained assignment step"""
+    if capacity * k < len(points):
+        raise ValueError("Total enumerator capacity is smaller than the number of respondents")
+    capacities = np.full(k, capacity, dtype=np.int64)
+
+    rng = np.random.default_rng(seed)
+    centers = kmeans_pp_init(points, k, rng)
+    labels = None
+
+    for _ in range(max_iter):
+        new_labels = capacitated_assign(_sq_distances(points, centers), capacities)
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+
+        counts = np.bincount(labels, minlength=k)
+        sums = np.column_stack([
+            np.bincount(labels, weights=points[:, 0], minlength=k),
+            np.bincount(labels, weights=points[:, 1], minlength=k),
+        ])
+        filled = counts > 0
+        centers[filled] = sums[filled] / counts[filled, None]
+
+    return labels, centers
+
+
+def match_clusters(centers: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    """
+    Pair each cluster with a distinct enumerator, nearest pairs first.
+    Needs len(centers) <= len(positions). Position rows may be NaN for
+    enumerators with no known location; they take the clusters left over.
+    Returns the enumerator index for each cluster.
+    """
+    kc = len(centers)
+    known_idx = np.flatnonzero(~np.isnan(positions).any(axis=1))
+    match = np.full(kc, -1, dtype=np.int64)
+    taken = np.zeros(len(positions), dtype=bool)
+
+    if len(known_idx):
+        d = _sq_distances(centers, positions[known_idx])
+        for flat in np.argsort(d, axis=None):
+            c, j = divmod(int(flat), len(known_idx))
+            e = known_idx[j]
+            if match[c] < 0 and not taken[e]:
+                match[c] = e
+                taken[e] = True
+
+    free = iter(np.flatnonzero(~taken))
+    for c in np.flatnonzero(match < 0):
+        match[c] = next(free)
+    return match
+
+
+def propose(
+    lats: Sequence[float],
+    lons: Sequence[float],
+    enumerator_positions: Sequence[Optional[Sequence[float]]],
+    capacity: Optional[int] = None,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    Cluster respondents into one group per enumerator.
+
+    enumerator_positions holds (lat, lon) or None per enumerator; capacity is
+    the maximum number of respondents per enumerator (default: an even split).
+    Returns "enumerator_index" per respondent plus per-cluster summaries.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    k = len(enumerator_positions)
+    if k == 0:
+        raise ValueError("No enumerators to assign")
+    if len(lats) == 0:
+        return {"enumerator_index": np.empty(0, dtype=np.int64), "clusters": [], "total_distance_km": 0.0}
+
+    ref_lat = float(lats.mean())
+    points = project(lats, lons, ref_lat)
+    positions = np.array([
+        project(np.array([p[0]]), np.array([p[1]]), ref_lat)[0] if p else [np.nan, np.nan]
+        for p in enumerator_positions
+    ], dtype=np.float64).reshape(k, 2)
+
+    if len(points) <= k:
+        # No more respondents than enumerators: one respondent per cluster
+        labels = np.arange(len(points))
+        centers = points.copy()
+    else:
+        labels, centers = balanced_kmeans(points, k, capacity or math.ceil(len(points) / k), seed=seed)
+
+    cluster_to_enum = match_clusters(centers, positions)
+    dist = np.sqrt(((points - centers[labels]) ** 2).sum(axis=1))
+    center_latlon = unproject(centers, ref_lat)
+
+    counts = np.bincount(labels, minlength=len(centers))
+    dist_sums = np.bincount(labels, weights=dist, minlength=len(centers))
+    clusters = [{
+        "enumerator_index": int(cluster_to_enum[c]),
+        "count": int(counts[c]),
+        "center": {"latitude": float(center_latlon[c, 0]), "longitude": float(center_latlon[c, 1])},
+        "mean_distance_km": float(dist_sums[c] / counts[c]) if counts[c] else 0.0,
+    } for c in range(len(centers))]
+
+    return {
+        "enumerator_index": cluster_to_enum[labels],
+        "clusters": clusters,
+        "total_distance_km": float(dist.sum()),
+    }
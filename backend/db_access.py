@@ -10,6 +10,8 @@ import json
 from datetime import datetime
 import os
 
+import survey_parquet
+
 # Connect to MongoDB
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
 DB_NAME = os.getenv("DB_NAME", "field_tracker_db")
@@ -204,6 +206,21 @@ def export_collection_to_json(collection_name, output_file):
     
     print(f"\n✓ Exported {len(data)} documents from '{collection_name}' to '{output_file}'")
 
+def export_survey_data_to_parquet(output_dir, survey_id=None):
+    """Export respondents with survey_data as partitioned Parquet (one column per answer)"""
+    try:
+        results = survey_parquet.export_surveys(
+            db.respondents, output_dir, [survey_id] if survey_id else None
+        )
+    except survey_parquet.ParquetExportError as e:
+        print(f"\n❌ {e}")
+        return
+    
+    for result in results:
+        print(f"\n✓ Survey {result['survey_id']}: {result['rows']} respondents, "
+              f"{result['columns']} columns, {result['partitions']} region partitions")
+    print(f"\n✓ Parquet dataset written to '{output_dir}' (partitioned by survey_id/region_code)")
+
 def search_user(email=None, username=None, role=None):
     """Search for users"""
     query = {}
@@ -236,6 +253,7 @@ def interactive_menu():
         print("  7. Get Statistics")
         print("  8. Search User")
         print("  9. Export Collection")
+        print("  10. Export Survey Data (Parquet)")
         print("  0. Exit")
         print("\n" + "="*50)
         
@@ -271,6 +289,10 @@ def interactive_menu():
             collection = input("Enter collection name: ").strip()
             filename = input("Enter output filename: ").strip()
             export_collection_to_json(collection, filename)
+        elif choice == '10':
+            survey_id = input("Enter survey ID (or press Enter for all): ").strip()
+            output_dir = input("Enter output directory (default survey_data_parquet): ").strip()
+            export_survey_data_to_parquet(output_dir or "survey_data_parquet", survey_id or None)
         elif choice == '0':
             print("\n✓ Goodbye!\n")
             break
@@ -299,10 +321,16 @@ if __name__ == "__main__":
             show_messages()
         elif command == "collections":
             show_collections()
+        elif command == "parquet":
+            # python db_access.py parquet [output_dir] [survey_id]
+            export_survey_data_to_parquet(
+                sys.argv[2] if len(sys.argv) > 2 else "survey_data_parquet",
+                sys.argv[3] if len(sys.argv) > 3 else None
+            )
         else:
             print(f"Unknown command: {command}")
             print("\nAvailable commands:")
-            print("  stats, users, surveys, respondents, locations, messages, collections")
+            print("  stats, users, surveys, respondents, locations, messages, collections, parquet")
     else:
         # Interactive mode
         interactive_menu()
@@ -1,23 +1,49 @@
 """
 Database Web Viewer
-Simple web interface to view MongoDB data
+Simple web interface to view MongoDB data.
+Tables are paged on the server with keyset cursors (sort value + _id), so
+large collections are browsed one page at a time.
 """
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from pymongo import MongoClient
-from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from bson import ObjectId, Regex, Timestamp, json_util
+from bson.decimal128 import Decimal128
+from urllib.parse import urlencode
+import base64
+import html as html_lib
 import os
+import re
 from datetime import datetime
 
+import export_stream
+
 app = FastAPI(title="Database Viewer")
 
 # MongoDB connection
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
 DB_NAME = os.getenv("DB_NAME", "field_tracker_db")
-client = MongoClient(MONGO_URL)
+client = AsyncIOMotorClient(MONGO_URL)
 db = client[DB_NAME]
 
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+# Filtered counts stop here ("10000+") so a broad filter never scans a whole collection
+COUNT_LIMIT = 10000
+FILTER_OPS = ("eq", "prefix", "gte", "lte")
+
+# Per collection: sortable fields (first = default, newest first) and filterable fields
+VIEWS = {
+    "users": {"sort": ["created_at", "username", "email", "role"], "filters": ["username", "email", "role", "is_active"]},
+    "surveys": {"sort": ["created_at", "title", "start_date", "end_date", "status"], "filters": ["title", "status"]},
+    "respondents": {"sort": ["created_at", "updated_at", "name", "status"],
+                    "filters": ["name", "status", "survey_id", "enumerator_id", "phone", "region_code"]},
+    "locations": {"sort": ["timestamp"], "filters": ["user_id", "timestamp"]},
+    "messages": {"sort": ["timestamp"], "filters": ["message_type", "sender_id", "receiver_id", "answered", "timestamp"]},
+    "faqs": {"sort": ["created_at", "question", "category"], "filters": ["category", "question"]},
+}
+
 def serialize_doc(doc):
     """Convert MongoDB document to JSON serializable format"""
     if isinstance(doc, dict):
@@ -31,6 +57,228 @@ def serialize_doc(doc):
     else:
         return doc
 
+# MongoDB sorts mixed-type values by type bracket first (null and missing together
+# first), then by value; a range operator only ever matches within one bracket
+TYPE_BRACKETS = [
+    ["null"],
+    ["int", "long", "double", "decimal"],
+    ["string", "symbol"],
+    ["object"],
+    ["array"],
+    ["binData"],
+    ["objectId"],
+    ["bool"],
+    ["date"],
+    ["timestamp"],
+    ["regex"],
+]
+
+def type_bracket(value):
+    """Index into TYPE_BRACKETS for a decoded cursor value"""
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return 7
+    if isinstance(value, (int, float, Decimal128)):
+        return 1
+    if isinstance(value, dict):
+        return 3
+    if isinstance(value, list):
+        return 4
+    if isinstance(value, bytes):
+        return 5
+    if isinstance(value, ObjectId):
+        return 6
+    if isinstance(value, datetime):
+        return 8
+    if isinstance(value, Timestamp):
+        return 9
+    if isinstance(value, (Regex, re.Pattern)):
+        return 10
+    return 2
+
+def keyset_filter(sort, value, doc_id, op):
+    """
+    Rows after (value, _id) in (sort, _id) order, `op` being $gt (ascending)
+    or $lt (descending). Besides the usual same-value/_id tie-break this also
+    takes the rows whose sort value is null, missing or of another type on the
+    far side of the cursor, which a plain range on `sort` would skip.
+    """
+    rank = type_bracket(value)
+    if value is None:
+        clauses = [{sort: None, "_id": {op: doc_id}}]
+    else:
+        clauses = [{sort: {op: value}}, {sort: value, "_id": {op: doc_id}}]
+    beyond = range(rank + 1, len(TYPE_BRACKETS)) if op == "$gt" else range(1, rank)
+    types = [name for i in beyond for name in TYPE_BRACKETS[i]]
+    if types:
+        clauses.append({sort: {"$type": types}})
+    if op == "$lt" and rank > 0:
+        clauses.append({sort: None})
+    return {"$or": clauses}
+
+def encode_cursor(doc, field):
+    """Opaque keyset cursor: the row's sort value and _id"""
+    raw = json_util.dumps([doc.get(field), doc["_id"]])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    padded = cursor + "=" * (-len(cursor) % 4)
+    value, doc_id = json_util.loads(base64.urlsafe_b64decode(padded).decode())
+    return value, doc_id
+
+def filter_candidates(value):
+    """The raw string plus the typed values it could stand for (ids, numbers, booleans, dates)"""
+    candidates = [value]
+    if ObjectId.is_valid(value):
+        candidates.append(ObjectId(value))
+    if value.lower() in ("true", "false"):
+        candidates.append(value.lower() == "true")
+    for cast in (int, float, datetime.fromisoformat):
+        try:
+            candidates.append(cast(value))
+            break
+        except ValueError:
+            pass
+    return candidates
+
+def build_filter(field, op, value):
+    if not field or value in (None, ""):
+        return {}
+    if op == "prefix":
+        # Anchored prefix can use an index on the field
+        return {field: {"$regex": "^" + re.escape(value)}}
+    if op in ("gte", "lte"):
+        return {field: {f"${op}": filter_candidates(value)[-1]}}
+    return {field: {"$in": filter_candidates(value)}}
+
+def page_params(request: Request):
+    """Normalised paging/sorting/filter parameters for a view"""
+    collection = request.path_params["collection"]
+    config = VIEWS[collection]
+    query = request.query_params
+    sort = query.get("sort") if query.get("sort") in config["sort"] else config["sort"][0]
+    field = query.get("field") if query.get("field") in config["filters"] else ""
+    try:
+        limit = max(1, min(int(query.get("limit", PAGE_SIZE)), MAX_PAGE_SIZE))
+    except ValueError:
+        limit = PAGE_SIZE
+    return {
+        "sort": sort,
+        "dir": "asc" if query.get("dir") == "asc" else "desc",
+        "field": field,
+        "op": query.get("op") if query.get("op") in FILTER_OPS else "eq",
+        "value": query.get("value", "") if field else "",
+        "limit": limit,
+        "after": query.get("after"),
+        "before": query.get("before"),
+    }
+
+async def fetch_page(collection, params, projection=None):
+    """
+    One page in (sort, _id) order. `after` continues past a row, `before`
+    goes back (queried in reverse and flipped). Returns rows plus cursors.
+    """
+    sort, descending = params["sort"], params["dir"] == "desc"
+    query = build_filter(params["field"], params["op"], params["value"])
+
+    cursor, backwards = params["after"], False
+    if params["before"]:
+        cursor, backwards = params["before"], True
+    forward_desc = descending != backwards
+    if cursor:
+        value, doc_id = decode_cursor(cursor)
+        keyset = keyset_filter(sort, value, doc_id, "$lt" if forward_desc else "$gt")
+        query = {"$and": [query, keyset]} if query else keyset
+
+    direction = -1 if forward_desc else 1
+    docs = await db[collection].find(query, projection).sort(
+        [(sort, direction), ("_id", direction)]
+    ).limit(params["limit"] + 1).to_list(params["limit"] + 1)
+    more = len(docs) > params["limit"]
+    docs = docs[:params["limit"]]
+    if backwards:
+        docs.reverse()
+
+    has_next = more if not backwards else True
+    has_prev = bool(cursor) if not backwards else more
+    return {
+        "docs": docs,
+        "next": encode_cursor(docs[-1], sort) if docs and has_next else None,
+        "prev": encode_cursor(docs[0], sort) if docs and has_prev else None,
+    }
+
+async def count_matching(collection, params):
+    query = build_filter(params["field"], params["op"], params["value"])
+    if not query:
+        return str(await db[collection].estimated_document_count())
+    count = await db[collection].count_documents(query, limit=COUNT_LIMIT + 1)
+    return f"{COUNT_LIMIT}+" if count > COUNT_LIMIT else str(count)
+
+def view_link(collection, params, **overrides):
+    """onclick handler that reloads the view with changed parameters"""
+    merged = {k: params[k] for k in ("sort", "dir", "field", "op", "value", "limit")}
+    merged.update(overrides)
+    query = urlencode({k: v for k, v in merged.items() if v not in (None, "")})
+    return f"loadPage('{collection}', '{query}')"
+
+def sort_header(collection, params, field, label):
+    if field not in VIEWS[collection]["sort"]:
+        return f"<th>{label}</th>"
+    arrow = ""
+    direction = "desc"
+    if params["sort"] == field:
+        arrow = " ▼" if params["dir"] == "desc" else " ▲"
+        direction = "asc" if params["dir"] == "desc" else "desc"
+    return f'<th style="cursor: pointer" onclick="{view_link(collection, params, sort=field, dir=direction)}">{label}{arrow}</th>'
+
+def export_link(collection, params, fmt, compress=False):
+    """Download URL exporting every document that matches the view's filter"""
+    query = {"format": fmt}
+    if compress:
+        query["gzip"] = "true"
+    view_filter = build_filter(params["field"], params["op"], params["value"])
+    if view_filter:
+        query["filter"] = json_util.dumps(view_filter)
+    return html_lib.escape(f"/api/export/{collection}?{urlencode(query)}")
+
+def toolbar_html(collection, params, total):
+    options = "".join(
+        f'<option value="{f}"{" selected" if f == params["field"] else ""}>{f}</option>'
+        for f in VIEWS[collection]["filters"]
+    )
+    ops = "".join(
+        f'<option value="{op}"{" selected" if op == params["op"] else ""}>{op}</option>'
+        for op in FILTER_OPS
+    )
+    return f"""
+    <div style="display: flex; gap: 10px; margin-bottom: 20px; flex-wrap: wrap; align-items: center;">
+        <select id="filterField" class="search-box" style="max-width: 180px;">{options}</select>
+        <select id="filterOp" class="search-box" style="max-width: 110px;">{ops}</select>
+        <input type="text" id="filterValue" class="search-box" placeholder="Filter value..."
+               value="{html_lib.escape(params["value"])}"
+               onkeyup="if (event.key === 'Enter') applyFilter('{collection}', '{params["sort"]}', '{params["dir"]}')">
+        <button class="export-btn" onclick="applyFilter('{collection}', '{params["sort"]}', '{params["dir"]}')">🔍 Filter</button>
+        <a class="export-btn" href="{export_link(collection, params, "ndjson", compress=True)}">📥 NDJSON (.gz)</a>
+        <a class="export-btn" href="{export_link(collection, params, "csv")}">📥 CSV</a>
+        <span style="color: #666;">{total} documents</span>
+    </div>
+    """
+
+def pager_html(collection, params, page):
+    buttons = [f'<button class="export-btn" onclick="{view_link(collection, params)}">⏮ First</button>']
+    if page["prev"]:
+        buttons.append(f'<button class="export-btn" onclick="{view_link(collection, params, before=page["prev"])}">◀ Prev</button>')
+    if page["next"]:
+        buttons.append(f'<button class="export-btn" onclick="{view_link(collection, params, after=page["next"])}">Next ▶</button>')
+    return f'<div style="display: flex; gap: 10px; margin-top: 20px;">{"".join(buttons)}</div>'
+
+@app.on_event("startup")
+async def create_keyset_indexes():
+    # The default sort of each view is indexed with _id so paging a large collection never sorts it in memory
+    for collection, config in VIEWS.items():
+        await db[collection].create_index([(config["sort"][0], 1), ("_id", 1)])
+
 @app.get("/", response_class=HTMLResponse)
 async def home():
     """Main page with database viewer"""
@@ -197,6 +445,7 @@ async def home():
             cursor: pointer;
             font-size: 16px;
             font-weight: 600;
+            text-decoration: none;
             margin-left: 10px;
             transition: background 0.3s;
         }
@@ -254,11 +503,15 @@ async def home():
             });
             event.target.classList.add('active');
             
-            // Load content
+            await loadPage(view, '');
+        }
+        
+        async function loadPage(view, params) {
+            // Load content (paging, sorting and filtering happen on the server)
             document.getElementById('content').innerHTML = '<div class="loading">Loading data</div>';
             
             try {
-                const response = await fetch('/api/view/' + view);
+                const response = await fetch('/api/view/' + view + (params ? '?' + params : ''));
                 const html = await response.text();
                 document.getElementById('content').innerHTML = html;
             } catch (error) {
@@ -267,45 +520,15 @@ async def home():
             }
         }
         
-        async function exportData(collection) {
-            try {
-                const response = await fetch('/api/export/' + collection);
-                const data = await response.json();
-                
-                const blob = new Blob([JSON.stringify(data, null, 2)], { type: 'application/json' });
-                const url = window.URL.createObjectURL(blob);
-                const a = document.createElement('a');
-                a.href = url;
-                a.download = collection + '_export_' + new Date().toISOString().split('T')[0] + '.json';
-                a.click();
-                window.URL.revokeObjectURL(url);
-            } catch (error) {
-                alert('Export failed: ' + error.message);
-            }
-        }
-        
-        function searchTable(inputId) {
-            const input = document.getElementById(inputId);
-            const filter = input.value.toUpperCase();
-            const table = input.parentElement.nextElementSibling.querySelector('table');
-            const tr = table.getElementsByTagName('tr');
-            
-            for (let i = 1; i < tr.length; i++) {
-                let display = false;
-                const td = tr[i].getElementsByTagName('td');
-                
-                for (let j = 0; j < td.length; j++) {
-                    if (td[j]) {
-                        const txtValue = td[j].textContent || td[j].innerText;
-                        if (txtValue.toUpperCase().indexOf(filter) > -1) {
-                            display = true;
-                            break;
-                        }
-                    }
-                }
-                
-                tr[i].style.display = display ? '' : 'none';
-            }
+        function applyFilter(view, sort, dir) {
+            const params = new URLSearchParams({
+                sort: sort,
+                dir: dir,
+                field: document.getElementById('filterField').value,
+                op: document.getElementById('filterOp').value,
+                value: document.getElementById('filterValue').value
+            });
+            loadPage(view, params.toString());
         }
         
         // Load initial view
@@ -317,44 +540,67 @@ async def home():
     return html
 
 @app.get("/api/view/{collection}")
-async def view_collection(collection: str):
-    """Get HTML view for a collection"""
+async def view_collection(collection: str, request: Request):
+    """Get HTML view for a collection (one page; see page_params for the query string)"""
     try:
         if collection == "stats":
             return await get_stats_view()
-        elif collection == "users":
-            return await get_users_view()
+        if collection not in VIEWS:
+            return HTMLResponse("<div class='error'>Collection not found</div>")
+        params = page_params(request)
+        page = await fetch_page(collection, params)
+        total = await count_matching(collection, params)
+        if collection == "users":
+            return await get_users_view(params, page, total)
         elif collection == "surveys":
-            return await get_surveys_view()
+            return await get_surveys_view(params, page, total)
         elif collection == "respondents":
-            return await get_respondents_view()
+            return await get_respondents_view(params, page, total)
         elif collection == "locations":
-            return await get_locations_view()
+            return await get_locations_view(params, page, total)
         elif collection == "messages":
-            return await get_messages_view()
+            return await get_messages_view(params, page, total)
         elif collection == "faqs":
-            return await get_faqs_view()
-        else:
-            return HTMLResponse("<div class='error'>Collection not found</div>")
+            return await get_faqs_view(params, page, total)
     except Exception as e:
-        return HTMLResponse(f"<div class='error'>Error: {str(e)}</div>")
+        return HTMLResponse(f"<div class='error'>Error: {html_lib.escape(str(e))}</div>")
+
+@app.get("/api/data/{collection}")
+async def collection_page(collection: str, request: Request):
+    """JSON page of a collection: same parameters as the HTML view, plus next/prev cursors"""
+    if collection not in VIEWS:
+        return JSONResponse({"error": "Invalid collection"}, status_code=400)
+    try:
+        params = page_params(request)
+        page = await fetch_page(collection, params, {"password": 0} if collection == "users" else None)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    return JSONResponse({
+        "items": [serialize_doc(doc) for doc in page["docs"]],
+        "next": page["next"],
+        "prev": page["prev"],
+        "sort": params["sort"],
+        "dir": params["dir"],
+        "limit": params["limit"]
+    })
 
 async def get_stats_view():
     """Statistics view"""
-    users_count = db.users.count_documents({})
-    surveys_count = db.surveys.count_documents({})
-    respondents_count = db.respondents.count_documents({})
-    locations_count = db.locations.count_documents({})
-    messages_count = db.messages.count_documents({})
-    faqs_count = db.faqs.count_documents({})
+    # Collection metadata counts: O(1) even on very large collections
+    users_count = await db.users.estimated_document_count()
+    surveys_count = await db.surveys.estimated_document_count()
+    respondents_count = await db.respondents.estimated_document_count()
+    locations_count = await db.locations.estimated_document_count()
+    messages_count = await db.messages.estimated_document_count()
+    faqs_count = await db.faqs.estimated_document_count()
     
     # Respondents by status
     resp_pipeline = [{"$group": {"_id": "$status", "count": {"$sum": 1}}}]
-    resp_stats = list(db.respondents.aggregate(resp_pipeline))
+    resp_stats = await db.respondents.aggregate(resp_pipeline).to_list(None)
     
     # Users by role
     user_pipeline = [{"$group": {"_id": "$role", "count": {"$sum": 1}}}]
-    user_stats = list(db.users.aggregate(user_pipeline))
+    user_stats = await db.users.aggregate(user_pipeline).to_list(None)
     
     html = f"""
     <div class="stats">
@@ -402,27 +648,21 @@ async def get_stats_view():
     """
     return HTMLResponse(html)
 
-async def get_users_view():
+async def get_users_view(params, page, total):
     """Users view"""
-    users = list(db.users.find().limit(100))
-    
-    html = """
-    <div style="display: flex; gap: 10px; margin-bottom: 20px;">
-        <input type="text" id="searchInput" class="search-box" placeholder="Search users..." onkeyup="searchTable('searchInput')">
-        <button class="export-btn" onclick="exportData('users')">📥 Export JSON</button>
-    </div>
+    html = toolbar_html("users", params, total) + f"""
     <div class="table-container">
         <table>
             <tr>
-                <th>Username</th>
-                <th>Email</th>
-                <th>Role</th>
+                {sort_header("users", params, "username", "Username")}
+                {sort_header("users", params, "email", "Email")}
+                {sort_header("users", params, "role", "Role")}
                 <th>Active</th>
-                <th>Created</th>
+                {sort_header("users", params, "created_at", "Created")}
             </tr>
     """
     
-    for user in users:
+    for user in page["docs"]:
         is_active = user.get('is_active', True)
         status_badge = '<span class="badge badge-success">Active</span>' if is_active else '<span class="badge badge-danger">Inactive</span>'
         created = user.get('created_at', 'N/A')
@@ -440,35 +680,29 @@ async def get_users_view():
     html += """
         </table>
     </div>
-    """
+    """ + pager_html("users", params, page)
     return HTMLResponse(html)
 
-async def get_surveys_view():
+async def get_surveys_view(params, page, total):
     """Surveys view"""
-    surveys = list(db.surveys.find().limit(100))
-    
-    html = """
-    <div style="display: flex; gap: 10px; margin-bottom: 20px;">
-        <input type="text" id="searchInput" class="search-box" placeholder="Search surveys..." onkeyup="searchTable('searchInput')">
-        <button class="export-btn" onclick="exportData('surveys')">📥 Export JSON</button>
-    </div>
+    html = toolbar_html("surveys", params, total) + f"""
     <div class="table-container">
         <table>
             <tr>
-                <th>Title</th>
+                {sort_header("surveys", params, "title", "Title")}
                 <th>Description</th>
-                <th>Status</th>
-                <th>Start Date</th>
-                <th>End Date</th>
+                {sort_header("surveys", params, "status", "Status")}
+                {sort_header("surveys", params, "start_date", "Start Date")}
+                {sort_header("surveys", params, "end_date", "End Date")}
                 <th>Target</th>
             </tr>
     """
     
-    for survey in surveys:
+    for survey in page["docs"]:
         html += f"""
             <tr>
                 <td><strong>{survey.get('title', 'N/A')}</strong></td>
-                <td>{survey.get('description', 'N/A')[:100]}...</td>
+                <td>{(survey.get('description') or 'N/A')[:100]}...</td>
                 <td><span class="badge badge-info">{survey.get('status', 'N/A')}</span></td>
                 <td>{survey.get('start_date', 'N/A')}</td>
                 <td>{survey.get('end_date', 'N/A')}</td>
@@ -479,35 +713,29 @@ async def get_surveys_view():
     html += """
         </table>
     </div>
-    """
+    """ + pager_html("surveys", params, page)
     return HTMLResponse(html)
 
-async def get_respondents_view():
+async def get_respondents_view(params, page, total):
     """Respondents view"""
-    respondents = list(db.respondents.find().limit(100))
-    
-    html = """
-    <div style="display: flex; gap: 10px; margin-bottom: 20px;">
-        <input type="text" id="searchInput" class="search-box" placeholder="Search respondents..." onkeyup="searchTable('searchInput')">
-        <button class="export-btn" onclick="exportData('respondents')">📥 Export JSON</button>
-    </div>
+    html = toolbar_html("respondents", params, total) + f"""
     <div class="table-container">
         <table>
             <tr>
-                <th>Name</th>
-                <th>Status</th>
+                {sort_header("respondents", params, "name", "Name")}
+                {sort_header("respondents", params, "status", "Status")}
                 <th>Survey ID</th>
                 <th>Location</th>
                 <th>Phone</th>
-                <th>Created</th>
+                {sort_header("respondents", params, "created_at", "Created")}
             </tr>
     """
     
-    for resp in respondents:
+    for resp in page["docs"]:
         status = resp.get('status', 'pending')
         badge_class = 'badge-success' if status == 'completed' else ('badge-warning' if status == 'in_progress' else 'badge-danger')
         
-        location = resp.get('location', {})
+        location = resp.get('location') or {}
         lat = location.get('latitude', 'N/A')
         lon = location.get('longitude', 'N/A')
         
@@ -525,17 +753,12 @@ async def get_respondents_view():
     html += """
         </table>
     </div>
-    """
+    """ + pager_html("respondents", params, page)
     return HTMLResponse(html)
 
-async def get_locations_view():
+async def get_locations_view(params, page, total):
     """Locations view"""
-    locations = list(db.locations.find().sort("timestamp", -1).limit(100))
-    
-    html = """
-    <div style="display: flex; gap: 10px; margin-bottom: 20px;">
-        <button class="export-btn" onclick="exportData('locations')">📥 Export JSON</button>
-    </div>
+    html = toolbar_html("locations", params, total) + f"""
     <div class="table-container">
         <table>
             <tr>
@@ -543,11 +766,11 @@ async def get_locations_view():
                 <th>Latitude</th>
                 <th>Longitude</th>
                 <th>Accuracy (m)</th>
-                <th>Timestamp</th>
+                {sort_header("locations", params, "timestamp", "Timestamp")}
             </tr>
     """
     
-    for loc in locations:
+    for loc in page["docs"]:
         html += f"""
             <tr>
                 <td>{str(loc.get('user_id', 'N/A'))[:12]}...</td>
@@ -561,17 +784,12 @@ async def get_locations_view():
     html += """
         </table>
     </div>
-    """
+    """ + pager_html("locations", params, page)
     return HTMLResponse(html)
 
-async def get_messages_view():
+async def get_messages_view(params, page, total):
     """Messages view"""
-    messages = list(db.messages.find().sort("timestamp", -1).limit(100))
-    
-    html = """
-    <div style="display: flex; gap: 10px; margin-bottom: 20px;">
-        <button class="export-btn" onclick="exportData('messages')">📥 Export JSON</button>
-    </div>
+    html = toolbar_html("messages", params, total) + f"""
     <div class="table-container">
         <table>
             <tr>
@@ -579,11 +797,11 @@ async def get_messages_view():
                 <th>Sender</th>
                 <th>Content</th>
                 <th>Answered</th>
-                <th>Timestamp</th>
+                {sort_header("messages", params, "timestamp", "Timestamp")}
             </tr>
     """
     
-    for msg in messages:
+    for msg in page["docs"]:
         msg_type = msg.get('message_type', 'N/A')
         answered = msg.get('answered', False)
         badge = '<span class="badge badge-success">Yes</span>' if answered else '<span class="badge badge-warning">No</span>'
@@ -592,7 +810,7 @@ async def get_messages_view():
             <tr>
                 <td><span class="badge badge-info">{msg_type}</span></td>
                 <td>{str(msg.get('sender_id', 'N/A'))[:12]}...</td>
-                <td>{msg.get('content', 'N/A')[:100]}...</td>
+                <td>{(msg.get('content') or 'N/A')[:100]}...</td>
                 <td>{badge}</td>
                 <td>{msg.get('timestamp', 'N/A')}</td>
             </tr>
@@ -601,31 +819,26 @@ async def get_messages_view():
     html += """
         </table>
     </div>
-    """
+    """ + pager_html("messages", params, page)
     return HTMLResponse(html)
 
-async def get_faqs_view():
+async def get_faqs_view(params, page, total):
     """FAQs view"""
-    faqs = list(db.faqs.find())
-    
-    html = """
-    <div style="display: flex; gap: 10px; margin-bottom: 20px;">
-        <button class="export-btn" onclick="exportData('faqs')">📥 Export JSON</button>
-    </div>
+    html = toolbar_html("faqs", params, total) + f"""
     <div class="table-container">
         <table>
             <tr>
-                <th>Question</th>
+                {sort_header("faqs", params, "question", "Question")}
                 <th>Answer</th>
-                <th>Category</th>
+                {sort_header("faqs", params, "category", "Category")}
             </tr>
     """
     
-    for faq in faqs:
+    for faq in page["docs"]:
         html += f"""
             <tr>
                 <td><strong>{faq.get('question', 'N/A')}</strong></td>
-                <td>{faq.get('answer', 'N/A')[:150]}...</td>
+                <td>{(faq.get('answer') or 'N/A')[:150]}...</td>
                 <td><span class="badge badge-info">{faq.get('category', 'N/A')}</span></td>
             </tr>
         """
@@ -633,22 +846,24 @@ async def get_faqs_view():
     html += """
         </table>
     </div>
-    """
+    """ + pager_html("faqs", params, page)
     return HTMLResponse(html)
 
 @app.get("/api/export/{collection}")
-async def export_collection(collection: str):
-    """Export collection as JSON"""
+async def export_collection(collection: str, format: str = "ndjson", gzip: bool = False, filter: str = None):
+    """Stream a whole collection as NDJSON, JSON or flattened CSV (optionally gzipped), filtered by ?filter="""
+    if collection not in VIEWS:
+        return JSONResponse({"error": "Invalid collection"}, status_code=400)
+    if format not in export_stream.FORMATS:
+        return JSONResponse({"error": "Invalid format"}, status_code=400)
     try:
-        if collection not in ["users", "surveys", "respondents", "locations", "messages", "faqs"]:
-            return JSONResponse({"error": "Invalid collection"}, status_code=400)
-        
-        data = list(db[collection].find().limit(1000))
-        serialized_data = [serialize_doc(doc) for doc in data]
-        
-        return JSONResponse(serialized_data)
-    except Exception as e:
-        return JSONResponse({"error": str(e)}, status_code=500)
+        query = export_stream.parse_filter(filter)
+    except export_stream.ExportError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    chunks = export_stream.export(db[collection], query, format, gzip, exclude=("password",))
+    headers = {"Content-Disposition": f'attachment; filename="{export_stream.filename(collection, format, gzip)}"'}
+    return StreamingResponse(chunks, media_type=export_stream.media_type(format, gzip), headers=headers)
 
 if __name__ == "__main__":
     import uvicorn
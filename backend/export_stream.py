@@ -0,0 +1,184 @@
+"""
+Streaming collection export
+Writes a Mongo cursor out as NDJSON, a JSON array or flattened CSV, optionally
+gzip-compressed on the fly, as an async iterator of byte chunks (for
+StreamingResponse). Documents are read in cursor batches and output is
+flushed in fixed-size chunks, so memory stays flat whatever the collection
+size; CSV only additionally keeps its column names.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+
+from bson import ObjectId, json_util
+from bson.decimal128 import Decimal128
+
+BATCH_SIZE = 1000
+CHUNK_SIZE = 64 * 1024
+FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "json": ("application/json", "json"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+}
+# Server-side JavaScript has no place in an export filter
+FORBIDDEN_OPERATORS = {"$where", "$function", "$accumulator"}
+
+
+class ExportError(ValueError):
+    """Invalid export request (unknown format, malformed filter, ...)"""
+
+
+def parse_filter(text: Optional[str]) -> Dict[str, Any]:
+    """Mongo filter from a JSON / Extended JSON string (e.g. {"survey_id": "..."} or {"_id": {"$oid": "..."}})"""
+    if not text:
+        return {}
+    try:
+        query = json_util.loads(text)
+    except (ValueError, TypeError) as e:
+        raise ExportError(f"Invalid filter: {e}")
+    if not isinstance(query, dict):
+        raise ExportError("Filter must be a JSON object")
+    _check_operators(query)
+    return query
+
+
+def _check_operators(value: Any):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key in FORBIDDEN_OPERATORS:
+                raise ExportError(f"Operator {key} is not allowed in export filters")
+            _check_operators(item)
+    elif isinstance(value, list):
+        for item in value:
+            _check_operators(item)
+
+
+def filename(collection: str, fmt: str, compress: bool) -> str:
+    name = f"{collection}_export_{datetime.utcnow():%Y-%m-%d}.{FORMATS[fmt][1]}"
+    return name + ".gz" if compress else name
+
+
+def media_type(fmt: str, compress: bool) -> str:
+    return "application/gzip" if compress else FORMATS[fmt][0]
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal128):
+        return str(value.to_decimal())
+    if isinstance(value, bytes):
+        return value.hex()
+    return str(value)
+
+
+def to_json(doc: Dict[str, Any]) -> str:
+    return json.dumps(doc, default=_default, ensure_ascii=False)
+
+
+def flatten(doc: Dict[str, Any], prefix: str = "") -> Dict[str, Any]:
+    """Nested objects become dotted columns ("location.latitude"); lists stay one JSON-encoded cell"""
+    flat: Dict[str, Any] = {}
+    for key, value in doc.items():
+        column = f"{prefix}{key}"
+        if isinstance(value, dict) and value:
+            flat.update(flatten(value, column + "."))
+        else:
+            flat[column] = value
+    return flat
+
+
+def csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float, str)):
+        return value
+    if isinstance(value, (list, dict)):
+        return to_json(value)
+    return _default(value)
+
+
+async def csv_columns(cursor) -> List[str]:
+    """Union of flattened columns over a cursor, in first-seen order with _id first"""
+    columns: Dict[str, None] = {"_id": None}
+    async for doc in cursor:
+        for column in flatten(doc):
+            columns.setdefault(column, None)
+    return list(columns)
+
+
+async def _without(cursor, exclude: Iterable[str]) -> AsyncIterator[Dict[str, Any]]:
+    """Documents of a cursor minus the excluded top-level fields"""
+    async for doc in cursor:
+        for field in exclude:
+            doc.pop(field, None)
+        yield doc
+
+
+async def encode(cursor, fmt: str, columns: Optional[List[str]] = None,
+                 exclude: Iterable[str] = ()) -> AsyncIterator[bytes]:
+    """Uncompressed output in chunks of about CHUNK_SIZE bytes"""
+    if fmt not in FORMATS:
+        raise ExportError(f"Unknown export format: {fmt}")
+    buffer = io.StringIO()
+    writer = None
+    if fmt == "csv":
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+    elif fmt == "json":
+        buffer.write("[")
+
+    first = True
+    async for doc in _without(cursor, exclude):
+        if fmt == "csv":
+            flat = flatten(doc)
+            writer.writerow([csv_value(flat.get(column)) for column in columns])
+        elif fmt == "json":
+            buffer.write(to_json(doc) if first else "," + to_json(doc))
+        else:
+            buffer.write(to_json(doc) + "\n")
+        first = False
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+
+    if fmt == "json":
+        buffer.write("]")
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+async def gzip_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+async def export(collection, query: Dict[str, Any], fmt: str, compress: bool = False,
+                 limit: int = 0, exclude: Iterable[str] = ()) -> AsyncIterator[bytes]:
+    """
+    Stream `collection` (a Motor collection) matching `query` in _id order.
+    CSV makes a first pass to collect the column names.
+    """
+    exclude = tuple(exclude)
+    columns = None
+    if fmt == "csv":
+        scan = collection.find(query).sort("_id", 1).limit(limit).batch_size(BATCH_SIZE)
+        columns = await csv_columns(_without(scan, exclude))
+    cursor = collection.find(query).sort("_id", 1).limit(limit).batch_size(BATCH_SIZE)
+    chunks = encode(cursor, fmt, columns, exclude)
+    if compress:
+        chunks = gzip_chunks(chunks)
+    async for chunk in chunks:
+        yield chunk
@@ -0,0 +1,132 @@
+"""
+FAQ retrieval
+BM25 index over FAQ questions and answers, stored as compressed sparse
+column arrays (NumPy only) so scoring a question touches just the postings
+of its terms. Used to answer AI chat questions locally when an FAQ matches.
+"""
+import math
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from text_normalize import tokenize
+
+K1 = 1.2
+B = 0.75
+# Question terms count this many times more than answer terms
+QUESTION_WEIGHT = 2
+MATCH_THRESHOLD = 0.7
+LATENCY_WINDOW = 1000
+
+
+class BM25Index:
+    """
+    Immutable BM25 index. Per-term postings are kept CSC-style:
+    `indptr[t]:indptr[t+1]` slices `doc_ids` and `weights` (precomputed
+    idf * saturated tf) for term t.
+    """
+
+    def __init__(self, documents: List[List[str]], k1: float = K1, b: float = B):
+        self.k1 = k1
+        self.b = b
+        self.doc_count = len(documents)
+        self.vocabulary: Dict[str, int] = {}
+
+        rows, cols = [], []
+        for doc_idx, tokens in enumerate(documents):
+            for token in tokens:
+                cols.append(self.vocabulary.setdefault(token, len(self.vocabulary)))
+                rows.append(doc_idx)
+
+        term_count = len(self.vocabulary)
+        lengths = np.bincount(np.asarray(rows, dtype=np.int64), minlength=self.doc_count).astype(np.float64)
+        avg_length = lengths.mean() if self.doc_count and lengths.sum() else 1.0
+
+        # Collapse duplicate (term, doc) pairs into term frequencies, sorted by term
+        keys = np.asarray(cols, dtype=np.int64) * max(self.doc_count, 1) + np.asarray(rows, dtype=np.int64)
+        unique_keys, tf = np.unique(keys, return_counts=True)
+        term_idx = unique_keys // max(self.doc_count, 1)
+        self.doc_ids = unique_keys % max(self.doc_count, 1)
+        self.indptr = np.concatenate([[0], np.cumsum(np.bincount(term_idx, minlength=term_count))])
+
+        df = np.diff(self.indptr).astype(np.float64)
+        self.idf = np.log(1 + (self.doc_count - df + 0.5) / (df + 0.5))
+        norm = k1 * (1 - b + b * lengths[self.doc_ids] / avg_length)
+        self.weights = self.idf[term_idx] * tf * (k1 + 1) / (tf + norm)
+
+    def score(self, tokens: List[str], reference_tf: int = QUESTION_WEIGHT) -> Tuple[np.ndarray, float]:
+        """
+        BM25 score per document plus a reference score: what an average-length
+        document containing every known token `reference_tf` times would get.
+        Used to normalise confidence.
+        """
+        scores = np.zeros(self.doc_count)
+        ceiling = 0.0
+        for token in tokens:
+            t = self.vocabulary.get(token)
+            if t is None:
+                continue
+            start, end = self.indptr[t], self.indptr[t + 1]
+            np.add.at(scores, self.doc_ids[start:end], self.weights[start:end])
+            ceiling += self.idf[t] * reference_tf * (self.k1 + 1) / (reference_tf + self.k1)
+        return scores, ceiling
+
+
+class FAQRetriever:
+    def __init__(self, threshold: float = MATCH_THRESHOLD):
+        self.threshold = threshold
+        self.faqs: List[Dict[str, Any]] = []
+        self.index = BM25Index([])
+        self.lookups = 0
+        self.hits = 0
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def rebuild(self, faqs: List[Dict[str, Any]]):
+        """faqs: dicts with "question" and "answer"; the index is swapped in atomically"""
+        documents = [
+            tokenize(f.get("question", "")) * QUESTION_WEIGHT + tokenize(f.get("answer", ""))
+            for f in faqs
+        ]
+        index = BM25Index(documents)
+        self.faqs, self.index = list(faqs), index
+
+    def match(self, question: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Best FAQ and its confidence in [0, 1], or None below the threshold"""
+        started = time.perf_counter()
+        faqs, index = self.faqs, self.index
+        result = None
+
+        tokens = list(dict.fromkeys(tokenize(question)))
+        if faqs and tokens:
+            scores, ceiling = index.score(tokens)
+            best = int(np.argmax(scores))
+            # Unknown words count against confidence, so off-topic questions fall through
+            coverage = sum(1 for t in tokens if t in index.vocabulary) / len(tokens)
+            confidence = min(1.0, float(scores[best] / ceiling)) * coverage if ceiling else 0.0
+            if confidence >= self.threshold:
+                result = (faqs[best], confidence)
+
+        self.lookups += 1
+        self.hits += result is not None
+        self._latencies.append(time.perf_counter() - started)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        latencies = sorted(self._latencies)
+
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, math.ceil(p * len(latencies)) - 1)] * 1000
+
+        return {
+            "faq_count": len(self.faqs),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+            "latency_ms_p50": round(percentile(0.5), 3),
+            "latency_ms_p95": round(percentile(0.95), 3),
+            "threshold": self.threshold,
+        }
@@ -0,0 +1,83 @@
+"""
+Geofence engine
+Tracks whether each enumerator is inside their survey's Wilkerstat area and
+reports enter/exit transitions (not every point) for incoming GPS fixes.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from spatial_index import PolygonIndex
+
+# Consecutive fixes on the other side of the boundary needed before a
+# transition is reported, so GPS jitter along an edge does not flap.
+CONFIRM_POINTS = 2
+
+
+class GeofenceEvent:
+    ENTER = "enter"
+    EXIT = "exit"
+
+
+class GeofenceEngine:
+    def __init__(self, confirm_points: int = CONFIRM_POINTS):
+        self.confirm_points = confirm_points
+        self._state: Dict[str, Dict[str, Any]] = {}
+
+    def reset(self, user_id: str):
+        self._state.pop(user_id, None)
+
+    def process(
+        self,
+        user_id: str,
+        area_id: str,
+        index: PolygonIndex,
+        points: List[Dict[str, Any]],
+    ) -> List[Dict[str, Any]]:
+        """
+        Evaluate a user's points (oldest first) against the area's polygons.
+        Returns one event dict per confirmed enter/exit transition.
+        """
+        if not points or len(index) == 0:
+            return []
+
+        located = index.locate(
+            [p["longitude"] for p in points],
+            [p["latitude"] for p in points],
+        )
+
+        state = self._state.get(user_id)
+        if state is None or state["area_id"] != area_id:
+            # Unknown start is treated as inside so the first fix outside alerts
+            state = {"area_id": area_id, "inside": True, "region_code": None, "pending": 0}
+            self._state[user_id] = state
+
+        events = []
+        for point, feature_idx in zip(points, located):
+            inside = feature_idx >= 0
+            region_code = index.codes[feature_idx] if inside else None
+
+            if inside == state["inside"]:
+                state["pending"] = 0
+                if inside:
+                    state["region_code"] = region_code
+                continue
+
+            state["pending"] += 1
+            if state["pending"] < self.confirm_points:
+                continue
+
+            state["inside"] = inside
+            state["pending"] = 0
+            # For an exit, report the region the user just left
+            code = region_code if inside else state["region_code"]
+            events.append({
+                "user_id": user_id,
+                "event": GeofenceEvent.ENTER if inside else GeofenceEvent.EXIT,
+                "region_code": str(code) if code is not None else None,
+                "latitude": point["latitude"],
+                "longitude": point["longitude"],
+                "timestamp": point.get("timestamp") or datetime.utcnow(),
+            })
+            state["region_code"] = region_code
+
+        return events
@@ -0,0 +1,246 @@
+"""
+Streaming GeoJSON reader
+Parses a FeatureCollection feature by feature from an async byte stream
+(e.g. FastAPI UploadFile) so large boundary files never sit in memory whole.
+"""
+import codecs
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+CHUNK_SIZE = 1024 * 1024  # 1 MB per read
+WHITESPACE = " \t\n\r"
+
+GEOMETRY_TYPES = {
+    "Point", "MultiPoint", "LineString", "MultiLineString",
+    "Polygon", "MultiPolygon", "GeometryCollection",
+}
+
+_decoder = json.JSONDecoder()
+
+
+class GeoJSONStreamError(ValueError):
+    """Raised when the uploaded content is not a valid FeatureCollection"""
+
+
+def _walk_positions(coords, depth: int, stats: List[float]) -> int:
+    """Accumulate bbox into stats ([minx, miny, maxx, maxy]) and return vertex count"""
+    if depth == 0:
+        if not isinstance(coords, (list, tuple)) or len(coords) < 2:
+            raise GeoJSONStreamError("Invalid coordinate position")
+        x, y = coords[0], coords[1]
+        if not isinstance(x, (int, float)) or not isinstance(y, (int, float)):
+            raise GeoJSONStreamError("Coordinates must be numeric")
+        if x < stats[0]: stats[0] = x
+        if y < stats[1]: stats[1] = y
+        if x > stats[2]: stats[2] = x
+        if y > stats[3]: stats[3] = y
+        return 1
+
+    if not isinstance(coords, list):
+        raise GeoJSONStreamError("Invalid coordinates array")
+    return sum(_walk_positions(c, depth - 1, stats) for c in coords)
+
+
+_COORD_DEPTH = {
+    "Point": 0,
+    "MultiPoint": 1,
+    "LineString": 1,
+    "MultiLineString": 2,
+    "Polygon": 2,
+    "MultiPolygon": 3,
+}
+
+
+def geometry_stats(geometry: Dict[str, Any]) -> Tuple[int, Optional[List[float]]]:
+    """Validate a geometry object and return (vertex_count, bbox)"""
+    if not isinstance(geometry, dict):
+        raise GeoJSONStreamError("Feature geometry must be an object")
+
+    geom_type = geometry.get("type")
+    if geom_type not in GEOMETRY_TYPES:
+        raise GeoJSONStreamError(f"Unsupported geometry type: {geom_type}")
+
+    stats = [float("inf"), float("inf"), float("-inf"), float("-inf")]
+
+    if geom_type == "GeometryCollection":
+        vertex_count = 0
+        for child in geometry.get("geometries") or []:
+            child_count, child_bbox = geometry_stats(child)
+            vertex_count += child_count
+            if child_bbox:
+                stats = [
+                    min(stats[0], child_bbox[0]), min(stats[1], child_bbox[1]),
+                    max(stats[2], child_bbox[2]), max(stats[3], child_bbox[3]),
+                ]
+    else:
+        if "coordinates" not in geometry:
+            raise GeoJSONStreamError("Geometry has no coordinates")
+        vertex_count = _walk_positions(geometry["coordinates"], _COORD_DEPTH[geom_type], stats)
+
+    if vertex_count == 0:
+        return 0, None
+    return vertex_count, stats
+
+
+def merge_bbox(a: Optional[List[float]], b: Optional[List[float]]) -> Optional[List[float]]:
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+
+
+def validate_feature(feature: Any) -> Tuple[int, Optional[List[float]]]:
+    """Validate a single Feature and return (vertex_count, bbox) of its geometry"""
+    if not isinstance(feature, dict) or feature.get("type") != "Feature":
+        raise GeoJSONStreamError("Every item in 'features' must be a Feature")
+
+    properties = feature.get("properties")
+    if properties is not None and not isinstance(properties, dict):
+        raise GeoJSONStreamError("Feature properties must be an object")
+
+    geometry = feature.get("geometry")
+    if geometry is None:
+        return 0, None
+    return geometry_stats(geometry)
+
+
+class FeatureCollectionReader:
+    """
+    Incremental FeatureCollection parser.
+
+    Top-level members other than "features" (type, name, crs, ...) are collected
+    into `header`. Features are yielded one at a time from `features()`, and only
+    the bytes of the feature currently being decoded are kept in the buffer.
+    """
+
+    def __init__(self, stream, chunk_size: int = CHUNK_SIZE):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.header: Dict[str, Any] = {}
+        self.feature_count = 0
+        self.vertex_count = 0
+        self.bbox: Optional[List[float]] = None
+        self.bytes_read = 0
+
+        self._text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    async def _fill(self, min_size: int = 0) -> bool:
+        """Append the next chunk to the buffer; returns False at end of stream"""
+        if self._eof:
+            return False
+
+        # Drop consumed text so the buffer only holds the pending value
+        if self._pos:
+            self._buf = self._buf[self._pos:]
+            self._pos = 0
+
+        raw = await self.stream.read(max(self.chunk_size, min_size))
+        if not raw:
+            self._eof = True
+            try:
+                self._buf += self._text_decoder.decode(b"", final=True)
+            except UnicodeDecodeError:
+                raise GeoJSONStreamError("File is not valid UTF-8")
+            return False
+
+        self.bytes_read += len(raw)
+        try:
+            self._buf += self._text_decoder.decode(raw)
+        except UnicodeDecodeError:
+            raise GeoJSONStreamError("File is not valid UTF-8")
+        return True
+
+    async def _peek(self) -> str:
+        """Skip whitespace and return the next character ('' at end of stream)"""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not await self._fill():
+                return ""
+
+    async def _expect(self, char: str):
+        found = await self._peek()
+        if found != char:
+            raise GeoJSONStreamError(f"Expected '{char}' but found '{found or 'end of file'}'")
+        self._pos += 1
+
+    async def _decode_value(self):
+        """Decode one complete JSON value, reading more data until it is whole"""
+        await self._peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buf, self._pos)
+                # A value ending exactly at the buffer edge may be a truncated number
+                if end < len(self._buf) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise GeoJSONStreamError("Invalid JSON file content")
+
+            # Grow geometrically so one huge feature is not re-parsed per chunk
+            pending = len(self._buf) - self._pos
+            if not await self._fill(min_size=pending) and not self._eof:
+                raise GeoJSONStreamError("Unexpected end of file")
+
+    def _record(self, feature: Dict[str, Any]) -> Tuple[int, Optional[List[float]]]:
+        vertex_count, bbox = validate_feature(feature)
+        self.feature_count += 1
+        self.vertex_count += vertex_count
+        self.bbox = merge_bbox(self.bbox, bbox)
+        return vertex_count, bbox
+
+    async def features(self) -> AsyncIterator[Tuple[Dict[str, Any], int, Optional[List[float]]]]:
+        """Yield (feature, vertex_count, bbox) for every feature in the collection"""
+        await self._expect("{")
+        seen_features = False
+
+        if await self._peek() == "}":
+            self._pos += 1
+        else:
+            while True:
+                key = await self._decode_value()
+                if not isinstance(key, str):
+                    raise GeoJSONStreamError("Invalid JSON object key")
+                await self._expect(":")
+
+                if key == "features":
+                    seen_features = True
+                    await self._expect("[")
+                    if await self._peek() == "]":
+                        self._pos += 1
+                    else:
+                        while True:
+                            feature = await self._decode_value()
+                            vertex_count, bbox = self._record(feature)
+                            yield feature, vertex_count, bbox
+
+                            sep = await self._peek()
+                            self._pos += 1
+                            if sep == "]":
+                                break
+                            if sep != ",":
+                                raise GeoJSONStreamError("Malformed 'features' array")
+                else:
+                    self.header[key] = await self._decode_value()
+
+                sep = await self._peek()
+                self._pos += 1
+                if sep == "}":
+                    break
+                if sep != ",":
+                    raise GeoJSONStreamError("Malformed GeoJSON object")
+
+        if await self._peek() != "":
+            raise GeoJSONStreamError("Unexpected content after GeoJSON object")
+
+        if self.header.get("type") != "FeatureCollection" or not seen_features:
+            raise GeoJSONStreamError("Invalid GeoJSON format")
+        if self.feature_count == 0:
+            raise GeoJSONStreamError("GeoJSON has no features")
@@ -0,0 +1,324 @@
+"""
+Background jobs
+In-process job runner: job documents live in a Mongo collection, a bounded
+pool of asyncio workers executes them, progress is pushed through a notify
+callback and unfinished jobs are picked up again on startup from their last
+checkpoint. Meant for a single API process; handlers are registered by type.
+A file named in params["path"] belongs to the job and is deleted once the job
+finishes, whatever the outcome. A result file (result["file"], in files_dir)
+is kept for `retention` after the job finishes; purge_expired() then deletes
+it together with the job document.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from bson import ObjectId
+
+logger = logging.getLogger(__name__)
+
+WORKER_COUNT = 4
+ERROR_LIMIT = 1000
+READ_SIZE = 1024 * 1024
+
+
+class JobStatus:
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    FINISHED = (COMPLETED, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Raised inside a handler at its next checkpoint after cancel()"""
+
+
+class JobError(Exception):
+    """Expected failure; the message is stored on the job without a traceback"""
+
+
+class JobContext:
+    """Handed to a job handler: parameters, resume checkpoint and reporting"""
+
+    def __init__(self, runner: "JobRunner", job: Dict[str, Any]):
+        self.runner = runner
+        self.job = job
+        self.job_id = str(job["_id"])
+        self.user_id = job.get("created_by")
+        self.params: Dict[str, Any] = job.get("params") or {}
+        self.checkpoint: Dict[str, Any] = job.get("checkpoint") or {}
+        self.progress: Dict[str, Any] = dict(job.get("progress") or {})
+        self.errors = list(job.get("errors") or [])
+        self.resumed = bool(job.get("started_at"))
+
+    @property
+    def cancelled(self) -> bool:
+        return self.job_id in self.runner._cancelled
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise JobCancelled()
+
+    def error(self, row: Any, message: str):
+        """Record a per-item error; only the first ERROR_LIMIT are kept"""
+        self.progress["failed"] = self.progress.get("failed", 0) + 1
+        if len(self.errors) < ERROR_LIMIT:
+            self.errors.append({"row": row, "error": message})
+
+    async def report(self, checkpoint: Optional[Dict[str, Any]] = None, **fields):
+        """
+        Persist progress (and optionally a new checkpoint) and notify the owner.
+        Work recorded before the checkpoint must already be durable, because a
+        restarted job continues from here. Raises JobCancelled if requested.
+        """
+        if checkpoint is not None:
+            self.checkpoint = checkpoint
+            fields["checkpoint"] = checkpoint
+        await self.runner._update(self.job, {"progress": self.progress, "errors": self.errors, **fields})
+        self.check_cancelled()
+
+
+Handler = Callable[[JobContext], Awaitable[Optional[Dict[str, Any]]]]
+Notify = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+
+class JobRunner:
+    def __init__(self, collection, notify: Notify, workers: int = WORKER_COUNT,
+                 files_dir: Optional[str] = None, retention: Optional[timedelta] = None):
+        self.collection = collection
+        self.notify = notify
+        self.worker_count = workers
+        self.files_dir = files_dir
+        self.retention = retention
+        self.handlers: Dict[str, Handler] = {}
+        self._queue: "asyncio.Queue[str]" = asyncio.Queue()
+        self._workers = []
+        self._cancelled = set()
+
+    def register(self, job_type: str, handler: Handler):
+        self.handlers[job_type] = handler
+
+    async def submit(self, job_type: str, created_by: str, params: Optional[Dict[str, Any]] = None,
+                     **fields) -> str:
+        """Create a queued job document and schedule it; returns the job id"""
+        if job_type not in self.handlers:
+            raise ValueError(f"Unknown job type: {job_type}")
+        now = datetime.utcnow()
+        job = {
+            "type": job_type,
+            "status": JobStatus.QUEUED,
+            "created_by": created_by,
+            "created_at": now,
+            "updated_at": now,
+            "params": params or {},
+            "checkpoint": {},
+            "progress": {},
+            "errors": [],
+            **fields
+        }
+        result = await self.collection.insert_one(job)
+        job_id = str(result.inserted_id)
+        self._queue.put_nowait(job_id)
+        return job_id
+
+    async def cancel(self, job_id: str) -> bool:
+        """
+        Queued jobs are cancelled immediately; running jobs stop at their next
+        checkpoint. Returns False if the job already finished.
+        """
+        job = await self.collection.find_one_and_update(
+            {"_id": ObjectId(job_id), "status": {"$nin": list(JobStatus.FINISHED)}},
+            {"$set": {"cancel_requested": True, "updated_at": datetime.utcnow()}}
+        )
+        if not job:
+            return False
+        self._cancelled.add(job_id)
+        if job["status"] == JobStatus.QUEUED:
+            await self._finish(job, JobStatus.CANCELLED)
+        return True
+
+    async def start(self):
+        """Re-queue unfinished jobs (oldest first) and start the worker pool"""
+        cursor = self.collection.find(
+            {"status": {"$in": [JobStatus.QUEUED, JobStatus.RUNNING]}}, {"_id": 1, "cancel_requested": 1}
+        ).sort("created_at", 1)
+        async for job in cursor:
+            job_id = str(job["_id"])
+            if job.get("cancel_requested"):
+                self._cancelled.add(job_id)
+            self._queue.put_nowait(job_id)
+
+        for _ in range(self.worker_count):
+            self._workers.append(asyncio.create_task(self._worker()))
+
+    async def stop(self):
+        """
+        Stop the workers. Running jobs are interrupted and keep status RUNNING,
+        so the next start() resumes them from their last checkpoint.
+        """
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def purge_expired(self) -> Dict[str, int]:
+        """
+        Delete jobs that finished more than `retention` ago and their result
+        files, plus files in files_dir that old which no unfinished job uses
+        (results of jobs already deleted, uploads left by a crash).
+        """
+        if self.retention is None:
+            return {"jobs": 0, "files": 0}
+        cutoff = datetime.utcnow() - self.retention
+        expired = {"status": {"$in": list(JobStatus.FINISHED)}, "finished_at": {"$lt": cutoff}}
+        files = 0
+        ids = []
+        async for job in self.collection.find(expired, {"result.file": 1}):
+            ids.append(job["_id"])
+            name = (job.get("result") or {}).get("file")
+            if name and self.files_dir and remove_file(os.path.join(self.files_dir, os.path.basename(name))):
+                files += 1
+        if ids:
+            await self.collection.delete_many({"_id": {"$in": ids}})
+
+        if self.files_dir:
+            in_use = set()
+            async for job in self.collection.find(
+                {"status": {"$nin": list(JobStatus.FINISHED)}, "params.path": {"$type": "string"}}, {"params.path": 1}
+            ):
+                in_use.add(os.path.basename(job["params"]["path"]))
+            # Remaining finished jobs are within retention; a long-running job's result can still be older than cutoff
+            async for job in self.collection.find({"result.file": {"$type": "string"}}, {"result.file": 1}):
+                in_use.add(os.path.basename(job["result"]["file"]))
+            for name in await asyncio.to_thread(stale_files, self.files_dir, cutoff):
+                if name not in in_use and remove_file(os.path.join(self.files_dir, name)):
+                    files += 1
+        return {"jobs": len(ids), "files": files}
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job runner error for {job_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str):
+        job = await self.collection.find_one({"_id": ObjectId(job_id)})
+        if not job or job["status"] in JobStatus.FINISHED:
+            self._cancelled.discard(job_id)
+            return
+
+        ctx = JobContext(self, job)
+        if ctx.cancelled:
+            self._cancelled.discard(job_id)
+            await self._finish(job, JobStatus.CANCELLED, progress=ctx.progress, errors=ctx.errors)
+            return
+
+        handler = self.handlers.get(job["type"])
+        if handler is None:
+            await self._finish(job, JobStatus.FAILED, error=f"Unknown job type: {job['type']}")
+            return
+
+        fields = {"status": JobStatus.RUNNING}
+        if ctx.resumed:
+            fields["resumed_count"] = job.get("resumed_count", 0) + 1
+        else:
+            fields["started_at"] = datetime.utcnow()
+        await self._update(job, fields)
+
+        try:
+            result = await handler(ctx)
+        except JobCancelled:
+            await self._finish(job, JobStatus.CANCELLED, progress=ctx.progress, errors=ctx.errors)
+        except JobError as e:
+            await self._finish(job, JobStatus.FAILED, error=str(e), progress=ctx.progress, errors=ctx.errors)
+        except asyncio.CancelledError:
+            # Shutdown: leave the job RUNNING so it resumes on the next start
+            raise
+        except Exception as e:
+            logger.error(f"Job {job_id} ({job['type']}) failed: {e}")
+            await self._finish(job, JobStatus.FAILED, error=str(e), progress=ctx.progress, errors=ctx.errors)
+        else:
+            await self._finish(job, JobStatus.COMPLETED, result=result, progress=ctx.progress, errors=ctx.errors)
+        finally:
+            self._cancelled.discard(job_id)
+
+    async def _finish(self, job: Dict[str, Any], status: str, **fields):
+        fields = {k: v for k, v in fields.items() if v is not None}
+        await self._update(job, {"status": status, "finished_at": datetime.utcnow(), **fields})
+        remove_file((job.get("params") or {}).get("path"))
+
+    async def _update(self, job: Dict[str, Any], fields: Dict[str, Any]):
+        fields["updated_at"] = datetime.utcnow()
+        await self.collection.update_one({"_id": job["_id"]}, {"$set": fields})
+        job.update(fields)
+        if job.get("created_by"):
+            await self.notify(job["created_by"], {
+                "job_id": str(job["_id"]),
+                "type": job["type"],
+                "status": job["status"],
+                "progress": job.get("progress"),
+                "error": job.get("error")
+            })
+
+
+class AsyncFileReader:
+    """Minimal async read() over a local file, for stream parsers"""
+
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+
+    async def read(self, size: int = -1) -> bytes:
+        return await asyncio.to_thread(self._file.read, size)
+
+    def close(self):
+        self._file.close()
+
+
+async def spool_upload(upload, directory: str, suffix: str = "") -> str:
+    """Copy an UploadFile to `directory` so a job can read it after the request ends"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{ObjectId()}{suffix}")
+    with open(path, "wb") as out:
+        while True:
+            chunk = await upload.read(READ_SIZE)
+            if not chunk:
+                break
+            await asyncio.to_thread(out.write, chunk)
+    return path
+
+
+def remove_file(path: Optional[str]) -> bool:
+    if not path:
+        return False
+    try:
+        os.remove(path)
+        return True
+    except OSError:
+        return False
+
+
+def stale_files(directory: str, cutoff: datetime) -> List[str]:
+    """Names of regular files in `directory` last modified before `cutoff` (UTC)"""
+    names = []
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return names
+    for entry in entries:
+        try:
+            if entry.is_file() and datetime.utcfromtimestamp(entry.stat().st_mtime) < cutoff:
+                names.append(entry.name)
+        except OSError:
+            continue
+    return names
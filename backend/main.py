@@ -1,21 +1,44 @@
 from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, WebSocket, WebSocketDisconnect, Request, Query, UploadFile, File, Form
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.encoders import jsonable_encoder
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, HTMLResponse, JSONResponse
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
 from typing import List, Optional, Dict, Any
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import jwt
 from passlib.context import CryptContext
 from bson import ObjectId
+from pymongo import InsertOne, ReturnDocument, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError, WriteError
 import json
 import uuid
+import asyncio
+import base64
+import time
+from collections import Counter, OrderedDict
+
+from geojson_stream import FeatureCollectionReader, GeoJSONStreamError
+from spatial_index import PolygonIndex
+from geofence import GeofenceEngine
+from respondent_import import ImportFormatError, detect_format, iter_rows, read_chunk, normalize_row
+import assignment
+import routing
+from jobs import JobRunner, JobContext, JobStatus, JobCancelled, JobError, AsyncFileReader, spool_upload, remove_file
+import migrate_surveys
+from ai_assistant import AIAnswerService, AIUnavailable, GeminiProvider, StubProvider
+from faq_retrieval import FAQRetriever
+from answer_cache import KEY_VERSION as AI_CACHE_KEY_VERSION, AnswerCache, entry_to_doc
+from search_index import InvertedIndexSearch, MongoTextSearch, PROJECTIONS as SEARCH_PROJECTIONS
+from archive import Archiver
+import delta_sync
+import export_stream
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -31,22 +54,84 @@ security = HTTPBearer()
 SECRET_KEY = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
 ALGORITHM = "HS256"
 
-# Gemini AI Configuration with safe error handling
+# Jumlah fitur Wilkerstat per insert_many saat upload
+WILKERSTAT_FEATURE_BATCH_SIZE = 500
+# Jumlah responden per batch saat backfill region_code
+REGION_BACKFILL_BATCH_SIZE = 10000
+# Berapa lama area geofence per user di-cache sebelum dibaca ulang dari DB
+GEOFENCE_AREA_TTL = timedelta(minutes=5)
+# Interval muat ulang penuh AudienceIndex (jaring pengaman di luar update inkremental)
+AUDIENCE_REFRESH_INTERVAL = timedelta(minutes=10)
+# Import responden: jumlah baris per validasi + insert_many
+RESPONDENT_IMPORT_CHUNK_SIZE = 1000
+# Background job: jumlah worker, folder file upload/hasil export, dokumen per batch export/migrasi
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 4))
+JOB_FILES_DIR = os.environ.get('JOB_FILES_DIR', str(ROOT_DIR / 'job_files'))
+JOB_BATCH_SIZE = 1000
+# Job selesai (dan file hasil export-nya) dihapus setelah JOB_RETENTION_DAYS, dicek tiap JOB_CLEANUP_INTERVAL
+JOB_RETENTION = timedelta(days=float(os.environ.get('JOB_RETENTION_DAYS', 7)))
+JOB_CLEANUP_INTERVAL = timedelta(hours=1)
+# Koleksi yang boleh dibaca lewat database viewer dan export
+EXPORTABLE_COLLECTIONS = ["users", "surveys", "respondents", "locations", "messages", "faqs"]
+# Delta sync: dokumen per koleksi per halaman, jendela aman untuk write yang commit terlambat,
+# dan masa simpan tombstone (token yang lebih tua dari ini harus full resync)
+SYNC_PAGE_SIZE = 500
+SYNC_SAFETY_WINDOW = timedelta(seconds=5)
+TOMBSTONE_RETENTION = timedelta(days=30)
+# Cache profil user untuk memperkaya daftar pesan (sender/receiver)
+USER_PROFILE_CACHE_SIZE = 2000
+USER_PROFILE_TTL = timedelta(minutes=5)
+# Field user yang tidak boleh ikut terkirim sebagai profil
+USER_PRIVATE_FIELDS = {"password": 0, "current_token_id": 0}
+# Broadcast: jumlah receipt per insert_many
+BROADCAST_RECEIPT_BATCH_SIZE = 5000
+# Batas pesan per POST /messages/batch (antrian offline)
+MESSAGE_BATCH_LIMIT = 500
+
+# AI assistant: provider dipilih lewat AI_PROVIDER (gemini | stub), default gemini jika ada API key.
+# Panggilan model berjalan di thread pool terbatas dengan timeout dan circuit breaker.
 GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY', '')
-gemini_model = None
+AI_PROVIDER = os.environ.get('AI_PROVIDER', 'gemini' if GEMINI_API_KEY else '')
+AI_MAX_WORKERS = int(os.environ.get('AI_MAX_WORKERS', 4))
+AI_CALL_TIMEOUT = float(os.environ.get('AI_CALL_TIMEOUT', 30))
+ai_provider = None
 
-if GEMINI_API_KEY:
+if AI_PROVIDER == 'gemini' and GEMINI_API_KEY:
     try:
-        import google.generativeai as genai
-        genai.configure(api_key=GEMINI_API_KEY)
-        gemini_model = genai.GenerativeModel('gemini-1.5-flash')
+        ai_provider = GeminiProvider(GEMINI_API_KEY)
         logging.info("✅ Gemini AI initialized successfully")
     except Exception as e:
         logging.warning(f"⚠️  Gemini AI initialization failed: {e}")
-        gemini_model = None
+        ai_provider = None
+elif AI_PROVIDER == 'stub':
+    ai_provider = StubProvider()
+    logging.info("ℹ️  Using stub AI provider")
 else:
     logging.info("ℹ️  GEMINI_API_KEY not set. AI chat will be disabled.")
 
+ai_service = AIAnswerService(ai_provider, max_workers=AI_MAX_WORKERS, timeout=AI_CALL_TIMEOUT)
+
+# Pertanyaan AI yang cocok dengan FAQ (skor BM25 ternormalisasi >= threshold) dijawab lokal
+FAQ_MATCH_THRESHOLD = float(os.environ.get('FAQ_MATCH_THRESHOLD', 0.7))
+faq_index = FAQRetriever(threshold=FAQ_MATCH_THRESHOLD)
+
+# Cache jawaban AI untuk pertanyaan yang sama/mirip (MinHash + LSH), disimpan di ai_answer_cache
+AI_CACHE_MAX_ENTRIES = int(os.environ.get('AI_CACHE_MAX_ENTRIES', 5000))
+AI_CACHE_TTL = timedelta(days=float(os.environ.get('AI_CACHE_TTL_DAYS', 7)))
+answer_cache = AnswerCache(max_entries=AI_CACHE_MAX_ENTRIES, ttl=AI_CACHE_TTL)
+
+# Pencarian responden & pesan: SEARCH_ENGINE=mongo (text index) atau memory (inverted index in-process)
+SEARCH_ENGINE = os.environ.get('SEARCH_ENGINE', 'mongo')
+search_engine = InvertedIndexSearch() if SEARCH_ENGINE == 'memory' else MongoTextSearch(db)
+
+# Arsip hot/cold: pesan & lokasi lebih tua dari ARCHIVE_AFTER_DAYS dipindah ke <koleksi>_archive
+# setiap ARCHIVE_INTERVAL_HOURS (0 = nonaktif). Endpoint membaca arsip hanya jika rentangnya perlu.
+ARCHIVE_AFTER_DAYS = float(os.environ.get('ARCHIVE_AFTER_DAYS', 90))
+ARCHIVE_INTERVAL = timedelta(hours=float(os.environ.get('ARCHIVE_INTERVAL_HOURS', 24)))
+# Arsip hanya-baca: edit/hapus/jawab pesan arsip ditolak (409), lihat find_hot_message
+ARCHIVE_COLLECTIONS = ("messages", "locations")
+archiver = Archiver(db)
+
 # Create the main app
 app = FastAPI()
 api_router = APIRouter(prefix="/api")
@@ -55,31 +140,219 @@ api_router = APIRouter(prefix="/api")
 class ConnectionManager:
     def __init__(self):
         self.active_connections: Dict[str, WebSocket] = {}
+        # Format payload per koneksi: "full" (dokumen lengkap) atau "diff" (perubahan saja)
+        self.payload_formats: Dict[str, str] = {}
 
-    async def connect(self, websocket: WebSocket, user_id: str):
+    async def connect(self, websocket: WebSocket, user_id: str, payload_format: str = "full"):
         await websocket.accept()
         self.active_connections[user_id] = websocket
+        self.payload_formats[user_id] = payload_format
 
     def disconnect(self, user_id: str):
         if user_id in self.active_connections:
             del self.active_connections[user_id]
+        self.payload_formats.pop(user_id, None)
+
+    async def _send(self, websocket: WebSocket, message: dict):
+        # jsonable_encoder menangani datetime/ObjectId di dokumen MongoDB
+        await websocket.send_json(jsonable_encoder(message))
 
     async def send_personal_message(self, message: dict, user_id: str):
         if user_id in self.active_connections:
-            await self.active_connections[user_id].send_json(message)
+            await self._send(self.active_connections[user_id], message)
 
     async def broadcast(self, message: dict):
-        for connection in self.active_connections.values():
-            await connection.send_json(message)
+        for connection in list(self.active_connections.values()):
+            await self._send(connection, message)
 
     async def broadcast_to_users(self, message: dict, user_ids: List[str]):
-        """Broadcast message to specific users only"""
-        for user_id in user_ids:
-            if user_id in self.active_connections:
-                await self.active_connections[user_id].send_json(message)
+        """Broadcast message to specific users only (payload di-encode sekali, kirim paralel)"""
+        sockets = [self.active_connections[u] for u in user_ids if u in self.active_connections]
+        if not sockets:
+            return
+        payload = jsonable_encoder(message)
+        # Satu koneksi putus tidak boleh menggagalkan pengiriman ke yang lain
+        await asyncio.gather(*(ws.send_json(payload) for ws in sockets), return_exceptions=True)
+
+    async def broadcast_to_users_compact(self, message: dict, compact_message: dict, user_ids: List[str]):
+        """Kirim compact_message ke koneksi yang memilih format diff, message ke sisanya (paralel)"""
+        targets = [u for u in user_ids if u in self.active_connections]
+        if not targets:
+            return
+        full, compact = jsonable_encoder(message), jsonable_encoder(compact_message)
+        sends = [
+            self.active_connections[u].send_json(compact if self.payload_formats.get(u) == "diff" else full)
+            for u in targets
+        ]
+        # Seperti broadcast_to_users: satu koneksi putus tidak menggagalkan yang lain
+        await asyncio.gather(*sends, return_exceptions=True)
 
 manager = ConnectionManager()
 
+# Audience index: siapa yang berhak menerima event milik seorang enumerator
+class AudienceIndex:
+    def __init__(self):
+        self._supervisor_of: Dict[str, Optional[str]] = {}
+        self._admins: set = set()
+        self._loaded_at: Optional[datetime] = None
+        self._lock = asyncio.Lock()
+
+    async def _ensure_loaded(self):
+        if self._loaded_at and datetime.utcnow() - self._loaded_at < AUDIENCE_REFRESH_INTERVAL:
+            return
+        async with self._lock:
+            if self._loaded_at and datetime.utcnow() - self._loaded_at < AUDIENCE_REFRESH_INTERVAL:
+                return
+            supervisor_of, admins = {}, set()
+            async for user in db.users.find({}, {"role": 1, "supervisor_id": 1}):
+                user_id = str(user["_id"])
+                supervisor_of[user_id] = user.get("supervisor_id")
+                if user.get("role") == UserRole.ADMIN:
+                    admins.add(user_id)
+            self._supervisor_of, self._admins = supervisor_of, admins
+            self._loaded_at = datetime.utcnow()
+
+    def update_user(self, user_id: str, role: Optional[str] = None, supervisor_id: Optional[str] = None):
+        """Dipanggil saat user dibuat/diubah agar index tidak menunggu refresh"""
+        self._supervisor_of[user_id] = supervisor_id
+        if role == UserRole.ADMIN:
+            self._admins.add(user_id)
+        elif role is not None:
+            self._admins.discard(user_id)
+
+    async def admin_ids(self) -> List[str]:
+        await self._ensure_loaded()
+        return list(self._admins)
+
+    async def supervisors_and_admins(self, enumerator_ids: List[Optional[str]]) -> List[str]:
+        """Supervisor dari para enumerator + semua admin (tanpa enumeratornya sendiri)"""
+        await self._ensure_loaded()
+        recipients = set(self._admins)
+        for enumerator_id in enumerator_ids:
+            supervisor_id = self._supervisor_of.get(enumerator_id) if enumerator_id else None
+            if supervisor_id:
+                recipients.add(supervisor_id)
+        return list(recipients)
+
+    async def for_enumerators(self, enumerator_ids: List[Optional[str]]) -> List[str]:
+        """Enumerator itu sendiri, supervisornya, dan admin"""
+        recipients = set(await self.supervisors_and_admins(enumerator_ids))
+        recipients.update(e for e in enumerator_ids if e)
+        return list(recipients)
+
+audience = AudienceIndex()
+
+# Profil user (tanpa password) untuk enrichment pesan; LRU + TTL
+class UserProfileCache:
+    def __init__(self, max_size: int = USER_PROFILE_CACHE_SIZE, ttl: timedelta = USER_PROFILE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._profiles: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def invalidate(self, user_id: str):
+        self._profiles.pop(user_id, None)
+
+    async def get_many(self, user_ids) -> Dict[str, dict]:
+        """Profil untuk semua id yang ada; yang belum di-cache diambil dengan satu query $in"""
+        now = datetime.utcnow()
+        profiles, missing = {}, []
+        for user_id in set(u for u in user_ids if u):
+            entry = self._profiles.get(user_id)
+            if entry and entry[0] > now:
+                self._profiles.move_to_end(user_id)
+                profiles[user_id] = entry[1]
+            else:
+                missing.append(user_id)
+
+        object_ids = []
+        for user_id in missing:
+            try:
+                object_ids.append(ObjectId(user_id))
+            except Exception:
+                pass
+        if object_ids:
+            async for user in db.users.find({"_id": {"$in": object_ids}}, USER_PRIVATE_FIELDS):
+                profile = serialize_doc(user)
+                profiles[profile["id"]] = profile
+                self._profiles[profile["id"]] = (now + self.ttl, profile)
+                self._profiles.move_to_end(profile["id"])
+            while len(self._profiles) > self.max_size:
+                self._profiles.popitem(last=False)
+
+        # Salinan agar caller bebas mengubah hasilnya
+        return {user_id: dict(profile) for user_id, profile in profiles.items()}
+
+user_profiles = UserProfileCache()
+
+async def enrich_messages(messages: List[dict], fields=("sender", "receiver")) -> List[dict]:
+    """Serialize pesan dan tempelkan profil sender/receiver untuk satu halaman sekaligus"""
+    user_ids = [msg.get(f"{field}_id") for msg in messages for field in fields]
+    profiles = await user_profiles.get_many(user_ids)
+    result = []
+    for msg in messages:
+        msg_data = serialize_doc(msg)
+        for field in fields:
+            user_id = msg_data.get(f"{field}_id")
+            if field == "sender" or user_id:
+                msg_data[field] = profiles.get(user_id)
+        result.append(msg_data)
+    return result
+
+# Cache rute kunjungan: enumerator_id -> {survey_id atau "": rute}
+route_cache: Dict[str, Dict[str, Any]] = {}
+# Naik setiap kali cache enumerator dibuang, agar hasil hitungan yang sedang
+# berjalan tidak menimpa cache dengan rute basi
+route_generation: Dict[str, int] = {}
+
+def invalidate_routes(enumerator_ids):
+    """Dipanggil setiap kali daftar responden pending seorang enumerator berubah"""
+    for enumerator_id in enumerator_ids:
+        if enumerator_id:
+            route_cache.pop(enumerator_id, None)
+            route_generation[enumerator_id] = route_generation.get(enumerator_id, 0) + 1
+
+async def reindex_search(kind: str, query: dict):
+    """Perbarui index pencarian in-process untuk dokumen yang cocok (no-op untuk engine mongo)"""
+    if not search_engine.incremental:
+        return
+    async for doc in db[kind].find(query, SEARCH_PROJECTIONS[kind]):
+        search_engine.upsert(kind, doc)
+
+async def unindex_search(kind: str, query: dict):
+    """Keluarkan dokumen yang akan dihapus dari index pencarian in-process"""
+    if not search_engine.incremental:
+        return
+    search_engine.remove(kind, await db[kind].distinct("_id", query))
+
+# Spatial index cache (satu PolygonIndex per Wilkerstat)
+class SpatialIndexCache:
+    def __init__(self):
+        self._indexes: Dict[str, PolygonIndex] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def get(self, wilkerstat_id: str) -> Optional[PolygonIndex]:
+        if wilkerstat_id in self._indexes:
+            return self._indexes[wilkerstat_id]
+
+        lock = self._locks.setdefault(wilkerstat_id, asyncio.Lock())
+        async with lock:
+            if wilkerstat_id not in self._indexes:
+                features = await load_wilkerstat_polygons(wilkerstat_id)
+                if features is None:
+                    return None
+                # Membangun index cukup berat untuk file besar, jalankan di thread
+                self._indexes[wilkerstat_id] = await asyncio.to_thread(PolygonIndex, features)
+        return self._indexes[wilkerstat_id]
+
+    def invalidate(self, wilkerstat_id: str):
+        self._indexes.pop(wilkerstat_id, None)
+
+spatial_indexes = SpatialIndexCache()
+
+# Geofence: state enter/exit per user + cache area kerja (survey Wilkerstat) per user
+geofence_engine = GeofenceEngine()
+geofence_areas: Dict[str, Dict[str, Any]] = {}
+
 # Models
 class UserRole:
     ADMIN = "admin"
@@ -156,6 +429,7 @@ class Survey(BaseModel):
     is_active: bool = True
     geojson_path: Optional[str] = None
     geojson_filter_field: Optional[str] = None
+    wilkerstat_id: Optional[str] = None
 
 class SurveyCreate(BaseModel):
     title: str
@@ -168,6 +442,7 @@ class SurveyCreate(BaseModel):
     enumerator_ids: List[str] = []
     geojson_path: Optional[str] = None
     geojson_filter_field: Optional[str] = None
+    wilkerstat_id: Optional[str] = None
 
 class RespondentLocation(BaseModel):
     latitude: float
@@ -186,7 +461,7 @@ class Respondent(BaseModel):
     survey_data: Optional[Dict[str, Any]] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
-    region_code: str
+    region_code: Optional[str] = None
 
 class RespondentCreate(BaseModel):
     name: str
@@ -195,16 +470,45 @@ class RespondentCreate(BaseModel):
     location: RespondentLocation
     survey_id: str
     enumerator_id: Optional[str] = None
-    region_code: str
+    region_code: Optional[str] = None  # Diisi otomatis dari Wilkerstat survey jika kosong
+
+class SurveyDataPatch(BaseModel):
+    # Key = id pertanyaan (boleh path bertitik, mis. "blok1.q3")
+    set: Dict[str, Any] = {}
+    unset: List[str] = []
+
+    class Config:
+        extra = "forbid"
 
 class RespondentUpdate(BaseModel):
     status: Optional[str] = None
-    survey_data: Optional[Dict[str, Any]] = None
+    survey_data: Optional[Dict[str, Any]] = None  # Ganti seluruh survey_data
+    survey_data_patch: Optional[SurveyDataPatch] = None  # Ubah jawaban tertentu saja
     enumerator_id: Optional[str] = None
     
     class Config:
         extra = "forbid"
 
+class RespondentBulkFilter(BaseModel):
+    survey_id: Optional[str] = None
+    enumerator_id: Optional[str] = None
+    status: Optional[str] = None
+    region_codes: Optional[List[str]] = None
+
+    class Config:
+        extra = "forbid"
+
+class RespondentBulkUpdate(BaseModel):
+    # Target: daftar ID responden atau filter (salah satu wajib diisi)
+    respondent_ids: Optional[List[str]] = None
+    filter: Optional[RespondentBulkFilter] = None
+    # Patch yang diterapkan ke semua responden target
+    status: Optional[str] = None
+    enumerator_id: Optional[str] = None
+
+    class Config:
+        extra = "forbid"
+
 class LocationTracking(BaseModel):
     id: Optional[str] = None
     user_id: str
@@ -227,6 +531,11 @@ class MessageType:
     SUPERVISOR = "supervisor"
     BROADCAST = "broadcast"
 
+class AIStatus:
+    PENDING = "pending"
+    ANSWERED = "answered"
+    FAILED = "failed"
+
 class Message(BaseModel):
     id: Optional[str] = None
     sender_id: str
@@ -257,13 +566,26 @@ class MessageUpdate(BaseModel):
 class MessageResponse(BaseModel):
     response: str
 
+class MessageBatchItem(BaseModel):
+    # Field wajib dicek per item supaya satu pesan rusak tidak menggagalkan seluruh antrian
+    client_id: Optional[str] = None  # Idempotency key dari perangkat
+    message_type: Optional[str] = None
+    content: Optional[str] = None
+    receiver_id: Optional[str] = None
+    timestamp: Optional[datetime] = None  # Waktu asli di perangkat
+
 class MessageBatch(BaseModel):
-    messages: List[Dict[str, Any]]
+    messages: List[MessageBatchItem]
+
+class ConversationRead(BaseModel):
+    # Tanpa keduanya: tandai seluruh percakapan sudah dibaca
+    up_to_message_id: Optional[str] = None
+    up_to: Optional[datetime] = None
 
 # NEW: Broadcast Message Model
 class BroadcastMessageCreate(BaseModel):
     content: str
-    target_roles: List[str] = ["enumerator", "supervisor"]  # Who receives the broadcast
+    target_roles: List[str] = ["enumerator", "supervisor"]  # Who receives the broadcast (resolved at send time)
     survey_id: Optional[str] = None  # Optional: target specific survey participants
 
 # NEW: Conversation Model (for grouping messages between users)
@@ -274,6 +596,7 @@ class Conversation(BaseModel):
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     last_message: Optional[str] = None
     unread_count: Dict[str, int] = {}  # Track unread count per user
+    read_until: Dict[str, datetime] = {}  # Read watermark per user
 
 class FAQItem(BaseModel):
     id: Optional[str] = None
@@ -369,6 +692,539 @@ def serialize_doc(doc):
     
     return doc
 
+async def load_wilkerstat_polygons(wilkerstat_id: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Ambil geometri + kode wilayah dari sebuah Wilkerstat untuk PolygonIndex.
+    Upload yang belum selesai (status selain "ready") tidak dimuat agar polygon parsial tidak ter-cache.
+    """
+    if not ObjectId.is_valid(wilkerstat_id):
+        return None
+    wilkerstat = await db.wilkerstats.find_one({"_id": ObjectId(wilkerstat_id)})
+    if not wilkerstat or wilkerstat.get("status", "ready") != "ready":
+        return None
+
+    # Data lama menyimpan seluruh FeatureCollection di field "geojson"
+    if "geojson" in wilkerstat:
+        filter_field = wilkerstat.get("filter_field")
+        return [
+            {"code": (f.get("properties") or {}).get(filter_field), "geometry": f.get("geometry")}
+            for f in wilkerstat["geojson"].get("features", [])
+        ]
+
+    features = []
+    cursor = db.wilkerstat_features.find(
+        {"wilkerstat_id": wilkerstat_id},
+        {"_id": 0, "filter_value": 1, "geometry": 1}
+    ).sort("seq", 1).batch_size(WILKERSTAT_FEATURE_BATCH_SIZE)
+    async for feature in cursor:
+        features.append({"code": feature.get("filter_value"), "geometry": feature.get("geometry")})
+    return features
+
+async def get_survey_polygon_index(survey_id: str) -> Optional[PolygonIndex]:
+    # survey_id berasal dari input client; id tidak valid = tidak ada polygon, bukan error 500
+    if not ObjectId.is_valid(survey_id):
+        return None
+    survey = await db.surveys.find_one({"_id": ObjectId(survey_id)}, {"wilkerstat_id": 1})
+    if not survey or not survey.get("wilkerstat_id"):
+        return None
+    return await spatial_indexes.get(survey["wilkerstat_id"])
+
+async def resolve_region_code(survey_id: str, location: RespondentLocation) -> Optional[str]:
+    """Cari region_code dari polygon Wilkerstat yang memuat lokasi responden"""
+    index = await get_survey_polygon_index(survey_id)
+    if index is None:
+        return None
+    code = index.resolve_one(location.longitude, location.latitude)
+    return str(code) if code is not None else None
+
+async def backfill_region_codes(survey_id: str, overwrite: bool = False) -> Dict[str, int]:
+    """Isi region_code semua responden sebuah survey secara batch"""
+    stats = {"processed": 0, "resolved": 0, "unresolved": 0}
+    index = await get_survey_polygon_index(survey_id)
+    if index is None:
+        return stats
+
+    query = {"survey_id": survey_id}
+    if not overwrite:
+        query["region_code"] = {"$in": [None, ""]}
+
+    async def flush(ids, lons, lats):
+        codes = await asyncio.to_thread(index.resolve, lons, lats)
+        by_code: Dict[str, List[ObjectId]] = {}
+        for oid, code in zip(ids, codes):
+            if code is None:
+                stats["unresolved"] += 1
+            else:
+                by_code.setdefault(str(code), []).append(oid)
+                stats["resolved"] += 1
+        # Satu update_many per kode wilayah, bukan satu update per responden
+        for code, code_ids in by_code.items():
+            await db.respondents.update_many(
+                {"_id": {"$in": code_ids}},
+                {"$set": {"region_code": code, "updated_at": datetime.utcnow()}}
+            )
+        stats["processed"] += len(ids)
+
+    ids, lons, lats = [], [], []
+    cursor = db.respondents.find(query, {"location": 1}).batch_size(REGION_BACKFILL_BATCH_SIZE)
+    async for respondent in cursor:
+        location = respondent.get("location") or {}
+        if location.get("latitude") is None or location.get("longitude") is None:
+            stats["unresolved"] += 1
+            continue
+        ids.append(respondent["_id"])
+        lons.append(location["longitude"])
+        lats.append(location["latitude"])
+        if len(ids) >= REGION_BACKFILL_BATCH_SIZE:
+            await flush(ids, lons, lats)
+            ids, lons, lats = [], [], []
+
+    if ids:
+        await flush(ids, lons, lats)
+    return stats
+
+async def get_geofence_area(user_id: str) -> Optional[Dict[str, Any]]:
+    """Area kerja enumerator: Wilkerstat dari survey aktif tempat dia ditugaskan"""
+    cached = geofence_areas.get(user_id)
+    if cached and cached["expires"] > datetime.utcnow():
+        return cached if cached["wilkerstat_id"] else None
+
+    area = {"wilkerstat_id": None, "survey_id": None, "expires": datetime.utcnow() + GEOFENCE_AREA_TTL}
+
+    user = await db.users.find_one({"_id": ObjectId(user_id)}, {"role": 1})
+    if user and user.get("role") == UserRole.ENUMERATOR:
+        survey = await db.surveys.find_one(
+            {"enumerator_ids": user_id, "is_active": True, "wilkerstat_id": {"$nin": [None, ""]}},
+            {"wilkerstat_id": 1},
+            sort=[("start_date", -1)]
+        )
+        if survey:
+            area["wilkerstat_id"] = survey["wilkerstat_id"]
+            area["survey_id"] = str(survey["_id"])
+
+    geofence_areas[user_id] = area
+    return area if area["wilkerstat_id"] else None
+
+def location_timestamp(value: Optional[datetime]) -> datetime:
+    """Waktu lokasi sebagai UTC naive (seperti datetime.utcnow) agar titik dari perangkat bisa diurutkan bersama"""
+    if value is None:
+        return datetime.utcnow()
+    if value.tzinfo:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+async def check_geofence(locations: List[dict]):
+    """Cek titik GPS terhadap area kerja dan kirim geofence_event saat enter/exit"""
+    by_user: Dict[str, List[dict]] = {}
+    for loc in locations:
+        by_user.setdefault(loc["user_id"], []).append(loc)
+
+    for user_id, points in by_user.items():
+        area = await get_geofence_area(user_id)
+        if not area:
+            continue
+        index = await spatial_indexes.get(area["wilkerstat_id"])
+        if index is None:
+            continue
+
+        points.sort(key=lambda p: p["timestamp"])
+        events = geofence_engine.process(user_id, area["wilkerstat_id"], index, points)
+        if not events:
+            continue
+
+        for event in events:
+            event["survey_id"] = area["survey_id"]
+        await db.geofence_events.insert_many([dict(e) for e in events])
+
+        recipients = await audience.supervisors_and_admins([user_id])
+        for event in events:
+            await manager.broadcast_to_users({
+                "type": "geofence_event",
+                "data": {**event, "timestamp": event["timestamp"].isoformat()}
+            }, recipients)
+
+def survey_data_patch_ops(patch: SurveyDataPatch) -> Dict[str, Dict[str, Any]]:
+    """Ubah patch jawaban menjadi $set/$unset dengan path survey_data.<pertanyaan>"""
+    paths = list(patch.set.keys()) + patch.unset
+    for path in paths:
+        parts = path.split(".")
+        if any(not part or part.startswith("$") for part in parts):
+            raise HTTPException(status_code=400, detail=f"Invalid survey_data key: {path}")
+
+    # Path yang sama atau bertumpuk (a dan a.b) akan ditolak MongoDB
+    ordered = sorted(paths)
+    for a, b in zip(ordered, ordered[1:]):
+        if a == b or b.startswith(a + "."):
+            raise HTTPException(status_code=400, detail=f"Conflicting survey_data keys: {a}, {b}")
+
+    ops: Dict[str, Dict[str, Any]] = {}
+    if patch.set:
+        ops["$set"] = {f"survey_data.{k}": v for k, v in patch.set.items()}
+    if patch.unset:
+        ops["$unset"] = {f"survey_data.{k}": "" for k in patch.unset}
+    return ops
+
+# Delta sync helpers
+async def record_tombstones(collection: str, doc_ids: List[str], user_ids: Optional[List[str]] = None):
+    """
+    Catat dokumen yang hilang dari pandangan client (dihapus atau dipindah).
+    user_ids=None berarti berlaku untuk semua user.
+    """
+    now = datetime.utcnow()
+    docs = [{
+        "collection": collection,
+        "doc_id": doc_id,
+        "user_ids": user_ids,
+        "deleted_at": now,
+        "updated_at": now
+    } for doc_id in doc_ids]
+    for start in range(0, len(docs), SYNC_PAGE_SIZE):
+        await db.tombstones.insert_many(docs[start:start + SYNC_PAGE_SIZE])
+
+async def tombstone_moved_respondents(moved: List[dict]):
+    """Tombstone untuk enumerator lama dari responden yang dipindah (doc: _id, enumerator_id lama)"""
+    by_enumerator: Dict[str, List[str]] = {}
+    for r in moved:
+        by_enumerator.setdefault(r["enumerator_id"], []).append(str(r["_id"]))
+    for enumerator_id, ids in by_enumerator.items():
+        await record_tombstones("respondents", ids, [enumerator_id])
+
+def decode_sync_token(token: str) -> Dict[str, Optional[list]]:
+    try:
+        return delta_sync.decode_token(token)
+    except delta_sync.SyncTokenError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def fetch_sync_page(collection, scope: dict, cursor: Optional[list]):
+    """Ambil satu halaman perubahan; return (docs, next_cursor, has_more)"""
+    query = {"$and": [scope, delta_sync.keyset(cursor)]}
+    docs = await collection.find(query).sort(
+        [("updated_at", 1), ("_id", 1)]
+    ).limit(SYNC_PAGE_SIZE + 1).to_list(SYNC_PAGE_SIZE + 1)
+
+    has_more = len(docs) > SYNC_PAGE_SIZE
+    docs = docs[:SYNC_PAGE_SIZE]
+    safe = datetime.utcnow() - SYNC_SAFETY_WINDOW
+    return docs, delta_sync.next_cursor(docs, cursor, has_more, safe), has_more
+
+async def touch_broadcast_receipts(message: dict, now: datetime, deleted: bool = False):
+    """
+    Broadcast yang diedit/dihapus: majukan updated_at receipt supaya ikut delta sync penerima.
+    Receipt broadcast yang dihapus ditandai deleted agar tidak memakan slot daftar broadcast.
+    """
+    if message.get("message_type") == MessageType.BROADCAST:
+        update = {"updated_at": now}
+        if deleted:
+            update["deleted"] = True
+        await db.broadcast_receipts.update_many(
+            {"message_id": str(message["_id"])}, {"$set": update}
+        )
+
+async def get_latest_positions(user_ids: List[str]) -> Dict[str, tuple]:
+    """Posisi terakhir (lat, lon) tiap user dari koleksi locations"""
+    pipeline = [
+        {"$match": {"user_id": {"$in": user_ids}}},
+        {"$sort": {"timestamp": -1}},
+        {"$group": {
+            "_id": "$user_id",
+            "latitude": {"$first": "$latitude"},
+            "longitude": {"$first": "$longitude"}
+        }}
+    ]
+    rows = await db.locations.aggregate(pipeline).to_list(None)
+    return {r["_id"]: (r["latitude"], r["longitude"]) for r in rows}
+
+# Background jobs
+background_tasks = set()
+
+def spawn_background(coro):
+    """Jalankan coroutine di background dan simpan referensinya agar tidak di-GC"""
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+async def notify_job_progress(user_id: str, data: dict):
+    await manager.send_personal_message({"type": "job_progress", "data": data}, user_id)
+
+job_runner = JobRunner(
+    db.jobs, notify_job_progress, workers=JOB_WORKERS, files_dir=JOB_FILES_DIR, retention=JOB_RETENTION
+)
+
+async def respondent_import_job(ctx):
+    """
+    Import responden per chunk. Checkpoint = baris terakhir yang sudah ditulis;
+    saat resume, sisa insert setelah checkpoint dihapus lalu baris dilanjutkan.
+    """
+    survey_id = ctx.params["survey_id"]
+    path = ctx.params["path"]
+    if not os.path.exists(path):
+        raise JobError("Uploaded file is no longer available")
+
+    last_line = ctx.checkpoint.get("line", 1)
+    if ctx.resumed:
+        stale = {"import_job_id": ctx.job_id, "import_line": {"$gt": last_line}}
+        await unindex_search("respondents", stale)
+        await db.respondents.delete_many(stale)
+    for key in ("processed", "inserted", "failed"):
+        ctx.progress.setdefault(key, 0)
+
+    try:
+        index = await get_survey_polygon_index(survey_id)
+        rows = iter_rows(path, ctx.params["fmt"])
+
+        while True:
+            # Parsing file berjalan di thread agar event loop tetap bebas
+            chunk = await asyncio.to_thread(read_chunk, rows, RESPONDENT_IMPORT_CHUNK_SIZE)
+            if not chunk:
+                break
+            chunk_end = chunk[-1][0]
+            chunk = [(line, raw) for line, raw in chunk if line > last_line]
+            if not chunk:
+                continue
+
+            normalized = []
+            for line, raw in chunk:
+                try:
+                    normalized.append((line, normalize_row(raw)))
+                except ValueError as e:
+                    ctx.error(line, str(e))
+
+            # Satu query $in untuk semua email enumerator di chunk ini
+            emails = list({r["enumerator_email"] for _, r in normalized
+                           if r["enumerator_email"] and not r["enumerator_id"]})
+            email_to_id = {}
+            if emails:
+                users = await db.users.find(
+                    {"email": {"$in": emails}, "role": UserRole.ENUMERATOR}, {"email": 1}
+                ).to_list(None)
+                email_to_id = {u["email"]: str(u["_id"]) for u in users}
+
+            # region_code yang kosong diisi dari polygon Wilkerstat sekaligus
+            missing = [r for _, r in normalized if not r["region_code"]]
+            if index is not None and missing:
+                codes = await asyncio.to_thread(
+                    index.resolve,
+                    [r["location"]["longitude"] for r in missing],
+                    [r["location"]["latitude"] for r in missing]
+                )
+                for r, code in zip(missing, codes):
+                    r["region_code"] = str(code) if code is not None else None
+
+            now = datetime.utcnow()
+            docs, doc_lines = [], []
+            for line, r in normalized:
+                email = r.pop("enumerator_email")
+                if not r["enumerator_id"] and email:
+                    r["enumerator_id"] = email_to_id.get(email)
+                    if not r["enumerator_id"]:
+                        ctx.error(line, f"Unknown enumerator_email: {email}")
+                        continue
+                try:
+                    doc = RespondentCreate(survey_id=survey_id, **r).dict()
+                except ValidationError as e:
+                    ctx.error(line, str(e))
+                    continue
+                doc.update({
+                    "status": SurveyStatus.PENDING,
+                    "assigned_by": ctx.user_id,
+                    "created_at": now,
+                    "updated_at": now,
+                    "import_job_id": ctx.job_id,
+                    "import_line": line
+                })
+                docs.append(doc)
+                doc_lines.append(line)
+
+            if docs:
+                try:
+                    result = await db.respondents.insert_many(docs, ordered=False)
+                    ctx.progress["inserted"] += len(result.inserted_ids)
+                except BulkWriteError as e:
+                    ctx.progress["inserted"] += e.details.get("nInserted", 0)
+                    for write_error in e.details.get("writeErrors", []):
+                        ctx.error(doc_lines[write_error["index"]], write_error.get("errmsg", "Write failed"))
+                invalidate_routes({d["enumerator_id"] for d in docs})
+                await reindex_search("respondents", {"import_job_id": ctx.job_id, "import_line": {"$in": doc_lines}})
+
+            ctx.progress["processed"] += len(chunk)
+            last_line = chunk_end
+            await ctx.report(checkpoint={"line": last_line})
+
+    except ImportFormatError as e:
+        raise JobError(str(e))
+
+    return {"inserted": ctx.progress["inserted"], "failed": ctx.progress["failed"]}
+
+async def bulk_user_upload_job(ctx):
+    """Bulk upload user sebagai job; pipeline-nya idempoten sehingga resume cukup diulang"""
+    data = BulkUploadRequest(**ctx.params)
+    result = await process_bulk_users(ObjectId(data.survey_id), data.users, ctx)
+    ctx.progress = {"processed": len(data.users), "created": len(result["created_users"])}
+    ctx.errors = []
+    for error in result["errors"]:
+        ctx.error(error["row"], error["error"])
+    return {"created_users": result["created_users"], "message": result["message"]}
+
+async def wilkerstat_ingest_job(ctx):
+    """Tulis fitur GeoJSON dari file upload; checkpoint = jumlah fitur yang sudah tersimpan"""
+    wilkerstat_oid = ObjectId(ctx.params["wilkerstat_id"])
+    path = ctx.params["path"]
+    if not os.path.exists(path):
+        await _discard_wilkerstat(wilkerstat_oid)
+        raise JobError("Uploaded file is no longer available")
+
+    reader = AsyncFileReader(path)
+    try:
+        return await ingest_wilkerstat_features(wilkerstat_oid, reader, ctx.params["filter_field"], ctx)
+    except GeoJSONStreamError as e:
+        await _discard_wilkerstat(wilkerstat_oid)
+        raise JobError(str(e))
+    except Exception:
+        # Termasuk JobCancelled; shutdown (CancelledError) tidak dibuang agar bisa resume
+        await _discard_wilkerstat(wilkerstat_oid)
+        raise
+    finally:
+        reader.close()
+
+async def survey_migration_job(ctx):
+    """Jalankan migrate_surveys.py per batch survey; checkpoint = _id survey terakhir"""
+    supervisor_ids = [str(u["_id"]) for u in await db.users.find({"role": UserRole.SUPERVISOR}, {"_id": 1}).to_list(None)]
+    enumerator_ids = [str(u["_id"]) for u in await db.users.find({"role": UserRole.ENUMERATOR}, {"_id": 1}).to_list(None)]
+    ctx.progress.setdefault("processed", 0)
+    ctx.progress.setdefault("updated", 0)
+    ctx.progress["total"] = await db.surveys.count_documents({})
+
+    while True:
+        query = {}
+        if ctx.checkpoint.get("last_id"):
+            query["_id"] = {"$gt": ObjectId(ctx.checkpoint["last_id"])}
+        surveys = await db.surveys.find(query).sort("_id", 1).limit(JOB_BATCH_SIZE).to_list(JOB_BATCH_SIZE)
+        if not surveys:
+            break
+
+        operations = []
+        for survey in surveys:
+            update_data = migrate_surveys.survey_migration_update(survey, supervisor_ids, enumerator_ids)
+            if update_data:
+                update_data["updated_at"] = datetime.utcnow()
+                operations.append(UpdateOne({"_id": survey["_id"]}, {"$set": update_data}))
+        if operations:
+            await db.surveys.bulk_write(operations, ordered=False)
+
+        ctx.progress["processed"] += len(surveys)
+        ctx.progress["updated"] += len(operations)
+        await ctx.report(checkpoint={"last_id": str(surveys[-1]["_id"])})
+
+    return {"updated": ctx.progress["updated"]}
+
+def export_line(doc: dict) -> str:
+    for field in USER_PRIVATE_FIELDS:
+        doc.pop(field, None)
+    return json.dumps(jsonable_encoder(serialize_doc(doc))) + "\n"
+
+async def collection_export_job(ctx):
+    """
+    Export koleksi ke file NDJSON. Checkpoint = _id terakhir + ukuran file,
+    jadi saat resume file dipotong ke checkpoint lalu dilanjutkan.
+    """
+    collection = ctx.params["collection"]
+    path = os.path.join(JOB_FILES_DIR, f"{collection}_{ctx.job_id}.ndjson")
+    os.makedirs(JOB_FILES_DIR, exist_ok=True)
+    offset = ctx.checkpoint.get("offset", 0)
+    ctx.progress.setdefault("exported", 0)
+    ctx.progress["total"] = await db[collection].estimated_document_count()
+
+    with open(path, "r+b" if offset and os.path.exists(path) else "wb") as out:
+        out.truncate(offset)
+        out.seek(offset)
+        while True:
+            query = {}
+            if ctx.checkpoint.get("last_id"):
+                query["_id"] = {"$gt": ObjectId(ctx.checkpoint["last_id"])}
+            docs = await db[collection].find(query).sort("_id", 1).limit(JOB_BATCH_SIZE).to_list(JOB_BATCH_SIZE)
+            if not docs:
+                break
+            last_id = str(docs[-1]["_id"])
+            data = "".join(export_line(doc) for doc in docs).encode("utf-8")
+            await asyncio.to_thread(out.write, data)
+            out.flush()
+
+            ctx.progress["exported"] += len(docs)
+            await ctx.report(checkpoint={"last_id": last_id, "offset": out.tell()})
+
+    return {"file": os.path.basename(path), "size_bytes": os.path.getsize(path)}
+
+job_runner.register("respondent_import", respondent_import_job)
+job_runner.register("bulk_user_upload", bulk_user_upload_job)
+job_runner.register("wilkerstat_ingest", wilkerstat_ingest_job)
+job_runner.register("survey_migration", survey_migration_job)
+job_runner.register("collection_export", collection_export_job)
+
+async def archive_keep(name: str) -> Optional[dict]:
+    """
+    Dokumen lama yang tetap di koleksi utama: broadcast (receipt & status bacanya
+    merujuk ke pesan), pesan enumerator ke supervisor/admin yang belum dijawab, dan
+    pertanyaan AI yang masih PENDING. Balasan supervisor dan chat lain tetap diarsipkan.
+    """
+    if name != "messages":
+        return None
+    staff = await db.users.distinct("_id", {"role": {"$in": [UserRole.SUPERVISOR, UserRole.ADMIN]}})
+    return {"$or": [
+        {"message_type": MessageType.BROADCAST},
+        {"message_type": MessageType.AI, "ai_status": AIStatus.PENDING},
+        {
+            "message_type": MessageType.SUPERVISOR,
+            "answered": False,
+            "is_deleted": {"$ne": True},
+            "receiver_id": {"$in": [str(uid) for uid in staff]}
+        }
+    ]}
+
+async def archive_job(ctx):
+    """Pindahkan pesan & lokasi lama ke koleksi arsip; aman diulang jika terputus"""
+    cutoff = ctx.params["cutoff"]
+    result = {}
+    for name in ARCHIVE_COLLECTIONS:
+        keep = await archive_keep(name)
+        ctx.progress.setdefault(name, 0)
+
+        async def on_batch(docs, name=name):
+            if name == "messages" and search_engine.incremental:
+                search_engine.remove(name, [doc["_id"] for doc in docs])
+            ctx.progress[name] += len(docs)
+            await ctx.report()
+
+        result[name] = await archiver.archive(name, cutoff, keep, on_batch=on_batch)
+    return result
+
+job_runner.register("archive", archive_job)
+
+async def archive_scheduler():
+    """Jadwalkan job archive berkala (kecuali masih ada yang antre/berjalan)"""
+    while True:
+        try:
+            active = await db.jobs.find_one(
+                {"type": "archive", "status": {"$in": [JobStatus.QUEUED, JobStatus.RUNNING]}}, {"_id": 1}
+            )
+            if not active:
+                cutoff = datetime.utcnow() - timedelta(days=ARCHIVE_AFTER_DAYS)
+                await job_runner.submit("archive", None, {"cutoff": cutoff})
+        except Exception as e:
+            logger.error(f"Archive scheduling failed: {e}")
+        await asyncio.sleep(ARCHIVE_INTERVAL.total_seconds())
+
+async def job_cleanup_scheduler():
+    """Hapus job lama beserta file hasilnya secara berkala"""
+    while True:
+        try:
+            purged = await job_runner.purge_expired()
+            if purged["jobs"] or purged["files"]:
+                logger.info(f"Job cleanup: {purged['jobs']} jobs, {purged['files']} files removed")
+        except Exception as e:
+            logger.error(f"Job cleanup failed: {e}")
+        await asyncio.sleep(JOB_CLEANUP_INTERVAL.total_seconds())
+
 # Auth routes
 @api_router.post("/auth/register", response_model=Token)
 async def register(user_data: UserCreate):
@@ -387,6 +1243,7 @@ async def register(user_data: UserCreate):
     
     result = await db.users.insert_one(user_dict)
     user_id = str(result.inserted_id)
+    audience.update_user(user_id, user_dict["role"], user_dict.get("supervisor_id"))
     
     # Create token
     access_token = create_access_token(data={"sub": user_id})
@@ -520,6 +1377,7 @@ async def create_user_admin(
 
     # 5. Simpan ke Database
     result = await db.users.insert_one(user_dict)
+    audience.update_user(str(result.inserted_id), user_dict["role"], user_dict.get("supervisor_id"))
     
     # 6. Kembalikan data user (tanpa password)
     user_dict["id"] = str(result.inserted_id)
@@ -591,6 +1449,8 @@ async def update_user(
 
         # 6. Kembalikan data user terbaru
         updated_user = await db.users.find_one({"_id": ObjectId(user_id)})
+        audience.update_user(user_id, updated_user.get("role"), updated_user.get("supervisor_id"))
+        user_profiles.invalidate(user_id)
         serialized = serialize_doc(updated_user)
         
         # Hapus password hash dari response
@@ -612,6 +1472,7 @@ async def create_survey(survey: SurveyCreate, current_user: dict = Depends(get_c
     survey_dict = survey.dict()
     survey_dict["created_by"] = current_user["id"]
     survey_dict["created_at"] = datetime.utcnow()
+    survey_dict["updated_at"] = survey_dict["created_at"]
     survey_dict["is_active"] = True
     
     result = await db.surveys.insert_one(survey_dict)
@@ -643,6 +1504,7 @@ async def update_survey(survey_id: str, survey_data: dict, current_user: dict =
     if current_user["role"] not in [UserRole.ADMIN, UserRole.SUPERVISOR]:
         raise HTTPException(status_code=403, detail="Only admins and supervisors can update surveys")
     
+    survey_data["updated_at"] = datetime.utcnow()
     result = await db.surveys.update_one(
         {"_id": ObjectId(survey_id)},
         {"$set": survey_data}
@@ -662,9 +1524,14 @@ async def create_respondent(respondent: RespondentCreate, current_user: dict = D
     respondent_dict["assigned_by"] = current_user["id"]
     respondent_dict["created_at"] = datetime.utcnow()
     respondent_dict["updated_at"] = datetime.utcnow()
+
+    if not respondent_dict.get("region_code"):
+        respondent_dict["region_code"] = await resolve_region_code(respondent.survey_id, respondent.location)
     
     result = await db.respondents.insert_one(respondent_dict)
     respondent_dict["id"] = str(result.inserted_id)
+    invalidate_routes([respondent_dict.get("enumerator_id")])
+    await reindex_search("respondents", {"_id": result.inserted_id})
     
     return respondent_dict
 
@@ -685,6 +1552,135 @@ async def get_respondents(survey_id: Optional[str] = None, current_user: dict =
     respondents = await db.respondents.find(query).to_list(1000)
     return [serialize_doc(r) for r in respondents]
 
+@api_router.post("/respondents/resolve-regions")
+async def resolve_respondent_regions(
+    survey_id: Optional[str] = None,
+    overwrite: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Backfill region_code responden dari polygon Wilkerstat survey.
+    Tanpa survey_id, semua survey yang punya wilkerstat_id diproses (Admin only).
+    """
+    if current_user["role"] not in [UserRole.ADMIN, UserRole.SUPERVISOR]:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    if not survey_id and current_user["role"] != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Only admins can backfill all surveys")
+
+    if survey_id:
+        survey_ids = [survey_id]
+    else:
+        surveys = await db.surveys.find(
+            {"wilkerstat_id": {"$nin": [None, ""]}}, {"_id": 1}
+        ).to_list(1000)
+        survey_ids = [str(s["_id"]) for s in surveys]
+
+    results = {}
+    for sid in survey_ids:
+        results[sid] = await backfill_region_codes(sid, overwrite=overwrite)
+
+    return {"success": True, "surveys": results}
+
+@api_router.post("/surveys/{survey_id}/respondents/import", status_code=202)
+async def import_respondents(
+    survey_id: str,
+    file: UploadFile = File(...),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Import responden massal dari CSV/XLSX.
+    File disimpan sementara lalu diproses sebagai job di background;
+    progress bisa dipantau lewat GET /jobs/{job_id} atau WebSocket (job_progress).
+    """
+    if current_user["role"] not in [UserRole.ADMIN, UserRole.SUPERVISOR]:
+        raise HTTPException(status_code=403, detail="Only admins and supervisors can import respondents")
+
+    survey = await db.surveys.find_one({"_id": ObjectId(survey_id)}, {"_id": 1})
+    if not survey:
+        raise HTTPException(status_code=404, detail="Survey not found")
+
+    try:
+        fmt = detect_format(file.filename)
+    except ImportFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # UploadFile ditutup setelah request selesai, jadi salin dulu ke disk
+    path = await spool_upload(file, JOB_FILES_DIR, f".{fmt}")
+    job_id = await job_runner.submit(
+        "respondent_import", current_user["id"],
+        {"survey_id": survey_id, "fmt": fmt, "path": path},
+        survey_id=survey_id, filename=file.filename
+    )
+
+    return {"success": True, "job_id": job_id, "status": JobStatus.QUEUED}
+
+@api_router.post("/surveys/migrate", status_code=202)
+async def migrate_surveys_job(current_user: dict = Depends(get_current_user)):
+    """Jalankan migrasi skema survey (migrate_surveys.py) sebagai job"""
+    if current_user["role"] != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Only admins can run migrations")
+    job_id = await job_runner.submit("survey_migration", current_user["id"])
+    return {"success": True, "job_id": job_id, "status": JobStatus.QUEUED}
+
+@api_router.post("/exports/{collection_name}", status_code=202)
+async def export_collection_job(collection_name: str, current_user: dict = Depends(get_current_user)):
+    """Export satu koleksi ke NDJSON sebagai job; unduh lewat GET /jobs/{job_id}/download"""
+    if current_user["role"] != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Only admins can export data")
+    if collection_name not in EXPORTABLE_COLLECTIONS:
+        raise HTTPException(status_code=400, detail="Invalid collection")
+    job_id = await job_runner.submit("collection_export", current_user["id"], {"collection": collection_name})
+    return {"success": True, "job_id": job_id, "status": JobStatus.QUEUED}
+
+async def get_owned_job(job_id: str, current_user: dict) -> dict:
+    try:
+        job = await db.jobs.find_one({"_id": ObjectId(job_id)}, {"params": 0})
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid job id")
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.get("created_by") != current_user["id"] and current_user["role"] != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    return job
+
+@api_router.get("/jobs")
+async def get_jobs(
+    status: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    current_user: dict = Depends(get_current_user)
+):
+    """Job milik user (Admin: semua job), terbaru dulu"""
+    query = {}
+    if current_user["role"] != UserRole.ADMIN:
+        query["created_by"] = current_user["id"]
+    if status:
+        query["status"] = status
+    jobs = await db.jobs.find(query, {"params": 0, "errors": 0}).sort("created_at", -1).limit(limit).to_list(limit)
+    return serialize_doc(jobs)
+
+@api_router.get("/jobs/{job_id}")
+async def get_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    return serialize_doc(await get_owned_job(job_id, current_user))
+
+@api_router.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Job antre langsung dibatalkan; job yang berjalan berhenti di checkpoint berikutnya"""
+    await get_owned_job(job_id, current_user)
+    if not await job_runner.cancel(job_id):
+        raise HTTPException(status_code=409, detail="Job already finished")
+    return {"success": True, "message": "Cancellation requested"}
+
+@api_router.get("/jobs/{job_id}/download")
+async def download_job_result(job_id: str, current_user: dict = Depends(get_current_user)):
+    job = await get_owned_job(job_id, current_user)
+    file_name = (job.get("result") or {}).get("file")
+    if job["status"] != JobStatus.COMPLETED or not file_name:
+        raise HTTPException(status_code=404, detail="Job has no downloadable result")
+    path = os.path.join(JOB_FILES_DIR, file_name)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=410, detail="Export file is no longer available")
+    return FileResponse(path, media_type="application/x-ndjson", filename=file_name)
+
 @api_router.get("/surveys/{survey_id}/stats")
 async def get_survey_stats(survey_id: str, current_user: dict = Depends(get_current_user)):
     query = {"survey_id": survey_id}
@@ -715,11 +1711,13 @@ async def upload_wilkerstat(
     file: UploadFile = File(...),
     name: str = Form(...),
     filter_field: str = Form(...),
+    background: bool = False,
     current_user: dict = Depends(get_current_user)
 ):
     """
     Upload GeoJSON file dan simpan ke database.
     Hanya Admin dan Supervisor yang boleh upload.
+    Dengan ?background=true file disimpan dulu lalu diproses sebagai job (202 + job_id).
     """
     if current_user["role"] not in [UserRole.ADMIN, UserRole.SUPERVISOR]:
         raise HTTPException(status_code=403, detail="Permission denied")
@@ -728,38 +1726,132 @@ async def upload_wilkerstat(
     if not file.filename.endswith(('.json', '.geojson')):
         raise HTTPException(status_code=400, detail="Invalid file type. Must be JSON or GeoJSON.")
 
-    try:
-        # Baca isi file
-        content = await file.read()
-        geojson_data = json.loads(content.decode("utf-8"))
-
-        # Validasi dasar GeoJSON
-        if geojson_data.get("type") != "FeatureCollection" or not geojson_data.get("features"):
-             raise HTTPException(status_code=400, detail="Invalid GeoJSON format")
-
-        # Siapkan dokumen untuk disimpan
-        wilkerstat_doc = {
-            "name": name,
-            "filter_field": filter_field,
-            "uploadedAt": datetime.utcnow(),
-            "uploadedBy": current_user["id"],
-            "geojson": geojson_data  # Simpan seluruh data peta di sini
-        }
+    # Dokumen metadata dibuat dulu, fitur ditulis bertahap ke wilkerstat_features
+    wilkerstat_doc = {
+        "name": name,
+        "filter_field": filter_field,
+        "uploadedAt": datetime.utcnow(),
+        "uploadedBy": current_user["id"],
+        "storage": "features",
+        "status": "uploading"
+    }
+    result = await db.wilkerstats.insert_one(wilkerstat_doc)
+    wilkerstat_id = str(result.inserted_id)
+
+    if background:
+        path = await spool_upload(file, JOB_FILES_DIR, ".geojson")
+        job_id = await job_runner.submit(
+            "wilkerstat_ingest", current_user["id"],
+            {"wilkerstat_id": wilkerstat_id, "filter_field": filter_field, "path": path},
+            filename=file.filename
+        )
+        return JSONResponse(status_code=202, content={
+            "success": True, "id": wilkerstat_id, "job_id": job_id, "status": JobStatus.QUEUED
+        })
 
-        result = await db.wilkerstats.insert_one(wilkerstat_doc)
-        
+    try:
+        summary = await ingest_wilkerstat_features(result.inserted_id, file, filter_field)
         return {
             "success": True, 
-            "id": str(result.inserted_id), 
+            "id": wilkerstat_id, 
+            "feature_count": summary["feature_count"],
             "message": "Wilkerstat uploaded successfully"
         }
 
-    except json.JSONDecodeError:
-        raise HTTPException(status_code=400, detail="Invalid JSON file content")
+    except GeoJSONStreamError as e:
+        await _discard_wilkerstat(result.inserted_id)
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
+        await _discard_wilkerstat(result.inserted_id)
         logging.error(f"Error uploading wilkerstat: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
+async def ingest_wilkerstat_features(wilkerstat_oid: ObjectId, stream, filter_field: str, ctx=None) -> dict:
+    """
+    Parse FeatureCollection dari stream dan tulis per batch ke wilkerstat_features.
+    Jika dijalankan sebagai job (ctx), jumlah fitur tersimpan jadi checkpoint:
+    saat resume fitur setelah checkpoint dihapus dan yang sebelumnya dilewati.
+    """
+    wilkerstat_id = str(wilkerstat_oid)
+    saved = ctx.checkpoint.get("features", 0) if ctx else 0
+    if ctx and ctx.resumed:
+        await db.wilkerstat_features.delete_many({"wilkerstat_id": wilkerstat_id, "seq": {"$gte": saved}})
+
+    reader = FeatureCollectionReader(stream)
+    batch = []
+
+    async def flush():
+        nonlocal batch
+        if batch:
+            await db.wilkerstat_features.insert_many(batch, ordered=False)
+            batch = []
+        if ctx:
+            ctx.progress.update({"features": reader.feature_count, "bytes_read": reader.bytes_read})
+            await ctx.report(checkpoint={"features": reader.feature_count})
+
+    async for feature, vertex_count, bbox in reader.features():
+        seq = reader.feature_count - 1
+        if seq < saved:
+            continue
+        properties = feature.get("properties") or {}
+        batch.append({
+            "wilkerstat_id": wilkerstat_id,
+            "seq": seq,
+            "filter_value": properties.get(filter_field),
+            "properties": properties,
+            "geometry": feature.get("geometry"),
+            "bbox": bbox,
+            "vertex_count": vertex_count
+        })
+        if len(batch) >= WILKERSTAT_FEATURE_BATCH_SIZE:
+            await flush()
+
+    await flush()
+
+    await db.wilkerstats.update_one(
+        {"_id": wilkerstat_oid},
+        {"$set": {
+            "status": "ready",
+            "header": {k: v for k, v in reader.header.items() if k != "type"},
+            "feature_count": reader.feature_count,
+            "vertex_count": reader.vertex_count,
+            "bbox": reader.bbox,
+            "size_bytes": reader.bytes_read
+        }}
+    )
+    # Status berubah jadi "ready": index lama (jika ada) dibangun ulang dari fitur lengkap
+    spatial_indexes.invalidate(wilkerstat_id)
+    return {"feature_count": reader.feature_count}
+
+async def _discard_wilkerstat(wilkerstat_oid: ObjectId):
+    """Hapus sisa upload yang gagal di tengah jalan"""
+    await db.wilkerstat_features.delete_many({"wilkerstat_id": str(wilkerstat_oid)})
+    await db.wilkerstats.delete_one({"_id": wilkerstat_oid})
+    spatial_indexes.invalidate(str(wilkerstat_oid))
+
+async def stream_feature_collection(wilkerstat: dict):
+    """Rakit ulang FeatureCollection dari wilkerstat_features tanpa memuat semuanya ke memori"""
+    header = {"type": "FeatureCollection", **wilkerstat.get("header", {})}
+    head = json.dumps(header)
+    yield head[:-1] + ', "features": ['
+
+    cursor = db.wilkerstat_features.find(
+        {"wilkerstat_id": str(wilkerstat["_id"])},
+        {"_id": 0, "properties": 1, "geometry": 1}
+    ).sort("seq", 1).batch_size(WILKERSTAT_FEATURE_BATCH_SIZE)
+
+    first = True
+    async for feature in cursor:
+        chunk = json.dumps({
+            "type": "Feature",
+            "properties": feature.get("properties"),
+            "geometry": feature.get("geometry")
+        })
+        yield chunk if first else "," + chunk
+        first = False
+
+    yield "]}"
+
 @api_router.get("/wilkerstats", response_model=List[Wilkerstat])
 async def get_wilkerstats(current_user: dict = Depends(get_current_user)):
     """
@@ -780,7 +1872,11 @@ async def get_wilkerstat_geojson(wilkerstat_id: str, current_user: dict = Depend
     if not wilkerstat:
         raise HTTPException(status_code=404, detail="Wilkerstat not found")
     
-    return wilkerstat.get("geojson", {})
+    # Data lama masih menyimpan seluruh peta di field "geojson"
+    if "geojson" in wilkerstat:
+        return wilkerstat["geojson"]
+
+    return StreamingResponse(stream_feature_collection(wilkerstat), media_type="application/geo+json")
 
 @api_router.put("/wilkerstats/{wilkerstat_id}")
 async def update_wilkerstat(
@@ -808,7 +1904,7 @@ async def update_wilkerstat(
         update_query["name"] = update_data.name
 
     incoming_filter = update_data.filterField or update_data.filter_field
-    if update_data.filter_field:
+    if incoming_filter:
         update_query["filter_field"] = incoming_filter
 
     # Jika tidak ada data yang valid untuk diupdate
@@ -828,6 +1924,14 @@ async def update_wilkerstat(
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Wilkerstat not found")
 
+        # Nilai filter per fitur ikut dihitung ulang dari properties
+        if "filter_field" in update_query:
+            await db.wilkerstat_features.update_many(
+                {"wilkerstat_id": wilkerstat_id},
+                [{"$set": {"filter_value": f"$properties.{incoming_filter}"}}]
+            )
+            spatial_indexes.invalidate(wilkerstat_id)
+
         # 5. Ambil data terbaru (tanpa geojson agar respon cepat)
         updated_wilkerstat = await db.wilkerstats.find_one(
             {"_id": ObjectId(wilkerstat_id)}, 
@@ -850,6 +1954,9 @@ async def delete_wilkerstat(wilkerstat_id: str, current_user: dict = Depends(get
     
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Wilkerstat not found")
+
+    await db.wilkerstat_features.delete_many({"wilkerstat_id": wilkerstat_id})
+    spatial_indexes.invalidate(wilkerstat_id)
         
     return {"success": True, "message": "Wilkerstat deleted"}
 
@@ -868,69 +1975,189 @@ class AssignmentRequest(BaseModel):
     supervisor_ids: List[str]
     enumerator_ids: List[str]
 
+class AutoAssignmentRequest(BaseModel):
+    enumerator_ids: Optional[List[str]] = None  # Default: semua enumerator survey
+    capacity: Optional[int] = None  # Maks responden per enumerator, default dibagi rata
+    only_unassigned: bool = False
+
 @api_router.post("/surveys/{survey_id}/bulk-upload")
-async def bulk_upload_users(survey_id: str, data: BulkUploadRequest, current_user: dict = Depends(get_current_user)):
-    """Bulk upload supervisors and enumerators for a survey"""
+async def bulk_upload_users(
+    survey_id: str,
+    data: BulkUploadRequest,
+    background: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Bulk upload supervisors and enumerators for a survey.
+    Dengan ?background=true diproses sebagai job (202 + job_id).
+    """
     if current_user["role"] not in [UserRole.ADMIN, UserRole.SUPERVISOR]:
         raise HTTPException(status_code=403, detail="Only admins and supervisors can bulk upload")
-    
+
+    try:
+        survey_oid = ObjectId(survey_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid survey id")
+    if not await db.surveys.find_one({"_id": survey_oid}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Survey not found")
+
+    if background:
+        params = data.dict()
+        params["survey_id"] = survey_id
+        job_id = await job_runner.submit("bulk_user_upload", current_user["id"], params, survey_id=survey_id)
+        return JSONResponse(status_code=202, content={"success": True, "job_id": job_id, "status": JobStatus.QUEUED})
+
+    return await process_bulk_users(survey_oid, data.users)
+
+async def process_bulk_users(survey_oid: ObjectId, users: List[BulkUserData], ctx: Optional[JobContext] = None) -> dict:
+    """
+    Pipeline bulk upload: satu lookup email, satu hash password default,
+    bulk_write user per JOB_BATCH_SIZE operasi dan satu $addToSet ke survey.
+    Aman diulang: user yang sudah ada hanya di-update.
+    Sebagai job (ctx), progress dilaporkan tiap batch dan pembatalan dicek di antara batch;
+    user yang sudah tertulis tetap ada, upload ulang melengkapi sisanya.
+    """
     created_users = []
     errors = []
-    
-    for idx, user_data in enumerate(data.users):
-        try:
-            # Create supervisor if doesn't exist
-            supervisor = await db.users.find_one({"email": user_data.supervisor_email})
-            if not supervisor:
-                supervisor_doc = {
-                    "username": user_data.supervisor_email.split('@')[0],
-                    "email": user_data.supervisor_email,
-                    "password": get_password_hash("password123"),  # Default password
-                    "role": UserRole.SUPERVISOR,
-                    "created_at": datetime.utcnow()
-                }
-                result = await db.users.insert_one(supervisor_doc)
-                supervisor_id = str(result.inserted_id)
-                created_users.append({"email": user_data.supervisor_email, "role": "supervisor", "id": supervisor_id})
-            else:
-                supervisor_id = str(supervisor["_id"])
-            
-            # Create enumerator if doesn't exist
-            enumerator = await db.users.find_one({"email": user_data.enumerator_email})
-            if not enumerator:
-                enumerator_doc = {
-                    "username": user_data.enumerator_email.split('@')[0],
-                    "email": user_data.enumerator_email,
-                    "password": get_password_hash("password123"),  # Default password
-                    "role": UserRole.ENUMERATOR,
-                    "supervisor_id": supervisor_id,
-                    "created_at": datetime.utcnow()
-                }
-                result = await db.users.insert_one(enumerator_doc)
-                enumerator_id = str(result.inserted_id)
-                created_users.append({"email": user_data.enumerator_email, "role": "enumerator", "id": enumerator_id})
-            else:
-                enumerator_id = str(enumerator["_id"])
-                # Update supervisor assignment
-                await db.users.update_one(
-                    {"_id": ObjectId(enumerator_id)},
+
+    # 1. Validasi baris; enumerator yang muncul di beberapa baris ikut supervisor baris terakhir
+    rows = []
+    enumerator_supervisor: Dict[str, str] = {}
+    for idx, user_data in enumerate(users):
+        supervisor_email = user_data.supervisor_email.strip()
+        enumerator_email = user_data.enumerator_email.strip()
+        if "@" not in supervisor_email or "@" not in enumerator_email:
+            errors.append({"row": idx + 1, "error": "Invalid email address"})
+            continue
+        if supervisor_email == enumerator_email:
+            errors.append({"row": idx + 1, "error": "Supervisor and enumerator email must differ"})
+            continue
+        rows.append((idx + 1, supervisor_email, enumerator_email))
+        enumerator_supervisor[enumerator_email] = supervisor_email
+
+    if not rows:
+        return {
+            "success": True,
+            "created_users": created_users,
+            "errors": errors,
+            "message": f"Created 0 users with {len(errors)} errors"
+        }
+
+    # 2. Satu query untuk semua email
+    emails = {email for _, sup, enum in rows for email in (sup, enum)}
+    existing = {
+        u["email"]: u
+        for u in await db.users.find({"email": {"$in": list(emails)}}, {"email": 1, "supervisor_id": 1}).to_list(None)
+    }
+    user_ids = {email: str(u["_id"]) for email, u in existing.items()}
+
+    # 3. Hash password default sekali saja (bcrypt mahal, jalankan di thread)
+    default_password = await asyncio.to_thread(get_password_hash, "password123")
+    now = datetime.utcnow()
+
+    # 4. Susun semua operasi user untuk satu bulk_write
+    operations = []
+    operation_emails = []
+    new_roles = {}
+    supervisor_emails = list(dict.fromkeys(sup for _, sup, _ in rows))
+    # Email baru yang dipakai sebagai supervisor dan enumerator sekaligus tidak dibuat
+    conflicting = {e for e in supervisor_emails if e in enumerator_supervisor and e not in existing}
+    for email in supervisor_emails:
+        if email in user_ids or email in conflicting:
+            continue
+        oid = ObjectId()
+        user_ids[email] = str(oid)
+        new_roles[email] = UserRole.SUPERVISOR
+        operations.append(InsertOne({
+            "_id": oid,
+            "username": email.split('@')[0],
+            "email": email,
+            "password": default_password,
+            "role": UserRole.SUPERVISOR,
+            "created_at": now
+        }))
+        operation_emails.append(email)
+
+    for email, supervisor_email in enumerator_supervisor.items():
+        if supervisor_email in conflicting:
+            continue
+        supervisor_id = user_ids[supervisor_email]
+        if email in existing:
+            if existing[email].get("supervisor_id") != supervisor_id:
+                operations.append(UpdateOne(
+                    {"_id": existing[email]["_id"]},
                     {"$set": {"supervisor_id": supervisor_id}}
-                )
-            
-            # Add to survey
-            await db.surveys.update_one(
-                {"_id": ObjectId(survey_id)},
-                {
-                    "$addToSet": {
-                        "supervisor_ids": supervisor_id,
-                        "enumerator_ids": enumerator_id
-                    }
-                }
-            )
-            
-        except Exception as e:
-            errors.append({"row": idx + 1, "error": str(e)})
-    
+                ))
+                operation_emails.append(email)
+            continue
+        oid = ObjectId()
+        user_ids[email] = str(oid)
+        new_roles[email] = UserRole.ENUMERATOR
+        operations.append(InsertOne({
+            "_id": oid,
+            "username": email.split('@')[0],
+            "email": email,
+            "password": default_password,
+            "role": UserRole.ENUMERATOR,
+            "supervisor_id": supervisor_id,
+            "created_at": now
+        }))
+        operation_emails.append(email)
+
+    failed_emails: Dict[str, str] = {}
+    for start in range(0, len(operations), JOB_BATCH_SIZE):
+        try:
+            await db.users.bulk_write(operations[start:start + JOB_BATCH_SIZE], ordered=False)
+        except BulkWriteError as e:
+            for write_error in e.details.get("writeErrors", []):
+                email = operation_emails[start + write_error["index"]]
+                failed_emails[email] = write_error.get("errmsg", "Write failed")
+        if ctx:
+            ctx.progress.update({"written": min(start + JOB_BATCH_SIZE, len(operations)), "total": len(operations)})
+            await ctx.report()
+
+    for email, role in new_roles.items():
+        if email in failed_emails:
+            continue
+        if role == UserRole.SUPERVISOR:
+            audience.update_user(user_ids[email], UserRole.SUPERVISOR)
+        else:
+            audience.update_user(user_ids[email], UserRole.ENUMERATOR, user_ids[enumerator_supervisor[email]])
+        created_users.append({"email": email, "role": role, "id": user_ids[email]})
+    for email, supervisor_email in enumerator_supervisor.items():
+        if email in existing and email not in failed_emails and supervisor_email not in conflicting:
+            audience.update_user(user_ids[email], supervisor_id=user_ids[supervisor_email])
+            user_profiles.invalidate(user_ids[email])
+
+    # 5. Satu $addToSet untuk semua baris yang berhasil
+    supervisor_ids = []
+    enumerator_ids = []
+    for row, supervisor_email, enumerator_email in rows:
+        if supervisor_email in conflicting:
+            errors.append({"row": row, "error": f"{supervisor_email} is listed as an enumerator in another row"})
+            continue
+        failed = failed_emails.get(supervisor_email) or failed_emails.get(enumerator_email)
+        if not failed and enumerator_email not in user_ids:
+            failed = f"{enumerator_email} could not be created"
+        if failed:
+            errors.append({"row": row, "error": failed})
+            continue
+        supervisor_ids.append(user_ids[supervisor_email])
+        enumerator_ids.append(user_ids[enumerator_email])
+
+    if supervisor_ids:
+        await db.surveys.update_one(
+            {"_id": survey_oid},
+            {
+                "$addToSet": {
+                    "supervisor_ids": {"$each": list(dict.fromkeys(supervisor_ids))},
+                    "enumerator_ids": {"$each": list(dict.fromkeys(enumerator_ids))}
+                },
+                "$set": {"updated_at": datetime.utcnow()}
+            }
+        )
+
+    errors.sort(key=lambda e: e["row"])
     return {
         "success": True,
         "created_users": created_users,
@@ -951,7 +2178,8 @@ async def assign_users_to_survey(survey_id: str, data: AssignmentRequest, curren
             "$addToSet": {
                 "supervisor_ids": {"$each": data.supervisor_ids},
                 "enumerator_ids": {"$each": data.enumerator_ids}
-            }
+            },
+            "$set": {"updated_at": datetime.utcnow()}
         }
     )
     
@@ -960,65 +2188,417 @@ async def assign_users_to_survey(survey_id: str, data: AssignmentRequest, curren
         "message": f"Assigned {len(data.supervisor_ids)} supervisors and {len(data.enumerator_ids)} enumerators"
     }
 
-@api_router.get("/respondents/{respondent_id}")
-async def get_respondent(respondent_id: str, current_user: dict = Depends(get_current_user)):
-    respondent = await db.respondents.find_one({"_id": ObjectId(respondent_id)})
-    if not respondent:
-        raise HTTPException(status_code=404, detail="Respondent not found")
-    return serialize_doc(respondent)
+@api_router.post("/respondents/bulk-update")
+async def bulk_update_respondents(data: RespondentBulkUpdate, current_user: dict = Depends(get_current_user)):
+    """
+    Update status/enumerator banyak responden sekaligus (reassign area, tutup survey).
+    Dijalankan sebagai satu update_many dan satu event WebSocket ringkasan.
+    """
+    if current_user["role"] not in [UserRole.ADMIN, UserRole.SUPERVISOR]:
+        raise HTTPException(status_code=403, detail="Only admins and supervisors can bulk update respondents")
 
-@api_router.put("/respondents/{respondent_id}")
-async def update_respondent(respondent_id: str, update_data: RespondentUpdate, current_user: dict = Depends(get_current_user)):
-    update_dict = {k: v for k, v in update_data.dict().items() if v is not None}
-    update_dict["updated_at"] = datetime.utcnow()
-    
-    result = await db.respondents.update_one(
-        {"_id": ObjectId(respondent_id)},
-        {"$set": update_dict}
-    )
-    
-    if result.modified_count == 0:
-        raise HTTPException(status_code=404, detail="Respondent not found")
-    
-    respondent = await db.respondents.find_one({"_id": ObjectId(respondent_id)})
-    
-    # Broadcast update to connected clients
-    await manager.broadcast({
-        "type": "respondent_update",
-        "data": serialize_doc(respondent)
-    })
-    
-    return serialize_doc(respondent)
+    # 1. Susun target query
+    query: Dict[str, Any] = {}
+    if data.respondent_ids:
+        try:
+            query["_id"] = {"$in": [ObjectId(rid) for rid in data.respondent_ids]}
+        except Exception:
+            raise HTTPException(status_code=400, detail="Invalid respondent id")
+    if data.filter:
+        if data.filter.survey_id:
+            query["survey_id"] = data.filter.survey_id
+        if data.filter.enumerator_id:
+            query["enumerator_id"] = data.filter.enumerator_id
+        if data.filter.status:
+            query["status"] = data.filter.status
+        if data.filter.region_codes:
+            query["region_code"] = {"$in": data.filter.region_codes}
+    if not query:
+        raise HTTPException(status_code=400, detail="Provide respondent_ids or a non-empty filter")
+
+    # 2. Susun patch
+    patch: Dict[str, Any] = {}
+    if data.status is not None:
+        if data.status not in [SurveyStatus.PENDING, SurveyStatus.IN_PROGRESS, SurveyStatus.COMPLETED]:
+            raise HTTPException(status_code=400, detail="Invalid status")
+        patch["status"] = data.status
+    if data.enumerator_id is not None:
+        enumerator = await db.users.find_one(
+            {"_id": ObjectId(data.enumerator_id), "role": UserRole.ENUMERATOR},
+            {"supervisor_id": 1}
+        )
+        if not enumerator:
+            raise HTTPException(status_code=400, detail="Enumerator not found")
+        if current_user["role"] == UserRole.SUPERVISOR and enumerator.get("supervisor_id") != current_user["id"]:
+            raise HTTPException(status_code=403, detail="This enumerator is not under your supervision")
+        patch["enumerator_id"] = data.enumerator_id
+        patch["assigned_by"] = current_user["id"]
+    if not patch:
+        raise HTTPException(status_code=400, detail="No data provided for update")
+    patch["updated_at"] = datetime.utcnow()
 
-# Location tracking routes
-@api_router.post("/locations")
-async def create_location(location: LocationTrackingCreate, current_user: dict = Depends(get_current_user)):
-    location_dict = location.dict()
-    if not location_dict.get("timestamp"):
-        location_dict["timestamp"] = datetime.utcnow()
-    location_dict["is_synced"] = True
-    
-    result = await db.locations.insert_one(location_dict)
-    location_dict["id"] = str(result.inserted_id)
-    
-    # Serialize for response
-    serialized_location = serialize_doc(location_dict.copy())
-    
-    # Broadcast location update
-    await manager.broadcast({
-        "type": "location_update",
-        "data": serialized_location
-    })
-    
-    return serialized_location
+    # 3. Supervisor hanya boleh menyentuh responden milik enumerator bawahannya
+    if current_user["role"] == UserRole.SUPERVISOR:
+        enumerators = await db.users.find({"supervisor_id": current_user["id"]}, {"_id": 1}).to_list(1000)
+        scope = {"enumerator_id": {"$in": [str(e["_id"]) for e in enumerators]}}
+        query = {"$and": [query, scope]}
+
+    # Satu pembacaan target: _id yang akan diubah, enumerator lama (perlu tahu daftar
+    # tugasnya berubah) dan responden yang pindah enumerator
+    targets = await db.respondents.find(query, {"enumerator_id": 1}).to_list(None)
+    target_ids = [r["_id"] for r in targets]
+    previous_enumerator_ids = list(dict.fromkeys(r.get("enumerator_id") for r in targets))
+
+    moved = []
+    if "enumerator_id" in patch:
+        moved = [r for r in targets if r.get("enumerator_id") not in (None, patch["enumerator_id"])]
+
+    # Hanya _id yang sudah dibaca, supaya yang di-tombstone dan di-reindex sama dengan yang diubah
+    result = await db.respondents.update_many({"$and": [query, {"_id": {"$in": target_ids}}]}, {"$set": patch})
+
+    await tombstone_moved_respondents(moved)
+    if "enumerator_id" in patch:
+        # Scope pencarian ikut pindah
+        await reindex_search("respondents", {"_id": {"$in": target_ids}})
+
+    summary = {
+        "matched": result.matched_count,
+        "modified": result.modified_count,
+        "status": patch.get("status"),
+        "enumerator_id": patch.get("enumerator_id"),
+        "previous_enumerator_ids": [e for e in previous_enumerator_ids if e],
+        "updated_by": current_user["id"],
+        "updated_at": patch["updated_at"].isoformat()
+    }
 
-@api_router.post("/locations/batch")
-async def create_locations_batch(batch: LocationTrackingBatch, current_user: dict = Depends(get_current_user)):
+    invalidate_routes(summary["previous_enumerator_ids"] + [patch.get("enumerator_id")])
+    recipients = await audience.for_enumerators(summary["previous_enumerator_ids"] + [patch.get("enumerator_id")])
+    await manager.broadcast_to_users({
+        "type": "respondents_bulk_update",
+        "data": summary
+    }, recipients)
+
+    return {"success": True, **summary}
+
+@api_router.post("/surveys/{survey_id}/assignments/propose")
+async def propose_assignment(
+    survey_id: str,
+    data: AutoAssignmentRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Usulkan pembagian responden pending ke enumerator dengan balanced k-means
+    berdasarkan lokasi responden. Usulan disimpan dan baru berlaku setelah /apply.
+    """
+    if current_user["role"] not in [UserRole.ADMIN, UserRole.SUPERVISOR]:
+        raise HTTPException(status_code=403, detail="Only admins and supervisors can assign respondents")
+
+    survey = await db.surveys.find_one({"_id": ObjectId(survey_id)}, {"enumerator_ids": 1})
+    if not survey:
+        raise HTTPException(status_code=404, detail="Survey not found")
+
+    enumerator_ids = data.enumerator_ids or survey.get("enumerator_ids", [])
+    if current_user["role"] == UserRole.SUPERVISOR:
+        own = await db.users.find({"supervisor_id": current_user["id"]}, {"_id": 1}).to_list(1000)
+        own_ids = {str(e["_id"]) for e in own}
+        enumerator_ids = [e for e in enumerator_ids if e in own_ids]
+    if not enumerator_ids:
+        raise HTTPException(status_code=400, detail="No enumerators to assign")
+
+    query = {"survey_id": survey_id, "status": SurveyStatus.PENDING}
+    if data.only_unassigned:
+        query["enumerator_id"] = {"$in": [None, ""]}
+    elif current_user["role"] == UserRole.SUPERVISOR:
+        query["enumerator_id"] = {"$in": [None, ""] + enumerator_ids}
+
+    ids, lats, lons = [], [], []
+    async for r in db.respondents.find(query, {"location": 1}).batch_size(REGION_BACKFILL_BATCH_SIZE):
+        location = r.get("location") or {}
+        if location.get("latitude") is None or location.get("longitude") is None:
+            continue
+        ids.append(r["_id"])
+        lats.append(location["latitude"])
+        lons.append(location["longitude"])
+
+    positions = await get_latest_positions(enumerator_ids)
+    try:
+        result = await asyncio.to_thread(
+            assignment.propose, lats, lons,
+            [positions.get(e) for e in enumerator_ids],
+            data.capacity
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    groups: Dict[int, List[ObjectId]] = {}
+    for oid, idx in zip(ids, result["enumerator_index"]):
+        groups.setdefault(int(idx), []).append(oid)
+
+    assignments = []
+    for cluster in result["clusters"]:
+        idx = cluster["enumerator_index"]
+        assignments.append({
+            "enumerator_id": enumerator_ids[idx],
+            "respondent_ids": groups.get(idx, []),
+            "count": cluster["count"],
+            "center": cluster["center"],
+            "mean_distance_km": round(cluster["mean_distance_km"], 3)
+        })
+
+    proposal = {
+        "survey_id": survey_id,
+        "status": "proposed",
+        "created_by": current_user["id"],
+        "created_at": datetime.utcnow(),
+        "respondent_count": len(ids),
+        "total_distance_km": round(result["total_distance_km"], 3),
+        "assignments": assignments
+    }
+    inserted = await db.assignment_proposals.insert_one(proposal)
+
+    return {
+        "proposal_id": str(inserted.inserted_id),
+        "respondent_count": len(ids),
+        "total_distance_km": proposal["total_distance_km"],
+        "assignments": [{k: v for k, v in a.items() if k != "respondent_ids"} for a in assignments]
+    }
+
+@api_router.post("/surveys/{survey_id}/assignments/{proposal_id}/apply")
+async def apply_assignment(survey_id: str, proposal_id: str, current_user: dict = Depends(get_current_user)):
+    """Terapkan usulan pembagian dengan satu bulk_write"""
+    if current_user["role"] not in [UserRole.ADMIN, UserRole.SUPERVISOR]:
+        raise HTTPException(status_code=403, detail="Only admins and supervisors can assign respondents")
+
+    proposal = await db.assignment_proposals.find_one({"_id": ObjectId(proposal_id), "survey_id": survey_id})
+    if not proposal:
+        raise HTTPException(status_code=404, detail="Proposal not found")
+    if proposal["status"] != "proposed":
+        raise HTTPException(status_code=400, detail=f"Proposal already {proposal['status']}")
+    if current_user["role"] == UserRole.SUPERVISOR and proposal["created_by"] != current_user["id"]:
+        raise HTTPException(status_code=403, detail="Permission denied")
+
+    new_owner: Dict[ObjectId, str] = {}
+    for a in proposal["assignments"]:
+        for oid in a["respondent_ids"]:
+            new_owner[oid] = a["enumerator_id"]
+
+    # Responden proposal yang masih pending (yang akan diubah); yang pindah enumerator perlu tombstone
+    pending_ids = []
+    moved = []
+    async for r in db.respondents.find(
+        {"_id": {"$in": list(new_owner)}, "survey_id": survey_id, "status": SurveyStatus.PENDING},
+        {"enumerator_id": 1}
+    ):
+        pending_ids.append(r["_id"])
+        if r.get("enumerator_id") and new_owner[r["_id"]] != r["enumerator_id"]:
+            moved.append(r)
+
+    now = datetime.utcnow()
+    by_enumerator: Dict[str, List[ObjectId]] = {}
+    for oid in pending_ids:
+        by_enumerator.setdefault(new_owner[oid], []).append(oid)
+    operations = [
+        UpdateMany(
+            # Hanya yang masih pending; yang sudah mulai dikerjakan tidak dipindah
+            {"_id": {"$in": ids}, "status": SurveyStatus.PENDING},
+            {"$set": {"enumerator_id": enumerator_id, "assigned_by": current_user["id"], "updated_at": now}}
+        )
+        for enumerator_id, ids in by_enumerator.items()
+    ]
+    result = await db.respondents.bulk_write(operations, ordered=False) if operations else None
+
+    await tombstone_moved_respondents(moved)
+    await reindex_search("respondents", {"_id": {"$in": pending_ids}})
+    await db.assignment_proposals.update_one(
+        {"_id": proposal["_id"]},
+        {"$set": {"status": "applied", "applied_at": now, "applied_by": current_user["id"]}}
+    )
+
+    new_enumerator_ids = [a["enumerator_id"] for a in proposal["assignments"]]
+    previous_enumerator_ids = list({r["enumerator_id"] for r in moved})
+    summary = {
+        "survey_id": survey_id,
+        "proposal_id": proposal_id,
+        "matched": result.matched_count if result else 0,
+        "modified": result.modified_count if result else 0,
+        "enumerator_ids": new_enumerator_ids,
+        "previous_enumerator_ids": previous_enumerator_ids,
+        "updated_by": current_user["id"],
+        "updated_at": now.isoformat()
+    }
+    invalidate_routes(new_enumerator_ids + previous_enumerator_ids)
+    recipients = await audience.for_enumerators(new_enumerator_ids + previous_enumerator_ids)
+    await manager.broadcast_to_users({"type": "respondents_bulk_update", "data": summary}, recipients)
+
+    return {"success": True, **summary}
+
+@api_router.get("/enumerators/{enumerator_id}/route")
+async def get_enumerator_route(
+    enumerator_id: str,
+    survey_id: Optional[str] = None,
+    refresh: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Urutan kunjungan responden pending seorang enumerator, dimulai dari
+    lokasi terakhirnya. Maksimal routing.MAX_STOPS responden terdekat per rute.
+    Hasil di-cache sampai daftar tugasnya berubah.
+    """
+    if current_user["role"] == UserRole.ENUMERATOR and current_user["id"] != enumerator_id:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    if current_user["role"] == UserRole.SUPERVISOR:
+        enumerator = await db.users.find_one(
+            {"_id": ObjectId(enumerator_id), "supervisor_id": current_user["id"]}, {"_id": 1}
+        )
+        if not enumerator:
+            raise HTTPException(status_code=403, detail="This enumerator is not under your supervision")
+
+    cache_key = survey_id or ""
+    cached = route_cache.get(enumerator_id, {}).get(cache_key)
+    if cached and not refresh:
+        return {**cached, "cached": True}
+
+    generation = route_generation.get(enumerator_id, 0)
+    query = {"enumerator_id": enumerator_id, "status": SurveyStatus.PENDING}
+    if survey_id:
+        query["survey_id"] = survey_id
+    respondents = await db.respondents.find(
+        query, {"name": 1, "address": 1, "phone": 1, "location": 1, "survey_id": 1}
+    ).to_list(None)
+    respondents = [
+        r for r in respondents
+        if (r.get("location") or {}).get("latitude") is not None
+        and (r.get("location") or {}).get("longitude") is not None
+    ]
+
+    positions = await get_latest_positions([enumerator_id])
+    start = positions.get(enumerator_id)
+    plan = await asyncio.to_thread(routing.plan_route, start, [r["location"] for r in respondents])
+
+    stops = []
+    for idx, leg in zip(plan["order"], plan["legs_km"]):
+        stop = serialize_doc(respondents[idx])
+        stop["distance_from_previous_km"] = round(leg, 3)
+        stops.append(stop)
+
+    route = {
+        "enumerator_id": enumerator_id,
+        "survey_id": survey_id,
+        "start": {"latitude": start[0], "longitude": start[1]} if start else None,
+        "stops": stops,
+        "total_distance_km": round(plan["total_distance_km"], 3),
+        # Responden pending di luar batas rute harian (yang terjauh dari posisi awal)
+        "remaining_stops": plan["skipped"],
+        "computed_at": datetime.utcnow()
+    }
+    if route_generation.get(enumerator_id, 0) == generation:
+        route_cache.setdefault(enumerator_id, {})[cache_key] = route
+
+    return {**route, "cached": False}
+
+@api_router.get("/respondents/{respondent_id}")
+async def get_respondent(respondent_id: str, current_user: dict = Depends(get_current_user)):
+    respondent = await db.respondents.find_one({"_id": ObjectId(respondent_id)})
+    if not respondent:
+        raise HTTPException(status_code=404, detail="Respondent not found")
+    return serialize_doc(respondent)
+
+@api_router.put("/respondents/{respondent_id}")
+async def update_respondent(respondent_id: str, update_data: RespondentUpdate, current_user: dict = Depends(get_current_user)):
+    update_dict = {k: v for k, v in update_data.dict(exclude={"survey_data_patch"}).items() if v is not None}
+    update_dict["updated_at"] = datetime.utcnow()
+    update_ops = {"$set": update_dict}
+
+    # Patch per jawaban: hanya pertanyaan yang berubah yang ditulis, sehingga
+    # edit bersamaan pada pertanyaan berbeda tidak saling menimpa
+    if update_data.survey_data_patch:
+        if "survey_data" in update_dict:
+            raise HTTPException(status_code=400, detail="Send either survey_data or survey_data_patch, not both")
+        patch_ops = survey_data_patch_ops(update_data.survey_data_patch)
+        update_dict.update(patch_ops.get("$set", {}))
+        if "$unset" in patch_ops:
+            update_ops["$unset"] = patch_ops["$unset"]
+
+    previous = None
+    if "enumerator_id" in update_dict:
+        previous = await db.respondents.find_one({"_id": ObjectId(respondent_id)}, {"enumerator_id": 1})
+    
+    try:
+        result = await db.respondents.update_one({"_id": ObjectId(respondent_id)}, update_ops)
+    except WriteError:
+        if not update_data.survey_data_patch:
+            raise
+        # survey_data masih null pada data lama: jadikan object kosong lalu ulangi
+        await db.respondents.update_one(
+            {"_id": ObjectId(respondent_id), "survey_data": None},
+            {"$set": {"survey_data": {}}}
+        )
+        result = await db.respondents.update_one({"_id": ObjectId(respondent_id)}, update_ops)
+    
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Respondent not found")
+    
+    # Enumerator lama tidak lagi melihat responden ini saat sync
+    if previous and previous.get("enumerator_id") and previous["enumerator_id"] != update_dict["enumerator_id"]:
+        await record_tombstones("respondents", [respondent_id], [previous["enumerator_id"]])
+    if previous:
+        await reindex_search("respondents", {"_id": ObjectId(respondent_id)})
+
+    respondent = serialize_doc(await db.respondents.find_one({"_id": ObjectId(respondent_id)}))
+
+    # Kirim hanya ke enumerator responden (lama dan baru), supervisornya, dan admin
+    enumerator_ids = [respondent.get("enumerator_id")]
+    if previous:
+        enumerator_ids.append(previous.get("enumerator_id"))
+    invalidate_routes(enumerator_ids)
+    recipients = await audience.for_enumerators(enumerator_ids)
+
+    diff = {
+        "id": respondent_id,
+        "enumerator_id": respondent.get("enumerator_id"),
+        "set": dict(update_dict),
+        "unset": list(update_ops.get("$unset", {}).keys())
+    }
+    await manager.broadcast_to_users_compact(
+        {"type": "respondent_update", "data": respondent},
+        {"type": "respondent_update", "format": "diff", "data": diff},
+        recipients
+    )
+    
+    return respondent
+
+# Location tracking routes
+@api_router.post("/locations")
+async def create_location(location: LocationTrackingCreate, current_user: dict = Depends(get_current_user)):
+    location_dict = location.dict()
+    location_dict["timestamp"] = location_timestamp(location_dict.get("timestamp"))
+    location_dict["is_synced"] = True
+    
+    result = await db.locations.insert_one(location_dict)
+    location_dict["id"] = str(result.inserted_id)
+    
+    # Serialize for response
+    serialized_location = serialize_doc(location_dict.copy())
+
+    try:
+        await check_geofence([location_dict])
+    except Exception as e:
+        logger.error(f"Geofence check failed: {e}")
+    
+    # Broadcast location update
+    await manager.broadcast({
+        "type": "location_update",
+        "data": serialized_location
+    })
+    
+    return serialized_location
+
+@api_router.post("/locations/batch")
+async def create_locations_batch(batch: LocationTrackingBatch, current_user: dict = Depends(get_current_user)):
     locations = []
     for loc in batch.locations:
         loc_dict = loc.dict()
-        if not loc_dict.get("timestamp"):
-            loc_dict["timestamp"] = datetime.utcnow()
+        loc_dict["timestamp"] = location_timestamp(loc_dict.get("timestamp"))
         loc_dict["is_synced"] = True
         locations.append(loc_dict)
     
@@ -1026,11 +2606,22 @@ async def create_locations_batch(batch: LocationTrackingBatch, current_user: dic
         result = await db.locations.insert_many(locations)
         for i, inserted_id in enumerate(result.inserted_ids):
             locations[i]["id"] = str(inserted_id)
+
+        try:
+            await check_geofence(locations)
+        except Exception as e:
+            logger.error(f"Geofence check failed: {e}")
     
     return {"success": True, "count": len(locations)}
 
 @api_router.get("/locations")
-async def get_locations(user_id: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+async def get_locations(
+    user_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """1000 lokasi terbaru; arsip ikut dibaca hanya jika rentang (since) melewati batas arsip"""
     query = {}
     
     if user_id:
@@ -1042,7 +2633,7 @@ async def get_locations(user_id: Optional[str] = None, current_user: dict = Depe
         enumerator_ids = [str(e["_id"]) for e in enumerators]
         query["user_id"] = {"$in": enumerator_ids}
     
-    locations = await db.locations.find(query).sort("timestamp", -1).to_list(1000)
+    locations = await archiver.find_page("locations", query, limit=1000, since=since, until=until)
     return [serialize_doc(loc) for loc in locations]
 
 @api_router.get("/locations/latest")
@@ -1069,12 +2660,91 @@ async def get_latest_locations(current_user: dict = Depends(get_current_user)):
     return locations
     
 # Message/Chat routes
+async def prepare_ai_answer(message_dict: dict):
+    """Isi jawaban pesan AI sebelum disimpan: FAQ, lalu cache, lalu model (PENDING)"""
+    content = message_dict["content"]
+    # FAQ yang cocok dijawab langsung tanpa panggilan model
+    faq_match = faq_index.match(content)
+    if faq_match:
+        faq, confidence = faq_match
+        message_dict["response"] = faq["answer"]
+        message_dict["answered"] = True
+        message_dict["ai_status"] = AIStatus.ANSWERED
+        message_dict["answer_source"] = "faq"
+        message_dict["faq_id"] = faq["id"]
+        message_dict["faq_confidence"] = round(confidence, 3)
+    # Pertanyaan yang sama/mirip dengan yang pernah dijawab memakai jawaban dari cache
+    elif cached := answer_cache.lookup(content):
+        message_dict["response"] = cached["response"]
+        message_dict["answered"] = True
+        message_dict["ai_status"] = AIStatus.ANSWERED
+        message_dict["answer_source"] = "cache"
+        await db.ai_answer_cache.update_one(
+            {"_id": cached["key"]},
+            {"$set": {"last_used_at": cached["last_used_at"], "hits": cached["hits"]}}
+        )
+    # Selain itu simpan dulu, jawaban dikirim belakangan lewat WebSocket (ai_response)
+    elif ai_service.available:
+        message_dict["response"] = None
+        message_dict["ai_status"] = AIStatus.PENDING
+    else:
+        # AI not available - provide fallback
+        message_dict["response"] = "AI assistant is currently unavailable. Please contact your supervisor for assistance or check the FAQ section."
+        message_dict["answered"] = True
+
+async def get_or_create_conversation(sender_id: str, receiver_id: str, now: datetime, count: int = 1) -> str:
+    """Percakapan antara dua user (dibuat jika belum ada); unread penerima bertambah `count`"""
+    conversation = await db.conversations.find_one_and_update(
+        {"participants": {"$all": [sender_id, receiver_id]}},
+        {
+            "$inc": {f"unread_count.{receiver_id}": count},
+            "$set": {"updated_at": now}
+        },
+        projection={"_id": 1}
+    )
+    if conversation:
+        return str(conversation["_id"])
+    result = await db.conversations.insert_one({
+        "participants": [sender_id, receiver_id],
+        "created_at": now,
+        "updated_at": now,
+        "unread_count": {receiver_id: count},
+        "read_until": {}
+    })
+    return str(result.inserted_id)
+
+async def advance_read_watermark(conversation: dict, user_id: str, up_to: datetime) -> int:
+    """
+    Majukan watermark baca user di percakapan (tidak pernah mundur) lalu hitung
+    ulang unread dari pesan setelah watermark lewat index (conversation_id, timestamp).
+    """
+    conversation_id = str(conversation["_id"])
+    updated = await db.conversations.find_one_and_update(
+        {"_id": conversation["_id"]},
+        {"$max": {f"read_until.{user_id}": up_to}},
+        projection={"read_until": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    watermark = ((updated or {}).get("read_until") or {}).get(user_id, up_to)
+    unread = await db.messages.count_documents({
+        "conversation_id": conversation_id,
+        "timestamp": {"$gt": watermark},
+        "sender_id": {"$ne": user_id},
+        "is_deleted": {"$ne": True}
+    })
+    await db.conversations.update_one(
+        {"_id": conversation["_id"]},
+        {"$set": {f"unread_count.{user_id}": unread}}
+    )
+    return unread
+
 @api_router.post("/messages")
 async def create_message(message: MessageCreate, current_user: dict = Depends(get_current_user)):
     """Create a new message (supports AI chat, supervisor chat)"""
     message_dict = message.dict()
     message_dict["sender_id"] = current_user["id"]
     message_dict["timestamp"] = datetime.utcnow()
+    message_dict["updated_at"] = message_dict["timestamp"]
     message_dict["is_synced"] = True
     message_dict["answered"] = False
     message_dict["is_deleted"] = False
@@ -1088,59 +2758,22 @@ async def create_message(message: MessageCreate, current_user: dict = Depends(ge
             supervisor_id = current_user.get("supervisor_id")
             if supervisor_id:
                 message_dict["receiver_id"] = supervisor_id
-                
-                # Create or get conversation
-                conversation = await db.conversations.find_one({
-                    "participants": {"$all": [current_user["id"], supervisor_id]}
-                })
-                
-                if not conversation:
-                    conv_result = await db.conversations.insert_one({
-                        "participants": [current_user["id"], supervisor_id],
-                        "created_at": datetime.utcnow(),
-                        "updated_at": datetime.utcnow(),
-                        "unread_count": {supervisor_id: 1}
-                    })
-                    message_dict["conversation_id"] = str(conv_result.inserted_id)
-                else:
-                    message_dict["conversation_id"] = str(conversation["_id"])
-                    # Update unread count for supervisor
-                    await db.conversations.update_one(
-                        {"_id": conversation["_id"]},
-                        {
-                            "$inc": {f"unread_count.{supervisor_id}": 1},
-                            "$set": {"updated_at": datetime.utcnow()}
-                        }
-                    )
-    
-    # If it's an AI message, get response from Gemini
-    if message.message_type == MessageType.AI and gemini_model:
-        try:
-            context = """You are an AI assistant helping field enumerators with data collection issues.
-Only answer questions related to:
-- Field data collection procedures
-- Survey questionnaire guidance
-- Technical issues with the app
-- Data entry best practices
-- Location/GPS troubleshooting
-
-If the question is not related to field data collection, politely decline to answer."""
-            
-            prompt = f"{context}\n\nQuestion: {message.content}\n\nAnswer:"
-            response = gemini_model.generate_content(prompt)
-            message_dict["response"] = response.text
-            message_dict["answered"] = True
-        except Exception as e:
-            logger.error(f"Gemini API error: {e}")
-            message_dict["response"] = "Sorry, I'm unable to process your question at the moment. Please try again later."
-            message_dict["answered"] = True
-    elif message.message_type == MessageType.AI:
-        # Gemini not available - provide fallback
-        message_dict["response"] = "AI assistant is currently unavailable. Please contact your supervisor for assistance or check the FAQ section."
-        message_dict["answered"] = True
+        
+        # Create or get conversation (unread penerima +1); balasan supervisor juga masuk percakapan
+        if message_dict.get("receiver_id") and message_dict["receiver_id"] != current_user["id"]:
+            message_dict["conversation_id"] = await get_or_create_conversation(
+                current_user["id"], message_dict["receiver_id"], message_dict["timestamp"]
+            )
+    
+    if message.message_type == MessageType.AI:
+        await prepare_ai_answer(message_dict)
     
     result = await db.messages.insert_one(message_dict)
     message_dict["_id"] = result.inserted_id
+    await reindex_search("messages", {"_id": result.inserted_id})
+    
+    if message_dict.get("ai_status") == AIStatus.PENDING:
+        spawn_background(answer_ai_message(result.inserted_id, current_user["id"], message.content))
     
     serialized_message = serialize_doc(message_dict)
     
@@ -1153,9 +2786,179 @@ If the question is not related to field data collection, politely decline to ans
     
     return serialized_message
 
+@api_router.post("/messages/batch")
+async def create_messages_batch(batch: MessageBatch, current_user: dict = Depends(get_current_user)):
+    """
+    Kirim antrian chat offline sekaligus. Setiap pesan wajib membawa client_id;
+    client_id yang sudah pernah diterima tidak disimpan ulang (aman untuk retry).
+    Percakapan di-resolve sekali per penerima, notifikasi dikelompokkan per penerima.
+    """
+    if len(batch.messages) > MESSAGE_BATCH_LIMIT:
+        raise HTTPException(status_code=400, detail=f"Maximum {MESSAGE_BATCH_LIMIT} messages per batch")
+    
+    sender_id = current_user["id"]
+    errors = []
+    duplicates = 0
+    items = {}  # client_id -> (index, item); kemunculan pertama menang
+    for index, item in enumerate(batch.messages):
+        client_id = item.client_id
+        if not client_id:
+            errors.append({"index": index, "error": "client_id is required"})
+        elif item.message_type not in (MessageType.SUPERVISOR, MessageType.AI):
+            errors.append({"index": index, "client_id": client_id, "error": "Unsupported message_type"})
+        elif not item.content or not item.content.strip():
+            errors.append({"index": index, "client_id": client_id, "error": "content is required"})
+        elif client_id in items:
+            duplicates += 1
+        else:
+            items[client_id] = (index, item)
+    
+    # Dedup terhadap pesan yang sudah tersimpan (retry setelah respons hilang)
+    accepted = {}
+    async for doc in db.messages.find(
+        {"sender_id": sender_id, "client_id": {"$in": list(items)}}, {"client_id": 1}
+    ):
+        accepted[doc["client_id"]] = str(doc["_id"])
+    duplicates += len(accepted)
+    
+    # BSON date hanya menyimpan milidetik: waktu dipotong ke milidetik supaya respons sama dengan yang tersimpan
+    now = datetime.utcnow()
+    now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+    new_messages = []
+    for client_id, (index, item) in items.items():
+        if client_id in accepted:
+            continue
+        message_type = item.message_type
+        receiver_id = item.receiver_id
+        if message_type == MessageType.SUPERVISOR and current_user["role"] == UserRole.ENUMERATOR:
+            receiver_id = current_user.get("supervisor_id") or receiver_id
+        # Urutan antrian dipertahankan (selang 1 ms, resolusi BSON date) supaya sort timestamp
+        # dan watermark baca membedakan tiap pesan; waktu asli dari perangkat disimpan terpisah (UTC naive)
+        timestamp = now + timedelta(milliseconds=len(new_messages))
+        client_timestamp = item.timestamp
+        if client_timestamp and client_timestamp.tzinfo:
+            client_timestamp = client_timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+        message_dict = {
+            "client_id": client_id,
+            "sender_id": sender_id,
+            "receiver_id": receiver_id if message_type == MessageType.SUPERVISOR else None,
+            "message_type": message_type,
+            "content": item.content,
+            "client_timestamp": client_timestamp,
+            "timestamp": timestamp,
+            "updated_at": timestamp,
+            "is_synced": True,
+            "answered": False,
+            "is_deleted": False,
+            "is_edited": False,
+            "read_by": [sender_id]
+        }
+        if message_type == MessageType.AI:
+            await prepare_ai_answer(message_dict)
+        new_messages.append(message_dict)
+    
+    # Satu resolve percakapan per penerima; unread baru ditambah setelah insert,
+    # sejumlah pesan yang benar-benar tersimpan
+    by_receiver = {}
+    for message_dict in new_messages:
+        receiver_id = message_dict["receiver_id"]
+        if receiver_id and receiver_id != sender_id:
+            by_receiver.setdefault(receiver_id, []).append(message_dict)
+    conversation_ids = {}
+    for receiver_id, messages in by_receiver.items():
+        conversation_ids[receiver_id] = await get_or_create_conversation(sender_id, receiver_id, now, count=0)
+        for message_dict in messages:
+            message_dict["conversation_id"] = conversation_ids[receiver_id]
+    
+    inserted = []
+    if new_messages:
+        try:
+            await db.messages.insert_many(new_messages, ordered=False)
+            inserted = new_messages
+        except BulkWriteError as e:
+            # Batch yang sama dikirim paralel: client_id yang kalah balapan dianggap duplikat
+            failed = {err["index"] for err in e.details.get("writeErrors", [])}
+            inserted = [m for i, m in enumerate(new_messages) if i not in failed]
+            raced = [new_messages[i]["client_id"] for i in failed]
+            async for doc in db.messages.find(
+                {"sender_id": sender_id, "client_id": {"$in": raced}}, {"client_id": 1}
+            ):
+                accepted[doc["client_id"]] = str(doc["_id"])
+                duplicates += 1
+    
+    for message_dict in inserted:
+        accepted[message_dict["client_id"]] = str(message_dict["_id"])
+        if message_dict.get("ai_status") == AIStatus.PENDING:
+            spawn_background(answer_ai_message(message_dict["_id"], sender_id, message_dict["content"]))
+    
+    if inserted:
+        await reindex_search("messages", {"_id": {"$in": [m["_id"] for m in inserted]}})
+    
+    unread = Counter(m["receiver_id"] for m in inserted if m["receiver_id"] in conversation_ids)
+    for receiver_id, count in unread.items():
+        await db.conversations.update_one(
+            {"_id": ObjectId(conversation_ids[receiver_id])},
+            {"$inc": {f"unread_count.{receiver_id}": count}}
+        )
+    
+    serialized = [serialize_doc(m) for m in inserted]
+    for receiver_id in by_receiver:
+        data = [m for m in serialized if m.get("receiver_id") == receiver_id]
+        if data:
+            await manager.send_personal_message({"type": "new_messages", "data": data}, receiver_id)
+    
+    return {
+        "success": True,
+        "created": len(inserted),
+        "duplicates": duplicates,
+        "accepted": accepted,  # client_id -> message id
+        "messages": serialized,
+        "errors": errors
+    }
+
+async def store_cached_answer(question: str, response: str):
+    entry, evicted = answer_cache.put(question, response)
+    if entry:
+        doc = entry_to_doc(entry)
+        await db.ai_answer_cache.replace_one({"_id": doc["_id"]}, doc, upsert=True)
+    if evicted:
+        await db.ai_answer_cache.delete_many({"_id": {"$in": evicted}})
+
+async def answer_ai_message(message_oid: ObjectId, user_id: str, question: str):
+    """Minta jawaban AI untuk pesan yang sudah tersimpan lalu dorong ke pengirim"""
+    try:
+        response = await ai_service.answer(question)
+        ai_status = AIStatus.ANSWERED
+        answer_source = ai_service.provider.name
+        await store_cached_answer(question, response)
+    except AIUnavailable as e:
+        logger.warning(f"AI answer for message {message_oid} failed: {e}")
+        response = "Sorry, I'm unable to process your question at the moment. Please try again later."
+        ai_status = AIStatus.FAILED
+        answer_source = None
+
+    updated = await db.messages.find_one_and_update(
+        {"_id": message_oid, "ai_status": AIStatus.PENDING},
+        {"$set": {
+            "response": response,
+            "answered": True,
+            "ai_status": ai_status,
+            "answer_source": answer_source,
+            "updated_at": datetime.utcnow()
+        }},
+        return_document=ReturnDocument.AFTER
+    )
+    if updated:
+        await manager.send_personal_message({
+            "type": "ai_response",
+            "data": serialize_doc(updated)
+        }, user_id)
+
 @api_router.get("/messages")
 async def get_messages(
     message_type: Optional[str] = None, 
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
     current_user: dict = Depends(get_current_user)
 ):
     """Get messages for current user (enumerator only sees their own messages)"""
@@ -1170,7 +2973,7 @@ async def get_messages(
     if message_type:
         query["message_type"] = message_type
     
-    messages = await db.messages.find(query).sort("timestamp", -1).to_list(1000)
+    messages = await archiver.find_page("messages", query, limit=1000, since=since, until=until)
     return [serialize_doc(msg) for msg in messages]
 
 @api_router.get("/messages/history")
@@ -1180,10 +2983,12 @@ async def get_message_history(
     message_type: Optional[str] = None,
     limit: int = Query(default=50, le=200),
     offset: int = 0,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
     current_user: dict = Depends(get_current_user)
 ):
     """
-    Get message history with pagination
+    Get message history with pagination (pesan lama dibaca dari arsip bila halaman mencapainya)
     - Enumerator: Only their own messages
     - Supervisor: Messages from their enumerators
     - Admin: All messages
@@ -1221,8 +3026,8 @@ async def get_message_history(
     if message_type:
         query["message_type"] = message_type
     
-    total = await db.messages.count_documents(query)
-    messages = await db.messages.find(query).sort("timestamp", -1).skip(offset).limit(limit).to_list(limit)
+    total = await archiver.count("messages", query, since=since, until=until)
+    messages = await archiver.find_page("messages", query, limit=limit, offset=offset, since=since, until=until)
     
     return {
         "messages": [serialize_doc(msg) for msg in messages],
@@ -1231,6 +3036,15 @@ async def get_message_history(
         "offset": offset
     }
 
+async def find_hot_message(message_id: str) -> dict:
+    """Pesan yang masih bisa diubah; pesan yang sudah diarsipkan hanya-baca (409)"""
+    message = await db.messages.find_one({"_id": ObjectId(message_id)})
+    if message:
+        return message
+    if await db.messages_archive.find_one({"_id": ObjectId(message_id)}, {"_id": 1}):
+        raise HTTPException(status_code=409, detail="Archived messages are read-only")
+    raise HTTPException(status_code=404, detail="Message not found")
+
 @api_router.put("/messages/{message_id}")
 async def update_message(
     message_id: str, 
@@ -1238,10 +3052,7 @@ async def update_message(
     current_user: dict = Depends(get_current_user)
 ):
     """Edit a message (only by sender, within time limit)"""
-    message = await db.messages.find_one({"_id": ObjectId(message_id)})
-    
-    if not message:
-        raise HTTPException(status_code=404, detail="Message not found")
+    message = await find_hot_message(message_id)
     
     # Only sender can edit
     if message["sender_id"] != current_user["id"]:
@@ -1261,13 +3072,16 @@ async def update_message(
             "content": update_data.content,
             "is_edited": True,
             "edited_at": datetime.utcnow(),
-            "original_content": original_content
+            "original_content": original_content,
+            "updated_at": datetime.utcnow()
         }}
     )
     
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Message not found")
     
+    await touch_broadcast_receipts(message, datetime.utcnow())
+    await reindex_search("messages", {"_id": ObjectId(message_id)})
     updated_message = await db.messages.find_one({"_id": ObjectId(message_id)})
     serialized = serialize_doc(updated_message)
     
@@ -1283,10 +3097,7 @@ async def update_message(
 @api_router.delete("/messages/{message_id}")
 async def delete_message(message_id: str, current_user: dict = Depends(get_current_user)):
     """Soft delete a message (only by sender or admin)"""
-    message = await db.messages.find_one({"_id": ObjectId(message_id)})
-    
-    if not message:
-        raise HTTPException(status_code=404, detail="Message not found")
+    message = await find_hot_message(message_id)
     
     # Only sender or admin can delete
     if message["sender_id"] != current_user["id"] and current_user["role"] != UserRole.ADMIN:
@@ -1296,12 +3107,15 @@ async def delete_message(message_id: str, current_user: dict = Depends(get_curre
         {"_id": ObjectId(message_id)},
         {"$set": {
             "is_deleted": True,
-            "deleted_at": datetime.utcnow()
+            "deleted_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow()
         }}
     )
     
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Message not found")
+    await touch_broadcast_receipts(message, datetime.utcnow(), deleted=True)
+    await reindex_search("messages", {"_id": ObjectId(message_id)})
     
     # Notify receiver about deletion
     if message.get("receiver_id"):
@@ -1319,10 +3133,7 @@ async def respond_to_message(
     current_user: dict = Depends(get_current_user)
 ):
     """Supervisor responds to enumerator message"""
-    message = await db.messages.find_one({"_id": ObjectId(message_id)})
-    
-    if not message:
-        raise HTTPException(status_code=404, detail="Message not found")
+    message = await find_hot_message(message_id)
     
     # Only supervisor/admin can respond to supervisor messages
     if message["message_type"] == MessageType.SUPERVISOR:
@@ -1335,7 +3146,8 @@ async def respond_to_message(
             "response": response.response,
             "answered": True,
             "answered_by": current_user["id"],
-            "answered_at": datetime.utcnow()
+            "answered_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow()
         }}
     )
     
@@ -1353,24 +3165,215 @@ async def respond_to_message(
     
     return msg_data
 
+@api_router.put("/conversations/{conversation_id}/read")
+async def mark_conversation_read(
+    conversation_id: str,
+    read: Optional[ConversationRead] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Tandai percakapan sudah dibaca sampai pesan/waktu tertentu (default: semuanya)
+    dengan satu panggilan. Watermark hanya maju; unread dihitung dari watermark.
+    """
+    conversation = await db.conversations.find_one(
+        {"_id": ObjectId(conversation_id)}, {"participants": 1}
+    )
+    if not conversation:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    if current_user["id"] not in conversation.get("participants", []):
+        raise HTTPException(status_code=403, detail="Permission denied")
+    
+    read = read or ConversationRead()
+    if read.up_to_message_id:
+        # Pesan arsip tetap bisa jadi batas baca (hanya timestamp yang dibaca)
+        message = await archiver.find_one(
+            "messages",
+            {"_id": ObjectId(read.up_to_message_id), "conversation_id": conversation_id},
+            {"timestamp": 1}
+        )
+        if not message:
+            raise HTTPException(status_code=404, detail="Message not found")
+        up_to = message["timestamp"]
+    else:
+        up_to = read.up_to or datetime.utcnow()
+    
+    unread = await advance_read_watermark(conversation, current_user["id"], up_to)
+    return {"success": True, "conversation_id": conversation_id, "read_until": up_to, "unread_count": unread}
+
+@api_router.get("/conversations")
+async def get_my_conversations(current_user: dict = Depends(get_current_user)):
+    """Percakapan user beserta unread_count dan watermark baca miliknya"""
+    user_id = current_user["id"]
+    conversations = await db.conversations.find({"participants": user_id}).sort("updated_at", -1).to_list(1000)
+    result = []
+    for conv in conversations:
+        result.append({
+            "id": str(conv["_id"]),
+            "participants": conv.get("participants", []),
+            "updated_at": conv.get("updated_at"),
+            "unread_count": (conv.get("unread_count") or {}).get(user_id, 0),
+            "read_until": (conv.get("read_until") or {}).get(user_id)
+        })
+    return {
+        "conversations": result,
+        "total_unread": sum(c["unread_count"] for c in result)
+    }
+
 @api_router.put("/messages/{message_id}/read")
 async def mark_message_read(message_id: str, current_user: dict = Depends(get_current_user)):
-    """Mark a message as read"""
-    result = await db.messages.update_one(
-        {"_id": ObjectId(message_id)},
-        {"$addToSet": {"read_by": current_user["id"]}}
+    """
+    Mark a message as read. Untuk pesan percakapan ini memajukan watermark sampai
+    pesan tersebut; gunakan PUT /conversations/{id}/read untuk menandai satu chat sekaligus.
+    """
+    message = await archiver.find_one(
+        "messages", {"_id": ObjectId(message_id)}, {"message_type": 1, "conversation_id": 1, "timestamp": 1}
     )
     
-    # Update conversation unread count
-    message = await db.messages.find_one({"_id": ObjectId(message_id)})
+    # Broadcast: status baca disimpan di receipt milik user, bukan di read_by pesan
+    if message and message.get("message_type") == MessageType.BROADCAST:
+        now = datetime.utcnow()
+        await db.broadcast_receipts.update_one(
+            {"user_id": current_user["id"], "message_id": message_id, "read_at": None},
+            {"$set": {"read_at": now, "updated_at": now}}
+        )
+        return {"success": True}
+    
+    # Pesan percakapan: status baca = watermark, tidak ditulis per pesan
     if message and message.get("conversation_id"):
-        await db.conversations.update_one(
-            {"_id": ObjectId(message["conversation_id"])},
-            {"$set": {f"unread_count.{current_user['id']}": 0}}
+        conversation = await db.conversations.find_one(
+            {"_id": ObjectId(message["conversation_id"]), "participants": current_user["id"]}, {"_id": 1}
         )
+        if conversation:
+            await advance_read_watermark(conversation, current_user["id"], message["timestamp"])
+            return {"success": True}
+    
+    await db.messages.update_one(
+        {"_id": ObjectId(message_id)},
+        {
+            "$addToSet": {"read_by": current_user["id"]},
+            "$set": {"updated_at": datetime.utcnow()}
+        }
+    )
     
     return {"success": True}
 
+@api_router.get("/sync/changes")
+async def get_sync_changes(
+    since: Optional[str] = None,
+    survey_id: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Delta sync untuk aplikasi offline-first.
+    Kirim token dari respons sebelumnya sebagai `since`; tanpa token = sync awal.
+    Jika has_more true, panggil lagi dengan next_token sampai false.
+    """
+    cursors = decode_sync_token(since) if since else {}
+    user_id = current_user["id"]
+    role = current_user["role"]
+
+    # Token lebih tua dari masa simpan tombstone: client wajib full resync
+    reset = delta_sync.needs_reset(cursors, datetime.utcnow() - TOMBSTONE_RETENTION)
+    if reset:
+        cursors = {}
+
+    # Scope per koleksi mengikuti filter role di endpoint list masing-masing
+    respondent_scope: Dict[str, Any] = {}
+    survey_scope: Dict[str, Any] = {}
+    if role == UserRole.ENUMERATOR:
+        respondent_scope["enumerator_id"] = user_id
+        survey_scope["enumerator_ids"] = user_id
+    elif role == UserRole.SUPERVISOR:
+        enumerators = await db.users.find({"supervisor_id": user_id}, {"_id": 1}).to_list(1000)
+        respondent_scope["enumerator_id"] = {"$in": [str(e["_id"]) for e in enumerators]}
+        survey_scope["supervisor_ids"] = user_id
+    if survey_id:
+        respondent_scope["survey_id"] = survey_id
+
+    # Broadcast untuk user ini tidak masuk scope pesan; dipaging lewat receipt-nya di bawah
+    message_scope = {"$or": [
+        {"sender_id": user_id},
+        {"receiver_id": user_id}
+    ]}
+
+    sources = {
+        "respondents": (db.respondents, respondent_scope, "created_at"),
+        "surveys": (db.surveys, survey_scope, "created_at"),
+        "faqs": (db.faqs, {}, "created_at"),
+        "messages": (db.messages, message_scope, "timestamp")
+    }
+
+    changes = {}
+    next_cursors = {}
+    has_more = False
+
+    for name, (collection, scope, created_field) in sources.items():
+        previous = cursors.get(name)
+        docs, next_cursors[name], more = await fetch_sync_page(collection, scope, previous)
+        has_more = has_more or more
+
+        created, updated, deleted = [], [], []
+        for doc in docs:
+            # Soft delete / survey nonaktif dikirim sebagai penghapusan
+            if doc.get("is_deleted") or (name == "surveys" and doc.get("is_active") is False):
+                deleted.append(str(doc["_id"]))
+            elif previous is None or (doc.get(created_field) and doc[created_field] > previous[0]):
+                created.append(serialize_doc(doc))
+            else:
+                updated.append(serialize_doc(doc))
+        changes[name] = {"created": created, "updated": updated, "deleted": deleted}
+
+    # Broadcast: satu halaman receipt milik user (keyset user_id, updated_at, _id), lalu pesannya
+    # per halaman. Receipt dimajukan saat dibaca, diedit atau dihapus, jadi read_at ikut tersinkron
+    previous = cursors.get("broadcasts")
+    receipts, next_cursors["broadcasts"], more = await fetch_sync_page(
+        db.broadcast_receipts, {"user_id": user_id}, previous
+    )
+    has_more = has_more or more
+    if receipts:
+        broadcasts = {
+            str(msg["_id"]): msg
+            async for msg in db.messages.find({"_id": {"$in": [ObjectId(r["message_id"]) for r in receipts]}})
+        }
+        message_changes = changes["messages"]
+        # Broadcast yang dikirim user ini sendiri sudah ikut sebagai pesan miliknya
+        seen = {m["id"] for m in message_changes["created"] + message_changes["updated"]}
+        seen.update(message_changes["deleted"])
+        for receipt in receipts:
+            msg = broadcasts.get(receipt["message_id"])
+            if msg is None or receipt["message_id"] in seen:
+                continue
+            seen.add(receipt["message_id"])
+            if msg.get("is_deleted"):
+                message_changes["deleted"].append(receipt["message_id"])
+                continue
+            msg["read_at"] = receipt.get("read_at")
+            if previous is None or (receipt.get("created_at") and receipt["created_at"] > previous[0]):
+                message_changes["created"].append(serialize_doc(msg))
+            else:
+                message_changes["updated"].append(serialize_doc(msg))
+
+    # Tombstone: dokumen yang dihapus atau dipindah dari user ini
+    tombstone_scope = {
+        "collection": {"$in": list(sources.keys())},
+        "$or": [{"user_ids": None}, {"user_ids": user_id}]
+    }
+    tombstones, next_cursors["tombstones"], more = await fetch_sync_page(
+        db.tombstones, tombstone_scope, cursors.get("tombstones")
+    )
+    has_more = has_more or more
+    if cursors:
+        for t in tombstones:
+            changes[t["collection"]]["deleted"].append(t["doc_id"])
+
+    return {
+        "changes": changes,
+        "next_token": delta_sync.encode_token(next_cursors),
+        "has_more": has_more,
+        "reset": reset,
+        "server_time": datetime.utcnow().isoformat()
+    }
+
 @api_router.get("/supervisor/conversations")
 async def get_supervisor_conversations(current_user: dict = Depends(get_current_user)):
     """Get all conversations for supervisor with their enumerators"""
@@ -1379,48 +3382,65 @@ async def get_supervisor_conversations(current_user: dict = Depends(get_current_
     
     # Get enumerators under this supervisor
     if current_user["role"] == UserRole.SUPERVISOR:
-        enumerators = await db.users.find({"supervisor_id": current_user["id"]}).to_list(1000)
+        enumerators = await db.users.find({"supervisor_id": current_user["id"]}, USER_PRIVATE_FIELDS).to_list(1000)
     else:
         # Admin sees all enumerators
-        enumerators = await db.users.find({"role": UserRole.ENUMERATOR}).to_list(1000)
-    
-    conversations = []
-    for enum in enumerators:
-        enum_id = str(enum["_id"])
-        
-        # Get latest message
-        latest_message = await db.messages.find_one(
-            {
+        enumerators = await db.users.find({"role": UserRole.ENUMERATOR}, USER_PRIVATE_FIELDS).to_list(1000)
+    enum_ids = [str(e["_id"]) for e in enumerators]
+
+    # Pesan terakhir, jumlah belum dijawab dan unread per enumerator dalam satu aggregation:
+    # $sort langsung setelah $match supaya bisa dilayani index timestamp (bukan sort di memori
+    # seluruh riwayat), lalu unread diambil dari dokumen percakapan lewat $lookup (index participants)
+    stats = {}
+    if enum_ids:
+        enumerator_id = {"$cond": [{"$in": ["$sender_id", enum_ids]}, "$sender_id", "$receiver_id"]}
+        pipeline = [
+            {"$match": {
                 "message_type": MessageType.SUPERVISOR,
                 "is_deleted": {"$ne": True},
                 "$or": [
-                    {"sender_id": enum_id},
-                    {"receiver_id": enum_id}
+                    {"sender_id": {"$in": enum_ids}},
+                    {"receiver_id": {"$in": enum_ids}}
                 ]
-            },
-            sort=[("timestamp", -1)]
-        )
-        
-        # Count unread messages
-        unread_count = await db.messages.count_documents({
-            "sender_id": enum_id,
-            "message_type": MessageType.SUPERVISOR,
-            "answered": False,
-            "is_deleted": {"$ne": True}
-        })
-        
-        # Count unanswered messages
-        unanswered_count = await db.messages.count_documents({
-            "sender_id": enum_id,
-            "message_type": MessageType.SUPERVISOR,
-            "answered": False,
-            "is_deleted": {"$ne": True}
-        })
-        
+            }},
+            {"$sort": {"timestamp": -1}},
+            {"$group": {
+                "_id": enumerator_id,
+                "latest_message": {"$first": "$$ROOT"},
+                "unanswered_count": {"$sum": {"$cond": [
+                    {"$and": [
+                        {"$eq": ["$sender_id", enumerator_id]},
+                        {"$eq": ["$answered", False]}
+                    ]}, 1, 0
+                ]}}
+            }},
+            {"$lookup": {
+                "from": "conversations",
+                "localField": "_id",
+                "foreignField": "participants",
+                "as": "conversations"
+            }}
+        ]
+        async for row in db.messages.aggregate(pipeline, allowDiskUse=True):
+            row["unread_count"] = next(
+                ((conv.get("unread_count") or {}).get(current_user["id"], 0)
+                 for conv in row.pop("conversations")
+                 if current_user["id"] in conv.get("participants", [])),
+                0
+            )
+            stats[row["_id"]] = row
+
+    conversations = []
+    for enum in enumerators:
+        enum_id = str(enum["_id"])
+        row = stats.get(enum_id, {})
+        latest_message = row.get("latest_message")
+        unanswered_count = row.get("unanswered_count", 0)
         conversations.append({
             "enumerator": serialize_doc(enum),
             "latest_message": serialize_doc(latest_message) if latest_message else None,
-            "unread_count": unread_count,
+            "conversation_id": latest_message.get("conversation_id") if latest_message else None,
+            "unread_count": row.get("unread_count", 0),
             "unanswered_count": unanswered_count
         })
     
@@ -1437,6 +3457,8 @@ async def get_enumerator_messages(
     enumerator_id: str,
     limit: int = Query(default=50, le=200),
     offset: int = 0,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
     current_user: dict = Depends(get_current_user)
 ):
     """Get all messages from a specific enumerator (Supervisor/Admin only)"""
@@ -1461,8 +3483,8 @@ async def get_enumerator_messages(
         ]
     }
     
-    total = await db.messages.count_documents(query)
-    messages = await db.messages.find(query).sort("timestamp", -1).skip(offset).limit(limit).to_list(limit)
+    total = await archiver.count("messages", query, since=since, until=until)
+    messages = await archiver.find_page("messages", query, limit=limit, offset=offset, since=since, until=until)
     
     # Get enumerator info
     enumerator = await db.users.find_one({"_id": ObjectId(enumerator_id)})
@@ -1496,20 +3518,15 @@ async def get_unanswered_messages(current_user: dict = Depends(get_current_user)
     messages = await db.messages.find(query).sort("timestamp", -1).to_list(1000)
     
     # Enrich with sender info
-    result = []
-    for msg in messages:
-        sender = await db.users.find_one({"_id": ObjectId(msg["sender_id"])})
-        msg_data = serialize_doc(msg)
-        msg_data["sender"] = serialize_doc(sender) if sender else None
-        result.append(msg_data)
-    
-    return result
+    return await enrich_messages(messages, fields=("sender",))
 
 @api_router.get("/admin/all-messages")
 async def get_all_messages(
     message_type: Optional[str] = None,
     limit: int = Query(default=100, le=500),
     offset: int = 0,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
     current_user: dict = Depends(get_current_user)
 ):
     """Admin: Get all messages without restrictions"""
@@ -1521,24 +3538,11 @@ async def get_all_messages(
     if message_type:
         query["message_type"] = message_type
     
-    total = await db.messages.count_documents(query)
-    messages = await db.messages.find(query).sort("timestamp", -1).skip(offset).limit(limit).to_list(limit)
+    total = await archiver.count("messages", query, since=since, until=until)
+    messages = await archiver.find_page("messages", query, limit=limit, offset=offset, since=since, until=until)
     
     # Enrich with user info
-    result = []
-    for msg in messages:
-        msg_data = serialize_doc(msg)
-        
-        # Get sender info
-        sender = await db.users.find_one({"_id": ObjectId(msg["sender_id"])})
-        msg_data["sender"] = serialize_doc(sender) if sender else None
-        
-        # Get receiver info if exists
-        if msg.get("receiver_id"):
-            receiver = await db.users.find_one({"_id": ObjectId(msg["receiver_id"])})
-            msg_data["receiver"] = serialize_doc(receiver) if receiver else None
-        
-        result.append(msg_data)
+    result = await enrich_messages(messages)
     
     return {
         "messages": result,
@@ -1553,16 +3557,17 @@ async def get_chat_stats(current_user: dict = Depends(get_current_user)):
     if current_user["role"] != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Admin only")
     
-    total_messages = await db.messages.count_documents({"is_deleted": {"$ne": True}})
-    ai_messages = await db.messages.count_documents({
+    # Total termasuk arsip (jumlah arsip di-cache sampai archiver berjalan lagi)
+    total_messages = await archiver.count("messages", {"is_deleted": {"$ne": True}})
+    ai_messages = await archiver.count("messages", {
         "message_type": MessageType.AI,
         "is_deleted": {"$ne": True}
     })
-    supervisor_messages = await db.messages.count_documents({
+    supervisor_messages = await archiver.count("messages", {
         "message_type": MessageType.SUPERVISOR,
         "is_deleted": {"$ne": True}
     })
-    broadcast_messages = await db.messages.count_documents({
+    broadcast_messages = await archiver.count("messages", {
         "message_type": MessageType.BROADCAST,
         "is_deleted": {"$ne": True}
     })
@@ -1590,15 +3595,35 @@ async def get_chat_stats(current_user: dict = Depends(get_current_user)):
         "supervisor_messages": supervisor_messages,
         "broadcast_messages": broadcast_messages,
         "unanswered_messages": unanswered,
-        "daily_stats": daily_stats
+        "daily_stats": daily_stats,
+        "faq_retrieval": faq_index.stats(),
+        "ai_answer_cache": answer_cache.stats(),
+        "archive": archiver.stats()
     }
 
+@api_router.post("/admin/archive", status_code=202)
+async def run_archive(
+    older_than_days: float = Query(default=ARCHIVE_AFTER_DAYS, gt=0),
+    current_user: dict = Depends(get_current_user)
+):
+    """Admin: jalankan archiver sekarang sebagai background job"""
+    if current_user["role"] != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin only")
+    
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    job_id = await job_runner.submit("archive", current_user["id"], {"cutoff": cutoff})
+    return {"success": True, "job_id": job_id, "status": JobStatus.QUEUED, "cutoff": cutoff}
+
 @api_router.post("/admin/broadcast")
 async def create_broadcast_message(
     broadcast: BroadcastMessageCreate,
     current_user: dict = Depends(get_current_user)
 ):
-    """Admin: Send broadcast message to all users or specific roles/survey"""
+    """
+    Admin: Send broadcast message to all users or specific roles/survey.
+    Penerima ditetapkan saat dikirim (satu receipt per user yang cocok); user yang
+    dibuat atau diberi role/survey setelahnya tidak menerima broadcast lama.
+    """
     if current_user["role"] != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Admin only")
     
@@ -1607,21 +3632,22 @@ async def create_broadcast_message(
     
     if broadcast.survey_id:
         # Get users assigned to this survey
-        survey = await db.surveys.find_one({"_id": ObjectId(broadcast.survey_id)})
+        survey = await db.surveys.find_one(
+            {"_id": ObjectId(broadcast.survey_id)}, {"supervisor_ids": 1, "enumerator_ids": 1}
+        )
         if survey:
             survey_user_ids = survey.get("supervisor_ids", []) + survey.get("enumerator_ids", [])
             user_query["_id"] = {"$in": [ObjectId(uid) for uid in survey_user_ids]}
     
-    target_users = await db.users.find(user_query).to_list(10000)
-    target_user_ids = [str(u["_id"]) for u in target_users]
-    
-    # Create broadcast message
+    # Create broadcast message; penerima disimpan sebagai broadcast_receipts, bukan array di pesan
+    now = datetime.utcnow()
     message_dict = {
         "sender_id": current_user["id"],
         "receiver_id": None,  # Broadcast has no specific receiver
         "message_type": MessageType.BROADCAST,
         "content": broadcast.content,
-        "timestamp": datetime.utcnow(),
+        "timestamp": now,
+        "updated_at": now,
         "is_synced": True,
         "answered": True,  # Broadcasts don't need answering
         "is_deleted": False,
@@ -1629,24 +3655,54 @@ async def create_broadcast_message(
         "read_by": [current_user["id"]],
         "target_roles": broadcast.target_roles,
         "target_survey_id": broadcast.survey_id,
-        "target_user_ids": target_user_ids
+        "recipients_count": 0
     }
     
     result = await db.messages.insert_one(message_dict)
     message_dict["_id"] = result.inserted_id
+    message_id = str(result.inserted_id)
     
     serialized_message = serialize_doc(message_dict)
+    event = {"type": "broadcast_message", "data": serialized_message}
     
-    # Send via WebSocket to all target users
-    await manager.broadcast_to_users({
-        "type": "broadcast_message",
-        "data": serialized_message
-    }, target_user_ids)
+    # Receipt ditulis per batch sambil mengirim WebSocket ke penerima yang sedang online
+    recipients_count = 0
+    pending = []
+    batch = []
+    
+    async def flush(user_ids):
+        await db.broadcast_receipts.insert_many([
+            {
+                "user_id": user_id,
+                "message_id": message_id,
+                "created_at": now,
+                "updated_at": now,
+                "read_at": now if user_id == current_user["id"] else None
+            }
+            for user_id in user_ids
+        ], ordered=False)
+    
+    async for user in db.users.find(user_query, {"_id": 1}).batch_size(BROADCAST_RECEIPT_BATCH_SIZE):
+        batch.append(str(user["_id"]))
+        if len(batch) >= BROADCAST_RECEIPT_BATCH_SIZE:
+            pending.append(asyncio.create_task(flush(batch)))
+            pending.append(asyncio.create_task(manager.broadcast_to_users(event, batch)))
+            recipients_count += len(batch)
+            batch = []
+    if batch:
+        pending.append(asyncio.create_task(flush(batch)))
+        pending.append(asyncio.create_task(manager.broadcast_to_users(event, batch)))
+        recipients_count += len(batch)
+    await asyncio.gather(*pending)
+    
+    await db.messages.update_one({"_id": result.inserted_id}, {"$set": {"recipients_count": recipients_count}})
+    await reindex_search("messages", {"_id": result.inserted_id})
+    serialized_message["recipients_count"] = recipients_count
     
     return {
         "success": True,
         "message": serialized_message,
-        "recipients_count": len(target_user_ids)
+        "recipients_count": recipients_count
     }
 
 @api_router.get("/messages/broadcasts")
@@ -1655,28 +3711,69 @@ async def get_broadcast_messages(
     current_user: dict = Depends(get_current_user)
 ):
     """Get broadcast messages for current user"""
-    query = {
-        "message_type": MessageType.BROADCAST,
-        "is_deleted": {"$ne": True},
-        "$or": [
-            {"target_user_ids": current_user["id"]},
-            {"target_roles": current_user["role"]}
-        ]
-    }
-    
-    messages = await db.messages.find(query).sort("timestamp", -1).limit(limit).to_list(limit)
+    # Receipt terbaru user (message_id ObjectId string naik sesuai waktu kirim)
+    receipts = await db.broadcast_receipts.find(
+        {"user_id": current_user["id"], "deleted": {"$ne": True}}, {"_id": 0, "message_id": 1, "read_at": 1}
+    ).sort("message_id", -1).limit(limit).to_list(limit)
+    read_at = {r["message_id"]: r.get("read_at") for r in receipts}
+    
+    # Broadcast lama yang sempat diarsipkan tetap ditampilkan
+    messages = await archiver.find_ids(
+        "messages", [ObjectId(r["message_id"]) for r in receipts], {"is_deleted": {"$ne": True}}
+    )
     
     # Enrich with sender info
-    result = []
-    for msg in messages:
-        msg_data = serialize_doc(msg)
-        sender = await db.users.find_one({"_id": ObjectId(msg["sender_id"])})
-        msg_data["sender"] = serialize_doc(sender) if sender else None
-        result.append(msg_data)
+    result = await enrich_messages(messages, fields=("sender",))
+    for msg in result:
+        msg["read_at"] = read_at.get(msg["id"])
+        msg["is_read"] = msg["read_at"] is not None
+    return result
+
+# Search routes
+@api_router.get("/search")
+async def search(
+    q: str = Query(..., min_length=2),
+    types: str = "respondents,messages",
+    limit: int = Query(default=20, le=100),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Cari responden (nama, alamat, telepon) dan isi pesan, diurutkan berdasarkan relevansi.
+    Scope sama dengan /respondents dan /messages/history:
+    - Enumerator: data miliknya sendiri
+    - Supervisor: data enumerator bawahannya (dan pesannya sendiri)
+    - Admin: semua
+    """
+    kinds = [k for k in types.split(",") if k in ("respondents", "messages")]
+    if not kinds:
+        raise HTTPException(status_code=400, detail="types must include respondents and/or messages")
     
+    owners = None
+    if current_user["role"] == UserRole.ENUMERATOR:
+        owners = {current_user["id"]}
+    elif current_user["role"] == UserRole.SUPERVISOR:
+        enumerators = await db.users.find({"supervisor_id": current_user["id"]}, {"_id": 1}).to_list(1000)
+        owners = {str(e["_id"]) for e in enumerators} | {current_user["id"]}
+    
+    started = time.perf_counter()
+    result = {"query": q, "engine": search_engine.name}
+    for kind in kinds:
+        hits = await search_engine.search(kind, q, owners, limit)
+        scores = dict(hits)
+        docs = await db[kind].find({"_id": {"$in": [ObjectId(doc_id) for doc_id, _ in hits]}}).to_list(None)
+        docs.sort(key=lambda d: scores[str(d["_id"])], reverse=True)
+        items = await enrich_messages(docs) if kind == "messages" else [serialize_doc(d) for d in docs]
+        for item in items:
+            item["score"] = round(scores[item["id"]], 4)
+        result[kind] = items
+    result["took_ms"] = round((time.perf_counter() - started) * 1000, 2)
     return result
 
 # FAQ routes
+async def rebuild_faq_index():
+    faqs = await db.faqs.find({}, {"question": 1, "answer": 1}).to_list(None)
+    await asyncio.to_thread(faq_index.rebuild, serialize_doc(faqs))
+
 @api_router.get("/faqs")
 async def get_faqs():
     faqs = await db.faqs.find().to_list(1000)
@@ -1689,9 +3786,11 @@ async def create_faq(faq: FAQItem, current_user: dict = Depends(get_current_user
     
     faq_dict = faq.dict()
     faq_dict["created_at"] = datetime.utcnow()
+    faq_dict["updated_at"] = faq_dict["created_at"]
     
     result = await db.faqs.insert_one(faq_dict)
     faq_dict["id"] = str(result.inserted_id)
+    await rebuild_faq_index()
     
     return serialize_doc(faq_dict)
 
@@ -1736,8 +3835,9 @@ async def get_dashboard_stats(current_user: dict = Depends(get_current_user)):
 
 # WebSocket endpoint
 @app.websocket("/ws/{user_id}")
-async def websocket_endpoint(websocket: WebSocket, user_id: str):
-    await manager.connect(websocket, user_id)
+async def websocket_endpoint(websocket: WebSocket, user_id: str, payload: str = "full"):
+    # ?payload=diff: respondent_update dikirim sebagai perubahan saja, bukan dokumen lengkap
+    await manager.connect(websocket, user_id, "diff" if payload == "diff" else "full")
     try:
         while True:
             data = await websocket.receive_text()
@@ -1849,7 +3949,7 @@ async def database_viewer():
         .stat-value { font-size: 36px; font-weight: bold; }
         .stat-label { font-size: 14px; opacity: 0.9; }
         pre { background: #f5f5f5; padding: 15px; border-radius: 8px; overflow-x: auto; }
-        .btn { background: #2196F3; color: white; border: none; padding: 12px 24px; border-radius: 8px; cursor: pointer; margin: 5px; }
+        .btn { background: #2196F3; color: white; border: none; padding: 12px 24px; border-radius: 8px; cursor: pointer; margin: 5px; display: inline-block; text-decoration: none; }
         .btn:hover { background: #1976D2; }
     </style>
 </head>
@@ -1871,6 +3971,10 @@ async def database_viewer():
             <button class="btn" onclick="loadCollection('messages')">Messages</button>
             <button class="btn" onclick="loadCollection('faqs')">FAQs</button>
             
+            <div style="margin-top: 20px;">
+                <input id="token" type="password" placeholder="Admin token (Bearer)" style="padding: 10px; width: 320px;">
+            </div>
+            <div id="export" style="margin-top: 20px;"></div>
             <div id="data" style="margin-top: 20px;"></div>
         </div>
     </div>
@@ -1887,9 +3991,27 @@ async def database_viewer():
             `;
         }
         
+        function authHeaders() {
+            return { 'Authorization': 'Bearer ' + document.getElementById('token').value };
+        }
+        
+        async function exportCollection(name, query, filename) {
+            const res = await fetch('/api/admin/export/' + name + '?' + query, { headers: authHeaders() });
+            if (!res.ok) { alert('Export failed: ' + res.status); return; }
+            const link = document.createElement('a');
+            link.href = URL.createObjectURL(await res.blob());
+            link.download = filename;
+            link.click();
+            URL.revokeObjectURL(link.href);
+        }
+        
         async function loadCollection(name) {
             document.getElementById('data').innerHTML = '<p>Loading...</p>';
-            const res = await fetch('/api/database/collection/' + name);
+            document.getElementById('export').innerHTML = `
+                <button class="btn" onclick="exportCollection('${name}', 'format=ndjson&gzip=true', '${name}.ndjson.gz')">Export NDJSON (.gz)</button>
+                <button class="btn" onclick="exportCollection('${name}', 'format=csv', '${name}.csv')">Export CSV</button>
+            `;
+            const res = await fetch('/api/database/collection/' + name, { headers: authHeaders() });
             const data = await res.json();
             document.getElementById('data').innerHTML = '<pre>' + JSON.stringify(data, null, 2) + '</pre>';
         }
@@ -1913,12 +4035,18 @@ async def get_database_stats():
     }
 
 @app.get("/api/database/collection/{collection_name}")
-async def get_collection_data(collection_name: str):
-    """Get data from a collection"""
-    if collection_name not in ["users", "surveys", "respondents", "locations", "messages", "faqs"]:
+async def get_collection_data(
+    collection_name: str,
+    limit: int = Query(100, ge=1, le=100),
+    current_user: dict = Depends(get_current_user)
+):
+    """Preview data from a collection (Admin only); export lengkap lewat /api/admin/export"""
+    if current_user["role"] != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin only")
+    if collection_name not in EXPORTABLE_COLLECTIONS:
         raise HTTPException(status_code=400, detail="Invalid collection")
     
-    data = await db[collection_name].find().limit(100).to_list(100)
+    data = await db[collection_name].find({}, USER_PRIVATE_FIELDS).limit(limit).to_list(limit)
     
     # Convert ObjectId to string
     for item in data:
@@ -1927,6 +4055,34 @@ async def get_collection_data(collection_name: str):
     
     return data
 
+@api_router.get("/admin/export/{collection_name}")
+async def export_collection(
+    collection_name: str,
+    format: str = "json",
+    gzip: bool = False,
+    filter: Optional[str] = None,
+    limit: int = Query(0, ge=0),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Admin: export koleksi secara streaming (json / ndjson / csv, opsional gzip).
+    filter = query Mongo dalam JSON, mis. {"survey_id": "..."}; limit 0 = semua dokumen.
+    """
+    if current_user["role"] != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Only admins can export data")
+    if collection_name not in EXPORTABLE_COLLECTIONS:
+        raise HTTPException(status_code=400, detail="Invalid collection")
+    if format not in export_stream.FORMATS:
+        raise HTTPException(status_code=400, detail="Invalid format")
+    try:
+        query = export_stream.parse_filter(filter)
+    except export_stream.ExportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    chunks = export_stream.export(db[collection_name], query, format, gzip, limit, exclude=USER_PRIVATE_FIELDS)
+    headers = {"Content-Disposition": f'attachment; filename="{export_stream.filename(collection_name, format, gzip)}"'}
+    return StreamingResponse(chunks, media_type=export_stream.media_type(format, gzip), headers=headers)
+
 # Include API router
 app.include_router(api_router)
 
@@ -1946,6 +4102,136 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def create_indexes():
+    await db.wilkerstat_features.create_index([("wilkerstat_id", 1), ("seq", 1)])
+    await db.users.create_index("email")
+    await db.messages.create_index([("message_type", 1), ("sender_id", 1), ("timestamp", -1)])
+    await db.messages.create_index([("message_type", 1), ("receiver_id", 1), ("timestamp", -1)])
+    # Unread dihitung dari watermark: pesan percakapan setelah read_until
+    await db.messages.create_index([("conversation_id", 1), ("timestamp", 1)])
+    # Idempotency batch offline: client_id unik per pengirim
+    await db.messages.create_index(
+        [("sender_id", 1), ("client_id", 1)],
+        unique=True,
+        partialFilterExpression={"client_id": {"$type": "string"}}
+    )
+    await db.conversations.create_index("participants")
+    # Responden per survey, urut region_code (export Parquet per partisi wilayah)
+    await db.respondents.create_index([("survey_id", 1), ("region_code", 1)])
+    await search_engine.create_indexes()
+
+    # Delta sync: index keyset + isi updated_at untuk dokumen lama
+    for name, fallback in [("respondents", "$created_at"), ("surveys", "$created_at"),
+                           ("faqs", "$created_at"), ("messages", "$timestamp")]:
+        await db[name].update_many(
+            {"updated_at": None},
+            [{"$set": {"updated_at": {"$ifNull": [fallback, "$$NOW"]}}}]
+        )
+        await db[name].create_index([("updated_at", 1), ("_id", 1)])
+    await db.tombstones.create_index([("updated_at", 1), ("_id", 1)])
+    await db.tombstones.create_index(
+        "deleted_at", expireAfterSeconds=int(TOMBSTONE_RETENTION.total_seconds())
+    )
+
+    await db.broadcast_receipts.create_index([("user_id", 1), ("message_id", -1)], unique=True)
+    # Delta sync broadcast dipaging per user lewat receipt
+    await db.broadcast_receipts.update_many(
+        {"updated_at": None},
+        [{"$set": {"updated_at": {"$ifNull": ["$created_at", "$$NOW"]}}}]
+    )
+    await db.broadcast_receipts.create_index([("user_id", 1), ("updated_at", 1), ("_id", 1)])
+    await migrate_broadcast_targets()
+    # Broadcast yang dihapus sebelum receipt punya flag deleted
+    deleted_ids = await db.messages.distinct(
+        "_id", {"message_type": MessageType.BROADCAST, "is_deleted": True}
+    )
+    if deleted_ids:
+        await db.broadcast_receipts.update_many(
+            {"message_id": {"$in": [str(i) for i in deleted_ids]}, "deleted": {"$ne": True}},
+            {"$set": {"deleted": True}}
+        )
+
+async def migrate_broadcast_targets():
+    """Pindahkan target_user_ids broadcast lama ke broadcast_receipts"""
+    async for msg in db.messages.find(
+        {"message_type": MessageType.BROADCAST, "target_user_ids": {"$exists": True}},
+        {"target_user_ids": 1, "read_by": 1, "timestamp": 1}
+    ):
+        message_id = str(msg["_id"])
+        read_by = set(msg.get("read_by") or [])
+        user_ids = msg.get("target_user_ids") or []
+        for start in range(0, len(user_ids), BROADCAST_RECEIPT_BATCH_SIZE):
+            try:
+                await db.broadcast_receipts.insert_many([
+                    {
+                        "user_id": user_id,
+                        "message_id": message_id,
+                        "created_at": msg.get("timestamp"),
+                        "updated_at": msg.get("timestamp"),
+                        "read_at": msg.get("timestamp") if user_id in read_by else None
+                    }
+                    for user_id in user_ids[start:start + BROADCAST_RECEIPT_BATCH_SIZE]
+                ], ordered=False)
+            except BulkWriteError:
+                pass  # Receipt yang sudah ada (migrasi sebelumnya terputus)
+        await db.messages.update_one(
+            {"_id": msg["_id"]},
+            {"$unset": {"target_user_ids": ""}, "$set": {"recipients_count": len(user_ids)}}
+        )
+
+@app.on_event("startup")
+async def build_search_index():
+    """Engine memory: index dibangun di background, update berikutnya inkremental"""
+    if search_engine.incremental:
+        spawn_background(search_engine.build(db))
+
+@app.on_event("startup")
+async def load_faq_index():
+    await rebuild_faq_index()
+
+@app.on_event("startup")
+async def load_answer_cache():
+    await db.ai_answer_cache.create_index("created_at", expireAfterSeconds=int(AI_CACHE_TTL.total_seconds()))
+    docs = await db.ai_answer_cache.find({"key_version": AI_CACHE_KEY_VERSION}).sort("last_used_at", -1).limit(AI_CACHE_MAX_ENTRIES).to_list(None)
+    answer_cache.load(docs)
+
+@app.on_event("startup")
+async def resume_pending_ai_answers():
+    """Pertanyaan AI yang belum terjawab saat server berhenti diproses ulang"""
+    await db.messages.create_index("ai_status", sparse=True)
+    async for msg in db.messages.find(
+        {"ai_status": AIStatus.PENDING, "is_deleted": {"$ne": True}}, {"sender_id": 1, "content": 1}
+    ):
+        spawn_background(answer_ai_message(msg["_id"], msg["sender_id"], msg["content"]))
+
+@app.on_event("startup")
+async def start_job_runner():
+    await db.jobs.create_index([("created_by", 1), ("created_at", -1)])
+    await db.jobs.create_index("status")
+    await db.jobs.create_index("finished_at", sparse=True)
+    await job_runner.start()
+    spawn_background(job_cleanup_scheduler())
+
+@app.on_event("startup")
+async def start_archiver():
+    await archiver.load()
+    await db.messages.create_index("timestamp")
+    await db.locations.create_index("timestamp")
+    await db.locations.create_index([("user_id", 1), ("timestamp", -1)])
+    # Arsip diquery dengan filter yang sama seperti koleksi utama
+    await db.messages_archive.create_index([("sender_id", 1), ("timestamp", -1)])
+    await db.messages_archive.create_index([("receiver_id", 1), ("timestamp", -1)])
+    await db.messages_archive.create_index("timestamp")
+    await db.locations_archive.create_index([("user_id", 1), ("timestamp", -1)])
+    await db.locations_archive.create_index("timestamp")
+    # Setelah job_runner.start agar job archive yang baru tidak ikut di-queue ulang
+    # Keduanya wajib positif: interval 0 membuat loop penjadwal berputar tanpa jeda
+    if ARCHIVE_AFTER_DAYS > 0 and ARCHIVE_INTERVAL.total_seconds() > 0:
+        spawn_background(archive_scheduler())
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await job_runner.stop()
+    ai_service.shutdown()
     client.close()
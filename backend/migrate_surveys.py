@@ -14,8 +14,55 @@ load_dotenv()
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
 DB_NAME = os.getenv("DB_NAME", "field_tracker_db")
 
-client = MongoClient(MONGO_URL)
-db = client[DB_NAME]
+# Connected in __main__ so main.py can import survey_migration_update without a second client
+db = None
+
+def survey_migration_update(survey, supervisor_ids, enumerator_ids):
+    """Fields missing from a survey document, with their default values"""
+    update_data = {}
+    
+    # Add region_level (default to district if not present)
+    if 'region_level' not in survey:
+        update_data['region_level'] = 'district'
+    
+    # Add region_name (use existing or default)
+    if 'region_name' not in survey:
+        update_data['region_name'] = survey.get('title', 'Unknown Region')
+    
+    # Add supervisor_ids
+    if 'supervisor_ids' not in survey:
+        update_data['supervisor_ids'] = supervisor_ids
+    
+    # Add enumerator_ids
+    if 'enumerator_ids' not in survey:
+        update_data['enumerator_ids'] = enumerator_ids
+    
+    # Add is_active (default to True)
+    if 'is_active' not in survey:
+        # Check status field if exists
+        status = survey.get('status', 'active')
+        update_data['is_active'] = status == 'active'
+    
+    # Add geojson_path (null by default)
+    if 'geojson_path' not in survey:
+        update_data['geojson_path'] = None
+    
+    # Add geojson_filter_field (null by default)
+    if 'geojson_filter_field' not in survey:
+        update_data['geojson_filter_field'] = None
+    
+    # Ensure created_at exists
+    if 'created_at' not in survey:
+        update_data['created_at'] = datetime.utcnow().isoformat()
+    
+    return update_data
+
+def describe_value(value):
+    if isinstance(value, list):
+        return f"{len(value)} ids"
+    if value is None:
+        return "null"
+    return value
 
 def migrate_surveys():
     """Migrate existing surveys to new schema"""
@@ -46,49 +93,9 @@ def migrate_surveys():
         print(f"\nMigrating survey: {survey.get('title', 'Untitled')}")
         
         # Prepare update data
-        update_data = {}
-        
-        # Add region_level (default to district if not present)
-        if 'region_level' not in survey:
-            update_data['region_level'] = 'district'
-            print("  + Added region_level: district")
-        
-        # Add region_name (use existing or default)
-        if 'region_name' not in survey:
-            update_data['region_name'] = survey.get('title', 'Unknown Region')
-            print(f"  + Added region_name: {update_data['region_name']}")
-        
-        # Add supervisor_ids
-        if 'supervisor_ids' not in survey:
-            update_data['supervisor_ids'] = supervisor_ids
-            print(f"  + Added supervisor_ids: {len(supervisor_ids)} supervisors")
-        
-        # Add enumerator_ids
-        if 'enumerator_ids' not in survey:
-            update_data['enumerator_ids'] = enumerator_ids
-            print(f"  + Added enumerator_ids: {len(enumerator_ids)} enumerators")
-        
-        # Add is_active (default to True)
-        if 'is_active' not in survey:
-            # Check status field if exists
-            status = survey.get('status', 'active')
-            update_data['is_active'] = status == 'active'
-            print(f"  + Added is_active: {update_data['is_active']}")
-        
-        # Add geojson_path (null by default)
-        if 'geojson_path' not in survey:
-            update_data['geojson_path'] = None
-            print("  + Added geojson_path: null")
-        
-        # Add geojson_filter_field (null by default)
-        if 'geojson_filter_field' not in survey:
-            update_data['geojson_filter_field'] = None
-            print("  + Added geojson_filter_field: null")
-        
-        # Ensure created_at exists
-        if 'created_at' not in survey:
-            update_data['created_at'] = datetime.utcnow().isoformat()
-            print(f"  + Added created_at: {update_data['created_at']}")
+        update_data = survey_migration_update(survey, supervisor_ids, enumerator_ids)
+        for field, value in update_data.items():
+            print(f"  + Added {field}: {describe_value(value)}")
         
         # Update survey if there are changes
         if update_data:
@@ -157,6 +164,8 @@ def verify_migration():
     return all_valid
 
 if __name__ == "__main__":
+    client = MongoClient(MONGO_URL)
+    db = client[DB_NAME]
     try:
         print("\nStarting migration...\n")
         migrate_surveys()
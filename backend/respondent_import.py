@@ -0,0 +1,138 @@
+"""
+Respondent import parsing
+Streams rows out of a CSV or XLSX file and normalises them into
+RespondentCreate-shaped dicts; validation and writes happen in main.py.
+"""
+import csv
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    from openpyxl import load_workbook
+except ImportError:  # XLSX import is optional
+    load_workbook = None
+
+# Canonical column -> accepted header names (lowercase)
+COLUMN_ALIASES = {
+    "name": ["name", "nama", "nama_responden"],
+    "phone": ["phone", "telepon", "no_hp", "hp"],
+    "address": ["address", "alamat"],
+    "latitude": ["latitude", "lat"],
+    "longitude": ["longitude", "lon", "lng", "long"],
+    "enumerator_id": ["enumerator_id"],
+    "enumerator_email": ["enumerator_email", "email_enumerator"],
+    "region_code": ["region_code", "kode_wilayah"],
+}
+REQUIRED_COLUMNS = ["name", "phone", "address", "latitude", "longitude"]
+
+_ALIAS_LOOKUP = {alias: column for column, aliases in COLUMN_ALIASES.items() for alias in aliases}
+
+
+class ImportFormatError(ValueError):
+    """The file as a whole cannot be imported (bad type, missing columns, ...)"""
+
+
+def detect_format(filename: str) -> str:
+    name = (filename or "").lower()
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith(".xlsx"):
+        if load_workbook is None:
+            raise ImportFormatError("XLSX import requires openpyxl to be installed")
+        return "xlsx"
+    raise ImportFormatError("Invalid file type. Must be CSV or XLSX.")
+
+
+def _map_header(header: List[Any]) -> List[Optional[str]]:
+    columns = [_ALIAS_LOOKUP.get(str(h or "").strip().lower()) for h in header]
+    missing = [c for c in REQUIRED_COLUMNS if c not in columns]
+    if missing:
+        raise ImportFormatError(f"Missing required columns: {', '.join(missing)}")
+    return columns
+
+
+def _iter_csv(path: str) -> Iterator[List[Any]]:
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            # Spreadsheet exports with Indonesian locale often use ';'
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        yield from csv.reader(f, dialect)
+
+
+def _iter_xlsx(path: str) -> Iterator[List[Any]]:
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            yield list(row)
+    finally:
+        workbook.close()
+
+
+def iter_rows(path: str, fmt: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Yield (line_number, raw_row) for each non-empty data row.
+    line_number matches what the user sees in their spreadsheet (header = 1).
+    """
+    rows = _iter_csv(path) if fmt == "csv" else _iter_xlsx(path)
+
+    header = next(rows, None)
+    if header is None:
+        raise ImportFormatError("File is empty")
+    columns = _map_header(header)
+
+    for line_number, values in enumerate(rows, start=2):
+        if not any(v not in (None, "") for v in values):
+            continue
+        raw = {}
+        for column, value in zip(columns, values):
+            if column:
+                raw[column] = value
+        yield line_number, raw
+
+
+def read_chunk(rows: Iterator, size: int) -> List:
+    """Pull up to `size` rows; meant to run in a worker thread"""
+    return list(islice(rows, size))
+
+
+def _text(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        # Phone numbers and codes read from XLSX come back as floats
+        value = int(value)
+    text = str(value).strip()
+    return text or None
+
+
+def _coordinate(value: Any, name: str, limit: float) -> float:
+    try:
+        number = float(str(value).strip().replace(",", ".")) if isinstance(value, str) else float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number")
+    if not -limit <= number <= limit:
+        raise ValueError(f"{name} out of range")
+    return number
+
+
+def normalize_row(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn a raw row into RespondentCreate fields; raises ValueError on bad data"""
+    row = {}
+    for column in ("name", "phone", "address"):
+        value = _text(raw.get(column))
+        if not value:
+            raise ValueError(f"{column} is required")
+        row[column] = value
+
+    row["location"] = {
+        "latitude": _coordinate(raw.get("latitude"), "latitude", 90),
+        "longitude": _coordinate(raw.get("longitude"), "longitude", 180),
+    }
+    row["enumerator_id"] = _text(raw.get("enumerator_id"))
+    row["enumerator_email"] = _text(raw.get("enumerator_email"))
+    row["region_code"] = _text(raw.get("region_code"))
+    return row
@@ -0,0 +1,192 @@
+"""
+Visit route optimisation
+Orders an enumerator's pending respondents into a short open path starting
+from their current position: nearest-neighbour seed, then 2-opt and Or-opt
+improvement over a precomputed haversine distance matrix. The matrix is
+n x n, so a route covers at most MAX_STOPS stops (a day's visits): the ones
+nearest the start.
+"""
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+MAX_PASSES = 50
+TIME_LIMIT_SECONDS = 2.0
+OR_OPT_MAX_SEGMENT = 3
+EPSILON = 1e-9
+# 300 stops = a 720 KB distance matrix; more than anyone visits in a day
+MAX_STOPS = 300
+
+
+def haversine_matrix(lats: Sequence[float], lons: Sequence[float]) -> np.ndarray:
+    """Pairwise great-circle distances in km"""
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lon = np.radians(np.asarray(lons, dtype=np.float64))
+    dlat = lat[:, None] - lat[None, :]
+    dlon = lon[:, None] - lon[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def haversine_from(lat: float, lon: float, lats: Sequence[float], lons: Sequence[float]) -> np.ndarray:
+    """Great-circle distances in km from one point to many"""
+    lat0, lon0 = np.radians(lat), np.radians(lon)
+    lat1 = np.radians(np.asarray(lats, dtype=np.float64))
+    lon1 = np.radians(np.asarray(lons, dtype=np.float64))
+    a = np.sin((lat1 - lat0) / 2) ** 2 + np.cos(lat0) * np.cos(lat1) * np.sin((lon1 - lon0) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def nearest_stops(start: Optional[Sequence[float]], stops: List[Dict[str, Any]], limit: int) -> List[int]:
+    """Indices of the `limit` stops nearest the start (or the first stop), in input order"""
+    if len(stops) <= limit:
+        return list(range(len(stops)))
+    lat, lon = start if start is not None else (stops[0]["latitude"], stops[0]["longitude"])
+    dist = haversine_from(lat, lon, [s["latitude"] for s in stops], [s["longitude"] for s in stops])
+    return sorted(np.argpartition(dist, limit - 1)[:limit].tolist())
+
+
+def path_length(dist: np.ndarray, order: np.ndarray) -> float:
+    return float(dist[order[:-1], order[1:]].sum()) if len(order) > 1 else 0.0
+
+
+def nearest_neighbour(dist: np.ndarray, start: int = 0) -> np.ndarray:
+    n = len(dist)
+    visited = np.zeros(n, dtype=bool)
+    order = np.empty(n, dtype=np.int64)
+    current = start
+    for i in range(n):
+        order[i] = current
+        visited[current] = True
+        if i == n - 1:
+            break
+        row = np.where(visited, np.inf, dist[current])
+        current = int(np.argmin(row))
+    return order
+
+
+def two_opt_pass(dist: np.ndarray, order: np.ndarray) -> bool:
+    """
+    One first-improvement sweep of 2-opt on an open path whose first node
+    (the start position) is fixed. Returns True if the path was improved.
+    """
+    n = len(order)
+    improved = False
+    for i in range(1, n - 1):
+        a = order[i - 1]
+        b = order[i]
+        js = np.arange(i + 1, n)
+        c = order[js]
+        # Node after j; the path end has no successor, so that edge costs 0
+        d = np.append(order[js[:-1] + 1], -1)
+        after_old = np.where(d >= 0, dist[c, np.maximum(d, 0)], 0.0)
+        after_new = np.where(d >= 0, dist[b, np.maximum(d, 0)], 0.0)
+        delta = dist[a, c] + after_new - dist[a, b] - after_old
+        best = int(np.argmin(delta))
+        if delta[best] < -EPSILON:
+            j = js[best]
+            order[i:j + 1] = order[i:j + 1][::-1].copy()
+            improved = True
+    return improved
+
+
+def or_opt_pass(dist: np.ndarray, order: np.ndarray) -> bool:
+    """
+    One sweep of Or-opt: move a segment of 1..3 stops (optionally reversed)
+    to the cheapest other position in the path. Returns True on improvement.
+    """
+    n = len(order)
+    improved = False
+    for seg_len in range(1, OR_OPT_MAX_SEGMENT + 1):
+        i = 1
+        while i + seg_len <= n:
+            seg = order[i:i + seg_len]
+            prev_node = order[i - 1]
+            next_node = order[i + seg_len] if i + seg_len < n else -1
+            removed_gain = dist[prev_node, seg[0]]
+            if next_node >= 0:
+                removed_gain += dist[seg[-1], next_node] - dist[prev_node, next_node]
+
+            rest = np.concatenate([order[:i], order[i + seg_len:]])
+            # Insert between rest[k] and rest[k+1] (or after the last stop)
+            left = rest
+            right = np.append(rest[1:], -1)
+            has_right = right >= 0
+            right_safe = np.maximum(right, 0)
+            base = np.where(has_right, dist[left, right_safe], 0.0)
+
+            fwd = dist[left, seg[0]] + np.where(has_right, dist[seg[-1], right_safe], 0.0) - base
+            rev = dist[left, seg[-1]] + np.where(has_right, dist[seg[0], right_safe], 0.0) - base
+            costs = np.minimum(fwd, rev)
+            # Re-inserting at the original spot is not a move
+            costs[i - 1] = np.inf
+
+            k = int(np.argmin(costs))
+            if costs[k] < removed_gain - EPSILON:
+                segment = seg if fwd[k] <= rev[k] else seg[::-1]
+                order[:] = np.concatenate([rest[:k + 1], segment, rest[k + 1:]])
+                improved = True
+            else:
+                i += 1
+    return improved
+
+
+def optimise_route(
+    dist: np.ndarray,
+    start: int = 0,
+    max_passes: int = MAX_PASSES,
+    time_limit: float = TIME_LIMIT_SECONDS,
+) -> np.ndarray:
+    """Visiting order (node indices, beginning with `start`) for an open path"""
+    order = nearest_neighbour(dist, start)
+    if len(order) <= 3:
+        return order
+
+    deadline = time.monotonic() + time_limit
+    for _ in range(max_passes):
+        improved = two_opt_pass(dist, order)
+        improved = or_opt_pass(dist, order) or improved
+        if not improved or time.monotonic() > deadline:
+            break
+    return order
+
+
+def plan_route(
+    start: Optional[Sequence[float]],
+    stops: List[Dict[str, Any]],
+    max_stops: int = MAX_STOPS,
+) -> Dict[str, Any]:
+    """
+    Plan a visiting order.
+
+    start is (lat, lon) or None; stops are dicts with "latitude"/"longitude".
+    Returns the stop indices in visiting order, the distance of each leg, the
+    total distance in km and how many stops were left out (beyond max_stops).
+    """
+    if not stops:
+        return {"order": [], "legs_km": [], "total_distance_km": 0.0, "skipped": 0}
+
+    selected = nearest_stops(start, stops, max_stops)
+    lats = [stops[i]["latitude"] for i in selected]
+    lons = [stops[i]["longitude"] for i in selected]
+    offset = 0
+    if start is not None:
+        lats = [start[0]] + lats
+        lons = [start[1]] + lons
+        offset = 1
+
+    dist = haversine_matrix(lats, lons)
+    order = optimise_route(dist, start=0)
+
+    legs = [0.0] + [float(dist[a, b]) for a, b in zip(order[:-1], order[1:])]
+    if offset:
+        order, legs = order[1:], legs[1:]
+
+    return {
+        "order": [selected[int(i) - offset] for i in order],
+        "legs_km": legs,
+        "total_distance_km": float(sum(legs)),
+        "skipped": len(stops) - len(selected),
+    }
@@ -0,0 +1,322 @@
+"""
+Full-text search
+Two interchangeable engines behind the same interface:
+- MongoTextSearch: MongoDB text indexes, nothing kept in process.
+- InvertedIndexSearch: in-process inverted index with BM25 ranking, built
+  once at startup and updated incrementally by the write paths.
+Both take role scope as a set of owner user ids (None = no restriction) and
+return ranked (id, score) pairs per collection; loading the documents is left
+to the caller.
+"""
+import asyncio
+import math
+import re
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from text_normalize import tokenize
+
+K1 = 1.2
+B = 0.75
+BUILD_BATCH_SIZE = 5000
+# Compact posting lists once stale entries outnumber live ones (and at least this many)
+COMPACT_MIN_STALE = 100000
+
+# Collection -> weighted text fields (weight = how many times tokens are counted)
+FIELDS: Dict[str, Dict[str, int]] = {
+    "respondents": {"name": 3, "phone": 2, "address": 1},
+    "messages": {"content": 1},
+}
+# Collection -> fields holding the user ids that may see the document
+OWNER_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "respondents": ("enumerator_id",),
+    "messages": ("sender_id", "receiver_id"),
+}
+PROJECTIONS = {
+    kind: {field: 1 for field in (*FIELDS[kind], *OWNER_FIELDS[kind], "is_deleted")}
+    for kind in FIELDS
+}
+
+_NON_DIGIT_RE = re.compile(r"\D")
+
+
+def query_tokens(q: str) -> List[str]:
+    """Unique content tokens; falls back to stopwords if the query has nothing else"""
+    tokens = tokenize(q) or tokenize(q, drop_stopwords=False)
+    return list(dict.fromkeys(tokens))
+
+
+def document_tokens(kind: str, doc: Dict[str, Any]) -> List[str]:
+    tokens = []
+    for field, weight in FIELDS[kind].items():
+        value = doc.get(field)
+        if not isinstance(value, str):
+            continue
+        field_tokens = tokenize(value, drop_stopwords=field != "phone")
+        if field == "phone":
+            # "+62 812-3456" is also findable as one number
+            digits = _NON_DIGIT_RE.sub("", value)
+            if digits and digits not in field_tokens:
+                field_tokens.append(digits)
+        tokens.extend(field_tokens * weight)
+    return tokens
+
+
+def scope_filter(kind: str, owners: Optional[Set[str]]) -> Dict[str, Any]:
+    """Mongo filter equivalent of the owner scope"""
+    query: Dict[str, Any] = {"is_deleted": {"$ne": True}}
+    if owners is not None:
+        owner_list = list(owners)
+        clauses = [{field: {"$in": owner_list}} for field in OWNER_FIELDS[kind]]
+        query.update(clauses[0] if len(clauses) == 1 else {"$or": clauses})
+    return query
+
+
+class MongoTextSearch:
+    name = "mongo"
+    incremental = False
+
+    def __init__(self, db):
+        self.db = db
+
+    async def create_indexes(self):
+        # default_language "none": no English stemming/stopwords on Indonesian text
+        await self.db.respondents.create_index(
+            [(field, "text") for field in FIELDS["respondents"]],
+            weights=FIELDS["respondents"], default_language="none", name="respondents_search"
+        )
+        await self.db.messages.create_index(
+            [(field, "text") for field in FIELDS["messages"]],
+            weights=FIELDS["messages"], default_language="none", name="messages_search"
+        )
+
+    async def search(self, kind: str, q: str, owners: Optional[Set[str]], limit: int) -> List[Tuple[str, float]]:
+        tokens = query_tokens(q)
+        if not tokens:
+            return []
+        # Every term quoted: documents must contain all of them, like the in-process engine
+        query = {"$text": {"$search": " ".join(f'"{t}"' for t in tokens)}, **scope_filter(kind, owners)}
+        cursor = self.db[kind].find(query, {"score": {"$meta": "textScore"}}).sort(
+            [("score", {"$meta": "textScore"})]
+        ).limit(limit)
+        return [(str(doc["_id"]), doc["score"]) async for doc in cursor]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"engine": self.name}
+
+
+class _Postings:
+    """Append-only posting list; an entry is live while its generation matches the slot's"""
+    __slots__ = ("slots", "tfs", "gens")
+
+    def __init__(self):
+        self.slots = array("i")
+        self.tfs = array("H")
+        self.gens = array("I")
+
+    def __len__(self):
+        return len(self.slots)
+
+    def append(self, slot: int, tf: int, gen: int):
+        self.slots.append(slot)
+        self.tfs.append(min(tf, 0xFFFF))
+        self.gens.append(gen)
+
+
+class _Index:
+    """
+    Postings for one collection. Documents live in dense slots; removing or
+    re-indexing a document bumps its slot generation instead of editing the
+    postings, and stale entries are compacted away in bulk. Posting arrays are
+    read through zero-copy NumPy views, so scoring a term is vectorised even
+    when it matches most of the collection.
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, _Postings] = {}
+        self.by_owner: Dict[str, _Postings] = {}
+        self.slots: Dict[str, int] = {}
+        self.ids: List[Optional[str]] = []
+        self.lengths = array("I")
+        self.gens = array("I")
+        # Posting entries written per slot, to know how many go stale on removal
+        self.entries = array("I")
+        self.free: List[int] = []
+        self.total_length = 0
+        self.live_entries = 0
+        self.stale_entries = 0
+
+    def __len__(self):
+        return len(self.slots)
+
+    def remove(self, doc_id: str):
+        slot = self.slots.pop(doc_id, None)
+        if slot is None:
+            return
+        self.gens[slot] += 1
+        self.total_length -= self.lengths[slot]
+        self.live_entries -= self.entries[slot]
+        self.stale_entries += self.entries[slot]
+        self.ids[slot] = None
+        self.lengths[slot] = 0
+        self.entries[slot] = 0
+        self.free.append(slot)
+        if self.stale_entries > max(self.live_entries, COMPACT_MIN_STALE):
+            self.compact()
+
+    def add(self, doc_id: str, tokens: List[str], owners: Tuple[str, ...]):
+        self.remove(doc_id)
+        if self.free:
+            slot = self.free.pop()
+        else:
+            slot = len(self.ids)
+            self.ids.append(None)
+            self.lengths.append(0)
+            self.gens.append(0)
+            self.entries.append(0)
+        gen = self.gens[slot]
+        counts: Dict[str, int] = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for token, tf in counts.items():
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = _Postings()
+            posting.append(slot, tf, gen)
+        for owner in owners:
+            posting = self.by_owner.get(owner)
+            if posting is None:
+                posting = self.by_owner[owner] = _Postings()
+            posting.append(slot, 1, gen)
+        self.slots[doc_id] = slot
+        self.ids[slot] = doc_id
+        self.lengths[slot] = len(tokens)
+        self.entries[slot] = len(counts) + len(owners)
+        self.total_length += len(tokens)
+        self.live_entries += len(counts) + len(owners)
+
+    def _live(self, posting: _Postings, gens: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        slots = np.frombuffer(posting.slots, dtype=np.int32)
+        tfs = np.frombuffer(posting.tfs, dtype=np.uint16)
+        if not self.stale_entries:
+            return slots, tfs
+        keep = gens[slots] == np.frombuffer(posting.gens, dtype=np.uint32)
+        return slots[keep], tfs[keep]
+
+    def compact(self):
+        """Drop stale posting entries (and empty posting lists)"""
+        gens = np.frombuffer(self.gens, dtype=np.uint32)
+        for table in (self.postings, self.by_owner):
+            for key in list(table):
+                posting = table[key]
+                slots, tfs = self._live(posting, gens)
+                if not len(slots):
+                    del table[key]
+                    continue
+                fresh = _Postings()
+                fresh.slots.frombytes(slots.tobytes())
+                fresh.tfs.frombytes(tfs.tobytes())
+                fresh.gens.frombytes(gens[slots].tobytes())
+                table[key] = fresh
+        del gens
+        self.stale_entries = 0
+
+    def search(self, tokens: List[str], owners: Optional[Set[str]], limit: int) -> List[Tuple[str, float]]:
+        if not self.slots:
+            return []
+        postings = [self.postings.get(t) for t in tokens]
+        if any(p is None for p in postings):
+            return []
+
+        size = len(self.ids)
+        gens = np.frombuffer(self.gens, dtype=np.uint32)
+        lengths = np.frombuffer(self.lengths, dtype=np.uint32)
+        doc_count = len(self.slots)
+        avg_length = self.total_length / doc_count or 1.0
+
+        def bm25(slots, tfs, df):
+            idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+            tf = tfs.astype(np.float64)
+            return idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * lengths[slots] / avg_length))
+
+        terms = sorted((self._live(p, gens) for p in postings), key=lambda t: len(t[0]))
+        # Candidates come from the rarest term (within scope); the others only filter and add to the score
+        candidates, tfs = terms[0]
+        df = len(candidates)
+        if owners is not None:
+            allowed = np.zeros(size, dtype=bool)
+            for owner in owners:
+                posting = self.by_owner.get(owner)
+                if posting is not None:
+                    allowed[self._live(posting, gens)[0]] = True
+            keep = allowed[candidates]
+            candidates, tfs = candidates[keep], tfs[keep]
+        scores = bm25(candidates, tfs, df)
+        for slots, term_tfs in terms[1:]:
+            if not len(candidates):
+                break
+            dense = np.zeros(size, dtype=np.uint16)
+            dense[slots] = term_tfs
+            matched = dense[candidates]
+            keep = matched > 0
+            candidates, scores = candidates[keep], scores[keep]
+            scores += bm25(candidates, matched[keep], len(slots))
+
+        if len(candidates) > limit:
+            top = np.argpartition(-scores, limit)[:limit]
+            candidates, scores = candidates[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        ids = self.ids
+        return [(ids[slot], float(score)) for slot, score in zip(candidates[order].tolist(), scores[order].tolist())]
+
+
+class InvertedIndexSearch:
+    name = "memory"
+    incremental = True
+
+    def __init__(self):
+        self.indexes: Dict[str, _Index] = {kind: _Index() for kind in FIELDS}
+        self.ready = False
+
+    async def create_indexes(self):
+        pass
+
+    def upsert(self, kind: str, doc: Dict[str, Any]):
+        """Add or refresh one document; soft-deleted documents are dropped"""
+        doc_id = str(doc["_id"])
+        if doc.get("is_deleted"):
+            self.indexes[kind].remove(doc_id)
+            return
+        owners = tuple(doc[f] for f in OWNER_FIELDS[kind] if doc.get(f))
+        self.indexes[kind].add(doc_id, document_tokens(kind, doc), owners)
+
+    def remove(self, kind: str, doc_ids: Iterable[Any]):
+        index = self.indexes[kind]
+        for doc_id in doc_ids:
+            index.remove(str(doc_id))
+
+    async def build(self, db):
+        """Index every document, yielding to the event loop between batches"""
+        for kind in FIELDS:
+            count = 0
+            async for doc in db[kind].find({"is_deleted": {"$ne": True}}, PROJECTIONS[kind]):
+                self.upsert(kind, doc)
+                count += 1
+                if count % BUILD_BATCH_SIZE == 0:
+                    await asyncio.sleep(0)
+        self.ready = True
+
+    async def search(self, kind: str, q: str, owners: Optional[Set[str]], limit: int) -> List[Tuple[str, float]]:
+        tokens = query_tokens(q)
+        if not tokens:
+            return []
+        return self.indexes[kind].search(tokens, owners, limit)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "engine": self.name,
+            "ready": self.ready,
+            **{kind: {"documents": len(index), "terms": len(index.postings)} for kind, index in self.indexes.items()},
+        }
@@ -0,0 +1,223 @@
+"""
+Spatial index for Wilkerstat polygons
+STR-packed bounding-box tree plus vectorized (NumPy) point-in-polygon tests,
+used to resolve which region a GPS point falls in.
+"""
+import math
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+NODE_CAPACITY = 16
+# Upper bound on points x edges evaluated at once in the ray-casting kernel
+PIP_CHUNK_ELEMENTS = 2_000_000
+
+
+def _polygon_rings(geometry: Optional[Dict[str, Any]]) -> List[Sequence]:
+    """All rings (outer and holes) of a Polygon/MultiPolygon geometry"""
+    if not geometry:
+        return []
+    geom_type = geometry.get("type")
+    coords = geometry.get("coordinates") or []
+    if geom_type == "Polygon":
+        return list(coords)
+    if geom_type == "MultiPolygon":
+        return [ring for polygon in coords for ring in polygon]
+    if geom_type == "GeometryCollection":
+        return [ring for child in geometry.get("geometries") or [] for ring in _polygon_rings(child)]
+    return []
+
+
+def _ring_edges(rings: List[Sequence]) -> np.ndarray:
+    """Edge array of shape (n, 4) with columns x1, y1, x2, y2"""
+    parts = []
+    for ring in rings:
+        pts = np.asarray([p[:2] for p in ring], dtype=np.float64)
+        if len(pts) < 3:
+            continue
+        if not np.array_equal(pts[0], pts[-1]):
+            pts = np.vstack([pts, pts[:1]])
+        parts.append(np.hstack([pts[:-1], pts[1:]]))
+    if not parts:
+        return np.empty((0, 4), dtype=np.float64)
+    return np.vstack(parts)
+
+
+def points_in_polygon(xs: np.ndarray, ys: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """
+    Even-odd ray casting for many points against one polygon.
+    Holes and multipolygon parts are handled by the even-odd rule over all rings.
+    """
+    inside = np.zeros(len(xs), dtype=bool)
+    if len(xs) == 0 or len(edges) == 0:
+        return inside
+
+    x1, y1, x2, y2 = edges[:, 0], edges[:, 1], edges[:, 2], edges[:, 3]
+    dy = y2 - y1
+    # Horizontal edges never cross the ray; avoid dividing by zero
+    slope = np.divide(x2 - x1, dy, out=np.zeros_like(dy), where=dy != 0)
+
+    step = max(1, PIP_CHUNK_ELEMENTS // len(edges))
+    for start in range(0, len(xs), step):
+        px = xs[start:start + step, None]
+        py = ys[start:start + step, None]
+        crosses = (y1 > py) != (y2 > py)
+        x_at = x1 + (py - y1) * slope
+        hits = np.count_nonzero(crosses & (px < x_at), axis=1)
+        inside[start:start + step] = (hits & 1).astype(bool)
+    return inside
+
+
+class PolygonIndex:
+    """
+    Static index over polygon features.
+
+    Features are dicts with a "geometry" (GeoJSON Polygon/MultiPolygon) and a
+    "code" (the region code returned for points inside it). The bbox tree is
+    packed with Sort-Tile-Recursive and queried level by level for a whole
+    batch of points at once.
+    """
+
+    def __init__(self, features: Iterable[Dict[str, Any]], node_capacity: int = NODE_CAPACITY):
+        self.node_capacity = node_capacity
+        self.codes: List[Any] = []
+        self.edges: List[np.ndarray] = []
+        boxes = []
+
+        for feature in features:
+            edges = _ring_edges(_polygon_rings(feature.get("geometry")))
+            if len(edges) == 0:
+                continue
+            xs = np.concatenate([edges[:, 0], edges[:, 2]])
+            ys = np.concatenate([edges[:, 1], edges[:, 3]])
+            boxes.append((xs.min(), ys.min(), xs.max(), ys.max()))
+            self.edges.append(edges)
+            self.codes.append(feature.get("code"))
+
+        self.boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        self._build_tree()
+
+    def __len__(self):
+        return len(self.codes)
+
+    def _str_order(self, boxes: np.ndarray) -> np.ndarray:
+        """Sort-Tile-Recursive ordering of boxes"""
+        n = len(boxes)
+        if n == 0:
+            return np.empty(0, dtype=np.int64)
+        cx = (boxes[:, 0] + boxes[:, 2]) / 2
+        cy = (boxes[:, 1] + boxes[:, 3]) / 2
+        node_count = math.ceil(n / self.node_capacity)
+        slice_size = self.node_capacity * math.ceil(math.sqrt(node_count))
+
+        by_x = np.argsort(cx, kind="stable")
+        order = []
+        for start in range(0, n, slice_size):
+            tile = by_x[start:start + slice_size]
+            order.append(tile[np.argsort(cy[tile], kind="stable")])
+        return np.concatenate(order)
+
+    def _build_tree(self):
+        """
+        Build levels bottom-up. Each level stores node boxes and, per node,
+        the [start, end) range of its children in the level below.
+        """
+        self.leaf_order = self._str_order(self.boxes)
+        self.levels = []  # root first once built
+
+        child_boxes = self.boxes[self.leaf_order]
+        while len(child_boxes) > 0:
+            cap = self.node_capacity
+            starts = np.arange(0, len(child_boxes), cap)
+            ends = np.minimum(starts + cap, len(child_boxes))
+            node_boxes = np.column_stack([
+                np.minimum.reduceat(child_boxes[:, 0], starts),
+                np.minimum.reduceat(child_boxes[:, 1], starts),
+                np.maximum.reduceat(child_boxes[:, 2], starts),
+                np.maximum.reduceat(child_boxes[:, 3], starts),
+            ])
+            self.levels.append((node_boxes, starts, ends))
+            if len(node_boxes) == 1:
+                break
+
+            # Consecutive STR-ordered nodes are already spatially close
+            child_boxes = node_boxes
+
+        self.levels.reverse()
+
+    def candidates(self, xs: np.ndarray, ys: np.ndarray):
+        """Return (point_idx, feature_idx) pairs whose bbox contains the point"""
+        if len(self) == 0 or len(xs) == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+
+        # Start with every point paired with the root
+        point_idx = np.arange(len(xs))
+        node_idx = np.zeros(len(xs), dtype=np.int64)
+
+        for boxes, starts, ends in self.levels:
+            b = boxes[node_idx]
+            keep = (
+                (xs[point_idx] >= b[:, 0]) & (xs[point_idx] <= b[:, 2]) &
+                (ys[point_idx] >= b[:, 1]) & (ys[point_idx] <= b[:, 3])
+            )
+            point_idx, node_idx = point_idx[keep], node_idx[keep]
+            if len(point_idx) == 0:
+                break
+
+            # Expand each surviving pair into its children
+            counts = ends[node_idx] - starts[node_idx]
+            point_idx = np.repeat(point_idx, counts)
+            offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            node_idx = np.repeat(starts[node_idx], counts) + offsets
+
+        if len(point_idx) == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+
+        # node_idx now indexes the STR-ordered leaves; test leaf boxes too
+        feature_idx = self.leaf_order[node_idx]
+        b = self.boxes[feature_idx]
+        keep = (
+            (xs[point_idx] >= b[:, 0]) & (xs[point_idx] <= b[:, 2]) &
+            (ys[point_idx] >= b[:, 1]) & (ys[point_idx] <= b[:, 3])
+        )
+        return point_idx[keep], feature_idx[keep]
+
+    def locate(self, lons: Sequence[float], lats: Sequence[float]) -> np.ndarray:
+        """
+        Feature index containing each point, or -1 when outside every polygon.
+        When polygons overlap the lowest feature index wins.
+        """
+        xs = np.asarray(lons, dtype=np.float64)
+        ys = np.asarray(lats, dtype=np.float64)
+        result = np.full(len(xs), -1, dtype=np.int64)
+
+        point_idx, feature_idx = self.candidates(xs, ys)
+        if len(point_idx) == 0:
+            return result
+
+        # Group candidate pairs by feature so each polygon runs one kernel
+        order = np.lexsort((point_idx, feature_idx))
+        point_idx, feature_idx = point_idx[order], feature_idx[order]
+        bounds = np.flatnonzero(np.diff(feature_idx)) + 1
+        group_starts = np.concatenate([[0], bounds])
+        group_ends = np.concatenate([bounds, [len(feature_idx)]])
+
+        for start, end in zip(group_starts, group_ends):
+            fid = feature_idx[start]
+            pts = point_idx[start:end]
+            pts = pts[result[pts] == -1]
+            if len(pts) == 0:
+                continue
+            inside = points_in_polygon(xs[pts], ys[pts], self.edges[fid])
+            result[pts[inside]] = fid
+        return result
+
+    def resolve(self, lons: Sequence[float], lats: Sequence[float]) -> List[Optional[Any]]:
+        """Region code for each point (None when not inside any polygon)"""
+        idx = self.locate(lons, lats)
+        return [self.codes[i] if i >= 0 else None for i in idx]
+
+    def resolve_one(self, lon: float, lat: float) -> Optional[Any]:
+        return self.resolve([lon], [lat])[0]
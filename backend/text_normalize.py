@@ -0,0 +1,45 @@
+"""
+Text normalisation for chat questions
+Lowercasing, punctuation/whitespace folding and Indonesian (plus common
+English) stopword removal shared by FAQ retrieval and the AI answer cache.
+"""
+import re
+from typing import List
+
+_TOKEN_RE = re.compile(r"[0-9a-z]+")
+# Dropped before tokenizing so contractions stay one word ("can't" -> "cant")
+_APOSTROPHES = str.maketrans("", "", "'\u2019")
+
+# Negations and modals flip or change what a question asks ("boleh" / "tidak boleh"),
+# so they are content words, never stopwords
+NEGATIONS = frozenset("""
+tidak tak bukan belum jangan enggak nggak gak ga
+not no never cannot cant dont doesnt
+""".split())
+MODALS = frozenset("""
+bisa boleh harus dapat mau perlu wajib
+can could may might must should
+""".split())
+
+STOPWORDS = frozenset("""
+ada adalah agar akan aku anda apa apakah atau bagaimana bagi bahwa baik banyak
+bila dalam dan dari di dia dengan diri dong gimana
+hanya ini itu jadi jika juga kah kalau kami kamu kan karena ke kenapa
+kepada ketika kok lagi lah mana masih maupun mengapa mereka nya oleh pada
+para pun saat saja saya sebagai sedang sekarang sementara seperti siapa sih
+sudah supaya tapi tentang tersebut toh untuk yaitu yang ya
+a an and are be do does for how i in is it me my of on or please the to
+what when where which why with you your
+""".split()) - NEGATIONS - MODALS
+
+
+def tokenize(text: str, drop_stopwords: bool = True) -> List[str]:
+    tokens = _TOKEN_RE.findall((text or "").lower().translate(_APOSTROPHES))
+    if drop_stopwords:
+        tokens = [t for t in tokens if t not in STOPWORDS]
+    return tokens
+
+
+def canonicalize(text: str) -> str:
+    """Stable form of a question: lowercase content words separated by single spaces"""
+    return " ".join(tokenize(text))
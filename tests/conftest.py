@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+# Backend modules are imported flat (as main.py does), not as a package
+sys.path.insert(0, os.path.join(os.path.dirname(TESTS_DIR), "backend"))
+sys.path.insert(0, TESTS_DIR)
+
+# main.py reads the connection settings at import; the client connects lazily
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "test")
+
+
+@pytest.fixture
+def app_db(monkeypatch):
+    """main.py wired to a fresh in-memory database"""
+    pytest.importorskip("mongomock")
+    import main
+    from mongo import Database
+
+    db = Database()
+    monkeypatch.setattr(main, "db", db)
+    monkeypatch.setattr(main.archiver, "db", db)
+    monkeypatch.setattr(main.archiver, "boundaries", {})
+    monkeypatch.setattr(main, "user_profiles", main.UserProfileCache())
+    return db
@@ -0,0 +1,102 @@
+"""
+In-memory async MongoDB for endpoint tests: mongomock behind the part of
+Motor's API that the backend uses (awaitable collection methods, cursors
+with to_list / async iteration).
+"""
+import mongomock
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+from pymongo.results import BulkWriteResult
+
+
+class Cursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._iter = None
+
+    def sort(self, *args, **kwargs):
+        self._cursor = self._cursor.sort(*args, **kwargs)
+        return self
+
+    def limit(self, n):
+        self._cursor = self._cursor.limit(n)
+        return self
+
+    def skip(self, n):
+        self._cursor = self._cursor.skip(n)
+        return self
+
+    def batch_size(self, n):
+        return self
+
+    def allow_disk_use(self, allow):
+        return self
+
+    async def to_list(self, length=None):
+        docs = list(self._cursor)
+        return docs if length is None else docs[:length]
+
+    def __aiter__(self):
+        self._iter = iter(self._cursor)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class Collection:
+    def __init__(self, collection):
+        self.sync = collection
+
+    def find(self, *args, **kwargs):
+        return Cursor(self.sync.find(*args, **kwargs))
+
+    def aggregate(self, pipeline, **kwargs):
+        kwargs.pop("allowDiskUse", None)
+        return Cursor(iter(self.sync.aggregate(pipeline, **kwargs)))
+
+    async def bulk_write(self, requests, ordered=True):
+        # mongomock's bulk builder predates the options newer pymongo passes, so apply one by one
+        totals = {"nInserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0, "nUpserted": 0, "upserted": []}
+        for op in requests:
+            if isinstance(op, InsertOne):
+                self.sync.insert_one(op._doc)
+                totals["nInserted"] += 1
+                continue
+            if isinstance(op, (DeleteOne, DeleteMany)):
+                delete = self.sync.delete_one if isinstance(op, DeleteOne) else self.sync.delete_many
+                totals["nRemoved"] += delete(op._filter).deleted_count
+                continue
+            if isinstance(op, UpdateOne):
+                result = self.sync.update_one(op._filter, op._doc, upsert=op._upsert)
+            elif isinstance(op, UpdateMany):
+                result = self.sync.update_many(op._filter, op._doc, upsert=op._upsert)
+            elif isinstance(op, ReplaceOne):
+                result = self.sync.replace_one(op._filter, op._doc, upsert=op._upsert)
+            else:
+                raise TypeError(f"Unsupported bulk operation: {op!r}")
+            totals["nMatched"] += result.matched_count
+            totals["nModified"] += result.modified_count
+            if result.upserted_id is not None:
+                totals["nUpserted"] += 1
+        return BulkWriteResult(totals, True)
+
+    def __getattr__(self, name):
+        method = getattr(self.sync, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+        return call
+
+
+class Database:
+    def __init__(self):
+        self.sync = mongomock.MongoClient().db
+
+    def __getattr__(self, name):
+        return Collection(self.sync[name])
+
+    def __getitem__(self, name):
+        return Collection(self.sync[name])
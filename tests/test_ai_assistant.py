@@ -0,0 +1,34 @@
+import asyncio
+
+import pytest
+
+import ai_assistant
+
+
+def test_provider_must_implement_generate():
+    with pytest.raises(TypeError):
+        ai_assistant.AIProvider()
+
+
+def test_timed_out_call_holds_its_slot_until_the_thread_finishes():
+    async def run():
+        service = ai_assistant.AIAnswerService(ai_assistant.StubProvider(delay=0.3), max_workers=1, timeout=0.1)
+        with pytest.raises(ai_assistant.AIUnavailable):
+            await service.answer("q")
+        assert service._slots.locked()
+        await asyncio.sleep(0.4)
+        assert not service._slots.locked()
+        service.timeout = 1.0
+        assert await service.answer("q") == "This is a stub answer."
+        service.shutdown()
+
+    asyncio.run(run())
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = ai_assistant.CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
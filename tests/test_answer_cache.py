@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+
+import answer_cache
+
+
+def test_rephrasing_reuses_the_answer():
+    cache = answer_cache.AnswerCache()
+    cache.put("Bagaimana cara mengirim data survei yang tersimpan offline?", "Buka menu Sinkronisasi.")
+    hit = cache.lookup("bagaimana cara mengirim data survei yang tersimpan offline ya")
+    assert hit is not None and hit["response"] == "Buka menu Sinkronisasi."
+
+
+def test_negation_never_shares_an_answer():
+    cache = answer_cache.AnswerCache(threshold=0.0)
+    cache.put("Apakah saya boleh mengisi kuesioner tanpa responden hadir?", "Ya")
+    assert cache.lookup("Apakah saya tidak boleh mengisi kuesioner tanpa responden hadir?") is None
+    assert cache.lookup("Apakah saya harus mengisi kuesioner tanpa responden hadir?") is None
+    assert cache.lookup("Apakah saya boleh mengisi kuesioner tanpa responden hadir") is not None
+
+
+def test_qualifiers():
+    assert answer_cache.qualifiers("boleh mengisi") == (False, frozenset({"boleh"}))
+    assert answer_cache.qualifiers("tidak boleh mengisi") == (True, frozenset({"boleh"}))
+    assert answer_cache.qualifiers("gak boleh mengisi") == answer_cache.qualifiers("tidak boleh mengisi")
+
+
+def test_expired_entries_are_dropped():
+    cache = answer_cache.AnswerCache(ttl=timedelta(days=1))
+    entry, _ = cache.put("cara upload foto rumah", "Tekan kamera")
+    entry["created_at"] = datetime.utcnow() - timedelta(days=2)
+    assert cache.lookup("cara upload foto rumah") is None
+    assert len(cache) == 0
+
+
+def test_load_skips_other_key_versions():
+    source = answer_cache.AnswerCache()
+    entry, _ = source.put("cara upload foto rumah", "Tekan kamera")
+    doc = answer_cache.entry_to_doc(entry)
+    stale = dict(doc, _id="upload foto", key_version=1)
+    cache = answer_cache.AnswerCache()
+    cache.load([doc, stale])
+    assert len(cache) == 1
+    assert cache.lookup("cara upload foto rumah")["response"] == "Tekan kamera"
+
+
+def test_least_recently_used_is_evicted():
+    cache = answer_cache.AnswerCache(max_entries=2)
+    cache.put("cara upload foto rumah", "a")
+    cache.put("lokasi gps tidak akurat", "b")
+    cache.lookup("cara upload foto rumah")
+    _, evicted = cache.put("aplikasi keluar sendiri saat sinkronisasi", "c")
+    assert evicted == ["lokasi gps tidak akurat"]
@@ -0,0 +1,63 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import archive
+
+BOUNDARY = datetime(2024, 3, 1)
+
+
+def archiver():
+    a = archive.Archiver(db=None)
+    a.boundaries["messages"] = BOUNDARY
+    return a
+
+
+def doc(days):
+    return {"timestamp": BOUNDARY + timedelta(days=days)}
+
+
+def test_with_range():
+    since, until = datetime(2024, 1, 1), datetime(2024, 2, 1)
+    assert archive.with_range({"a": 1}, "timestamp", None, None) == {"a": 1}
+    assert archive.with_range({"a": 1}, "timestamp", since, until) == {
+        "$and": [{"a": 1}, {"timestamp": {"$gte": since, "$lt": until}}]
+    }
+
+
+def test_full_page_newer_than_boundary_stays_hot():
+    assert not archiver()._needs_archive("messages", [doc(5), doc(1)], 2, None)
+
+
+def test_short_or_old_page_reads_archive():
+    a = archiver()
+    assert a._needs_archive("messages", [doc(5)], 2, None)
+    assert a._needs_archive("messages", [doc(5), doc(-1)], 2, None)
+
+
+def test_range_after_boundary_or_unarchived_collection_stays_hot():
+    a = archiver()
+    assert not a._needs_archive("messages", [], 10, BOUNDARY)
+    assert not a._needs_archive("locations", [], 10, None)
+
+
+def test_lookups_fall_through_to_archive_only_after_it_ran():
+    pytest.importorskip("mongomock")
+    from mongo import Database
+
+    db = Database()
+    db.sync.messages.insert_one({"_id": 1, "timestamp": BOUNDARY + timedelta(days=1)})
+    db.sync.messages_archive.insert_many([
+        {"_id": 2, "timestamp": BOUNDARY - timedelta(days=1)},
+        {"_id": 3, "timestamp": BOUNDARY - timedelta(days=2), "is_deleted": True},
+    ])
+    a = archive.Archiver(db)
+
+    assert asyncio.run(a.find_one("messages", {"_id": 2})) is None
+    assert [d["_id"] for d in asyncio.run(a.find_ids("messages", [1, 2]))] == [1]
+
+    a.boundaries["messages"] = BOUNDARY
+    assert asyncio.run(a.find_one("messages", {"_id": 2}))["_id"] == 2
+    live = {"is_deleted": {"$ne": True}}
+    assert [d["_id"] for d in asyncio.run(a.find_ids("messages", [2, 3, 1], live))] == [1, 2]
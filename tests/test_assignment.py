@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+import assignment
+
+
+def clustered(seed=0):
+    rng = np.random.default_rng(seed)
+    centers = [(-6.20, 106.80), (-6.30, 106.95), (-6.10, 107.05)]
+    lats, lons = [], []
+    for lat, lon in centers:
+        lats.extend(rng.normal(lat, 0.005, 40))
+        lons.extend(rng.normal(lon, 0.005, 40))
+    return lats, lons, centers
+
+
+def test_capacity_is_respected():
+    lats, lons, _ = clustered()
+    result = assignment.propose(lats, lons, [None, None, None], capacity=45)
+    counts = np.bincount(result["enumerator_index"], minlength=3)
+    assert counts.sum() == 120
+    assert counts.max() <= 45
+
+
+def test_clusters_go_to_the_nearest_enumerator():
+    lats, lons, centers = clustered()
+    positions = [centers[2], centers[0], centers[1]]
+    result = assignment.propose(lats, lons, positions)
+    labels = result["enumerator_index"]
+    # Respondents around centers[0] belong to enumerator 1, and so on
+    assert set(labels[:40]) == {1}
+    assert set(labels[40:80]) == {2}
+    assert set(labels[80:]) == {0}
+
+
+def test_fewer_respondents_than_enumerators():
+    result = assignment.propose([-6.2], [106.8], [(-6.2, 106.8), None])
+    assert list(result["enumerator_index"]) == [0]
+
+
+def test_not_enough_capacity():
+    lats, lons, _ = clustered()
+    with pytest.raises(ValueError):
+        assignment.propose(lats, lons, [None, None, None], capacity=10)
+    with pytest.raises(ValueError):
+        assignment.propose(lats, lons, [])
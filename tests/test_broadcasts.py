@@ -0,0 +1,59 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import main
+from main import MessageType
+
+USER = {"id": "user-1", "role": main.UserRole.ENUMERATOR}
+SENT = datetime(2024, 1, 10)
+
+
+def add_broadcast(db, sent, collection="messages", **extra):
+    message_id = db.sync[collection].insert_one({
+        "sender_id": "admin-1",
+        "message_type": MessageType.BROADCAST,
+        "content": "pengumuman",
+        "timestamp": sent,
+        **extra,
+    }).inserted_id
+    db.sync.broadcast_receipts.insert_one({
+        "user_id": USER["id"], "message_id": str(message_id), "read_at": None, "updated_at": sent,
+    })
+    return str(message_id)
+
+
+def test_archive_keeps_broadcasts_hot(app_db):
+    add_broadcast(app_db, SENT)
+    app_db.sync.messages.insert_one({"message_type": MessageType.SUPERVISOR, "answered": True, "timestamp": SENT})
+
+    keep = asyncio.run(main.archive_keep("messages"))
+    moved = asyncio.run(main.archiver.archive("messages", SENT + timedelta(days=1), keep))
+
+    assert moved == 1
+    assert [m["message_type"] for m in app_db.sync.messages.find()] == [MessageType.BROADCAST]
+
+
+def test_broadcasts_archived_earlier_stay_readable(app_db):
+    hot = add_broadcast(app_db, SENT)
+    cold = add_broadcast(app_db, SENT - timedelta(days=100), collection="messages_archive")
+    main.archiver.boundaries["messages"] = SENT - timedelta(days=90)
+
+    listed = asyncio.run(main.get_broadcast_messages(limit=20, current_user=USER))
+    assert [m["id"] for m in listed] == [hot, cold]
+
+    asyncio.run(main.mark_message_read(cold, USER))
+    receipt = app_db.sync.broadcast_receipts.find_one({"message_id": cold})
+    assert receipt["read_at"] is not None
+
+
+def test_deleted_broadcasts_do_not_take_page_slots(app_db):
+    admin = {"id": "admin-1", "role": main.UserRole.ADMIN}
+    oldest, middle, newest = (add_broadcast(app_db, SENT + timedelta(days=d)) for d in range(3))
+
+    asyncio.run(main.delete_message(newest, admin))
+
+    receipt = app_db.sync.broadcast_receipts.find_one({"message_id": newest})
+    assert receipt["deleted"] is True
+    assert receipt["updated_at"] > SENT + timedelta(days=2)
+    listed = asyncio.run(main.get_broadcast_messages(limit=2, current_user=USER))
+    assert [m["id"] for m in listed] == [middle, oldest]
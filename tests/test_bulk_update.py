@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import main
+from main import RespondentBulkUpdate, SurveyStatus, UserRole
+
+
+def setup(db):
+    users = db.sync.users
+    a = str(users.insert_one({"role": UserRole.ENUMERATOR, "supervisor_id": "sup-1"}).inserted_id)
+    b = str(users.insert_one({"role": UserRole.ENUMERATOR, "supervisor_id": "sup-1"}).inserted_id)
+    other = str(users.insert_one({"role": UserRole.ENUMERATOR, "supervisor_id": "sup-2"}).inserted_id)
+    db.sync.respondents.insert_many([
+        {"name": "r1", "survey_id": "s1", "enumerator_id": a, "status": SurveyStatus.PENDING},
+        {"name": "r2", "survey_id": "s1", "enumerator_id": b, "status": SurveyStatus.PENDING},
+        {"name": "r3", "survey_id": "s1", "enumerator_id": other, "status": SurveyStatus.PENDING},
+        {"name": "r4", "survey_id": "s2", "enumerator_id": a, "status": SurveyStatus.PENDING},
+    ])
+    return a, b, other
+
+
+def by_name(db):
+    return {r["name"]: r for r in db.sync.respondents.find()}
+
+
+def test_supervisor_reassigns_only_their_own_respondents(app_db):
+    a, b, other = setup(app_db)
+    supervisor = {"id": "sup-1", "role": UserRole.SUPERVISOR}
+    data = RespondentBulkUpdate(filter={"survey_id": "s1"}, enumerator_id=b)
+
+    result = asyncio.run(main.bulk_update_respondents(data, supervisor))
+
+    assert result["matched"] == 2
+    assert sorted(result["previous_enumerator_ids"]) == sorted([a, b])
+    respondents = by_name(app_db)
+    assert [respondents[n]["enumerator_id"] for n in ("r1", "r2", "r3", "r4")] == [b, b, other, a]
+    assert respondents["r1"]["assigned_by"] == "sup-1"
+    # The previous enumerator drops the moved respondent on its next sync
+    tombstones = list(app_db.sync.tombstones.find())
+    assert [(t["doc_id"], t["user_ids"]) for t in tombstones] == [(str(respondents["r1"]["_id"]), [a])]
+
+
+def test_status_update_by_ids(app_db):
+    setup(app_db)
+    ids = [str(r["_id"]) for r in app_db.sync.respondents.find({"name": {"$in": ["r1", "r3"]}})]
+    admin = {"id": "admin-1", "role": UserRole.ADMIN}
+
+    result = asyncio.run(main.bulk_update_respondents(
+        RespondentBulkUpdate(respondent_ids=ids, status=SurveyStatus.COMPLETED), admin
+    ))
+
+    assert result["modified"] == 2
+    assert {n for n, r in by_name(app_db).items() if r["status"] == SurveyStatus.COMPLETED} == {"r1", "r3"}
+
+
+@pytest.mark.parametrize("data, status", [
+    ({"status": SurveyStatus.COMPLETED}, 400),
+    ({"filter": {"survey_id": "s1"}}, 400),
+    ({"filter": {"survey_id": "s1"}, "status": "archived"}, 400),
+])
+def test_rejects_empty_target_or_patch(app_db, data, status):
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(main.bulk_update_respondents(RespondentBulkUpdate(**data), {"id": "a", "role": UserRole.ADMIN}))
+    assert e.value.status_code == status
@@ -0,0 +1,59 @@
+import asyncio
+
+from bson import ObjectId
+
+import main
+from main import BulkUserData, UserRole
+
+
+def rows(*pairs):
+    return [BulkUserData(location="x", supervisor_email=s, enumerator_email=e) for s, e in pairs]
+
+
+def upload(survey_id, users):
+    return asyncio.run(main.process_bulk_users(survey_id, users))
+
+
+def test_bulk_users_create_link_and_report_bad_rows(app_db, monkeypatch):
+    monkeypatch.setattr(main, "get_password_hash", lambda password: "hash")
+    survey_id = app_db.sync.surveys.insert_one({"title": "s"}).inserted_id
+    old_supervisor = app_db.sync.users.insert_one({"email": "old@x.id", "role": UserRole.SUPERVISOR}).inserted_id
+    app_db.sync.users.insert_one({"email": "e1@x.id", "role": UserRole.ENUMERATOR, "supervisor_id": str(old_supervisor)})
+
+    result = upload(survey_id, rows(
+        ("s1@x.id", "e1@x.id"),
+        ("s1@x.id", "e2@x.id"),
+        ("bad", "e3@x.id"),
+        ("s2@x.id", "s2@x.id"),
+        ("e2@x.id", "e4@x.id"),
+    ))
+
+    users = {u["email"]: u for u in app_db.sync.users.find()}
+    s1 = str(users["s1@x.id"]["_id"])
+    assert sorted((u["email"], u["role"]) for u in result["created_users"]) == [
+        ("e2@x.id", UserRole.ENUMERATOR), ("s1@x.id", UserRole.SUPERVISOR),
+    ]
+    # Existing enumerator moves to the supervisor of its row
+    assert users["e1@x.id"]["supervisor_id"] == s1
+    assert users["e2@x.id"]["supervisor_id"] == s1
+    assert [(e["row"], e["error"]) for e in result["errors"]] == [
+        (3, "Invalid email address"),
+        (4, "Supervisor and enumerator email must differ"),
+        (5, "e2@x.id is listed as an enumerator in another row"),
+    ]
+    survey = app_db.sync.surveys.find_one()
+    assert survey["supervisor_ids"] == [s1]
+    assert sorted(survey["enumerator_ids"]) == sorted([str(users["e1@x.id"]["_id"]), str(users["e2@x.id"]["_id"])])
+
+
+def test_bulk_users_rerun_creates_nothing_new(app_db, monkeypatch):
+    monkeypatch.setattr(main, "get_password_hash", lambda password: "hash")
+    survey_id = ObjectId()
+    users = rows(("s1@x.id", "e1@x.id"), ("s1@x.id", "e2@x.id"))
+
+    first = upload(survey_id, users)
+    again = upload(survey_id, users)
+
+    assert len(first["created_users"]) == 3
+    assert again["created_users"] == [] and again["errors"] == []
+    assert app_db.sync.users.count_documents({}) == 3
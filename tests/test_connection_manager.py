@@ -0,0 +1,26 @@
+import asyncio
+
+import main
+
+
+class Socket:
+    def __init__(self, closed=False):
+        self.closed = closed
+        self.sent = []
+
+    async def send_json(self, payload):
+        if self.closed:
+            raise RuntimeError("connection closed")
+        self.sent.append(payload)
+
+
+def test_compact_broadcast_isolates_failed_connections():
+    manager = main.ConnectionManager()
+    diff, closed, full = Socket(), Socket(closed=True), Socket()
+    manager.active_connections = {"a": diff, "b": closed, "c": full}
+    manager.payload_formats = {"a": "diff", "b": "full", "c": "full"}
+
+    asyncio.run(manager.broadcast_to_users_compact({"full": 1}, {"diff": 1}, ["a", "b", "c", "offline"]))
+
+    assert diff.sent == [{"diff": 1}]
+    assert full.sent == [{"full": 1}]
@@ -0,0 +1,38 @@
+from datetime import datetime
+
+from bson import ObjectId
+
+import db_web_viewer
+
+
+def test_type_bracket_follows_bson_sort_order():
+    values = [None, 3, 2.5, "a", {"k": 1}, [1], b"x", ObjectId(), True, datetime(2024, 1, 1)]
+    ranks = [db_web_viewer.type_bracket(v) for v in values]
+    assert ranks == sorted(ranks)
+    assert db_web_viewer.type_bracket(3) == db_web_viewer.type_bracket(2.5)
+    assert db_web_viewer.type_bracket(True) != db_web_viewer.type_bracket(1)
+
+
+def test_ascending_keyset_reaches_later_types():
+    oid = ObjectId()
+    keyset = db_web_viewer.keyset_filter("name", "b", oid, "$gt")
+    assert keyset["$or"][:2] == [{"name": {"$gt": "b"}}, {"name": "b", "_id": {"$gt": oid}}]
+    later = keyset["$or"][2]["name"]["$type"]
+    assert "date" in later and "objectId" in later
+    assert "null" not in later and "int" not in later and "string" not in later
+
+
+def test_descending_keyset_reaches_null_and_earlier_types():
+    oid = ObjectId()
+    keyset = db_web_viewer.keyset_filter("created_at", datetime(2024, 1, 1), oid, "$lt")
+    assert {"created_at": None} in keyset["$or"]
+    earlier = keyset["$or"][2]["created_at"]["$type"]
+    assert "string" in earlier and "int" in earlier and "date" not in earlier
+
+
+def test_null_cursor():
+    oid = ObjectId()
+    assert db_web_viewer.keyset_filter("s", None, oid, "$lt") == {"$or": [{"s": None, "_id": {"$lt": oid}}]}
+    ascending = db_web_viewer.keyset_filter("s", None, oid, "$gt")
+    assert ascending["$or"][0] == {"s": None, "_id": {"$gt": oid}}
+    assert "string" in ascending["$or"][1]["s"]["$type"]
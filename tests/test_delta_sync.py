@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+import delta_sync
+
+NOW = datetime(2024, 6, 1, 12, 0, 0)
+SAFE = NOW - timedelta(seconds=5)
+RETENTION = timedelta(days=30)
+
+
+def doc(updated_at):
+    return {"_id": ObjectId(), "updated_at": updated_at}
+
+
+def test_token_round_trip():
+    oid = str(ObjectId())
+    cursors = {"respondents": [NOW, oid], "faqs": [SAFE, None], "surveys": None}
+    assert delta_sync.decode_token(delta_sync.encode_token(cursors)) == cursors
+
+
+def test_decode_rejects_garbage():
+    with pytest.raises(delta_sync.SyncTokenError):
+        delta_sync.decode_token("not a token")
+
+
+def test_keyset():
+    assert delta_sync.keyset(None) == {}
+    assert delta_sync.keyset([NOW, None]) == {"updated_at": {"$gt": NOW}}
+    oid = ObjectId()
+    assert delta_sync.keyset([NOW, str(oid)]) == {"$or": [
+        {"updated_at": {"$gt": NOW}},
+        {"updated_at": NOW, "_id": {"$gt": oid}},
+    ]}
+
+
+def test_next_cursor_mid_stream_is_last_document():
+    docs = [doc(NOW - timedelta(days=3)), doc(NOW - timedelta(days=2))]
+    assert delta_sync.next_cursor(docs, None, True, SAFE) == [docs[-1]["updated_at"], str(docs[-1]["_id"])]
+
+
+def test_next_cursor_caught_up_with_old_last_document_advances_to_safe():
+    docs = [doc(NOW - timedelta(days=60))]
+    assert delta_sync.next_cursor(docs, None, False, SAFE) == [SAFE, None]
+
+
+def test_next_cursor_caught_up_with_recent_last_document_stays_behind_safe():
+    docs = [doc(NOW)]
+    assert delta_sync.next_cursor(docs, None, False, SAFE) == [SAFE, None]
+
+
+def test_next_cursor_empty_page_advances_old_cursor():
+    old = [NOW - timedelta(days=45), str(ObjectId())]
+    assert delta_sync.next_cursor([], old, False, SAFE) == [SAFE, None]
+
+
+def test_idle_collection_does_not_force_reset():
+    # faqs last changed 60 days ago; a client syncing regularly must not be reset
+    cursors = {}
+    for day in range(3):
+        now = NOW + timedelta(days=day)
+        assert not delta_sync.needs_reset(cursors, now - RETENTION)
+        faqs_page = [doc(NOW - timedelta(days=60))] if not cursors else []
+        cursors = {"faqs": delta_sync.next_cursor(faqs_page, cursors.get("faqs"), False, now - timedelta(seconds=5))}
+        cursors = delta_sync.decode_token(delta_sync.encode_token(cursors))
+
+
+def test_reset_when_token_older_than_retention():
+    cursors = {"faqs": [NOW - timedelta(days=31), None], "respondents": [NOW, None]}
+    assert delta_sync.needs_reset(cursors, NOW - RETENTION)
+    assert not delta_sync.needs_reset({"faqs": None}, NOW - RETENTION)
@@ -0,0 +1,67 @@
+import asyncio
+import gzip
+import json
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+import export_stream
+
+
+async def rows(docs):
+    for doc in docs:
+        yield dict(doc)
+
+
+def collect(chunks):
+    async def run():
+        return b"".join([chunk async for chunk in chunks])
+    return asyncio.run(run())
+
+
+def test_parse_filter():
+    oid = ObjectId()
+    assert export_stream.parse_filter(None) == {}
+    assert export_stream.parse_filter('{"_id": {"$oid": "%s"}}' % oid) == {"_id": oid}
+    with pytest.raises(export_stream.ExportError):
+        export_stream.parse_filter("[1]")
+    with pytest.raises(export_stream.ExportError):
+        export_stream.parse_filter('{"$or": [{"$where": "1"}]}')
+
+
+def test_flatten_and_csv_values():
+    flat = export_stream.flatten({"a": {"b": 1, "c": {"d": True}}, "e": [1, 2], "f": {}})
+    assert flat == {"a.b": 1, "a.c.d": True, "e": [1, 2], "f": {}}
+    assert export_stream.csv_value(None) == ""
+    assert export_stream.csv_value(False) == "false"
+    assert export_stream.csv_value([1, "x"]) == '[1, "x"]'
+
+
+def test_encode_ndjson_and_json_without_excluded_fields():
+    docs = [{"_id": ObjectId(), "name": "a", "password": "h", "at": datetime(2024, 1, 1)}, {"_id": ObjectId(), "name": "b"}]
+    lines = collect(export_stream.encode(rows(docs), "ndjson", exclude=("password",))).decode().splitlines()
+    assert [json.loads(line)["name"] for line in lines] == ["a", "b"]
+    assert "password" not in lines[0] and '"2024-01-01T00:00:00"' in lines[0]
+    array = json.loads(collect(export_stream.encode(rows(docs), "json", exclude=("password",))))
+    assert [d["name"] for d in array] == ["a", "b"]
+    assert json.loads(collect(export_stream.encode(rows([]), "json"))) == []
+
+
+def test_encode_csv_uses_given_columns():
+    docs = [{"_id": 1, "loc": {"lat": -6.2}}, {"_id": 2, "name": "x"}]
+    columns = asyncio.run(export_stream.csv_columns(rows(docs)))
+    assert columns == ["_id", "loc.lat", "name"]
+    text = collect(export_stream.encode(rows(docs), "csv", columns)).decode()
+    assert text.splitlines() == ["_id,loc.lat,name", "1,-6.2,", "2,,x"]
+
+
+def test_gzip_round_trip():
+    docs = [{"_id": i, "v": "x" * 100} for i in range(2000)]
+    raw = collect(export_stream.encode(rows(docs), "ndjson"))
+    assert gzip.decompress(collect(export_stream.gzip_chunks(export_stream.encode(rows(docs), "ndjson")))) == raw
+
+
+def test_unknown_format():
+    with pytest.raises(export_stream.ExportError):
+        collect(export_stream.encode(rows([]), "xml"))
@@ -0,0 +1,30 @@
+import faq_retrieval
+
+FAQS = [
+    {"id": "1", "question": "Bagaimana cara sinkronisasi data offline?", "answer": "Buka menu Sinkronisasi lalu tekan Kirim."},
+    {"id": "2", "question": "GPS tidak akurat di dalam rumah", "answer": "Pindah ke area terbuka dan tunggu sinyal GPS stabil."},
+    {"id": "3", "question": "Lupa password akun", "answer": "Hubungi supervisor untuk reset password."},
+]
+
+
+def retriever():
+    r = faq_retrieval.FAQRetriever()
+    r.rebuild(FAQS)
+    return r
+
+
+def test_matches_rephrased_question():
+    faq, confidence = retriever().match("cara sinkronisasi data offline gimana ya?")
+    assert faq["id"] == "1"
+    assert 0.7 <= confidence <= 1.0
+
+
+def test_off_topic_question_falls_through():
+    r = retriever()
+    assert r.match("Siapa presiden pertama Indonesia?") is None
+    assert r.match("") is None
+    assert r.stats()["faq_count"] == 3
+
+
+def test_empty_index():
+    assert faq_retrieval.FAQRetriever().match("lupa password") is None
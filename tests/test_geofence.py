@@ -0,0 +1,63 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import geofence
+import main
+import spatial_index
+
+AREA = spatial_index.PolygonIndex([{"code": 3201, "geometry": {"type": "Polygon", "coordinates": [
+    [[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]]
+]}}])
+INSIDE = {"latitude": 0.5, "longitude": 0.5}
+OUTSIDE = {"latitude": 5, "longitude": 5}
+
+
+def test_exit_needs_consecutive_fixes_outside():
+    engine = geofence.GeofenceEngine(confirm_points=2)
+    assert engine.process("u", "w", AREA, [INSIDE, OUTSIDE, INSIDE, OUTSIDE]) == []
+    events = engine.process("u", "w", AREA, [OUTSIDE])
+    assert [(e["event"], e["region_code"]) for e in events] == [("exit", "3201")]
+
+
+def test_enter_after_exit():
+    engine = geofence.GeofenceEngine(confirm_points=1)
+    events = engine.process("u", "w", AREA, [OUTSIDE, INSIDE])
+    assert [e["event"] for e in events] == ["exit", "enter"]
+    assert events[1]["region_code"] == "3201"
+
+
+def test_changing_area_resets_state():
+    engine = geofence.GeofenceEngine(confirm_points=1)
+    engine.process("u", "w", AREA, [OUTSIDE])
+    assert [e["event"] for e in engine.process("u", "other", AREA, [OUTSIDE])] == ["exit"]
+
+
+def test_location_batch_mixing_utc_offsets_and_naive_times(app_db, monkeypatch):
+    async def area(user_id):
+        return {"wilkerstat_id": "w", "survey_id": "s"}
+
+    async def index(wilkerstat_id):
+        return AREA
+
+    async def nobody(user_ids):
+        return []
+
+    monkeypatch.setattr(main, "get_geofence_area", area)
+    monkeypatch.setattr(main.spatial_indexes, "get", index)
+    monkeypatch.setattr(main.audience, "supervisors_and_admins", nobody)
+    monkeypatch.setattr(main, "geofence_engine", geofence.GeofenceEngine(confirm_points=1))
+
+    wib = timezone(timedelta(hours=7))
+    batch = main.LocationTrackingBatch(locations=[
+        {"user_id": "u", **INSIDE, "timestamp": datetime(2024, 1, 1, 10, 0)},
+        {"user_id": "u", **OUTSIDE, "timestamp": datetime(2024, 1, 1, 16, 30, tzinfo=wib)},
+        {"user_id": "u", **INSIDE, "timestamp": datetime(2024, 1, 1, 9, 0)},
+    ])
+    asyncio.run(main.create_locations_batch(batch, {"id": "u", "role": main.UserRole.ENUMERATOR}))
+
+    stored = sorted(loc["timestamp"] for loc in app_db.sync.locations.find())
+    assert stored == [datetime(2024, 1, 1, 9, 0), datetime(2024, 1, 1, 9, 30), datetime(2024, 1, 1, 10, 0)]
+    events = list(app_db.sync.geofence_events.find().sort("timestamp", 1))
+    assert [(e["event"], e["timestamp"]) for e in events] == [
+        ("exit", datetime(2024, 1, 1, 9, 30)), ("enter", datetime(2024, 1, 1, 10, 0)),
+    ]
@@ -0,0 +1,64 @@
+import asyncio
+import io
+import json
+
+import pytest
+
+import geojson_stream
+
+
+class Stream:
+    """Async read() over bytes, like UploadFile"""
+
+    def __init__(self, data):
+        self.buffer = io.BytesIO(data)
+
+    async def read(self, size):
+        return self.buffer.read(size)
+
+
+def read_all(data, chunk_size=7):
+    async def run():
+        reader = geojson_stream.FeatureCollectionReader(Stream(data), chunk_size=chunk_size)
+        features = [feature async for feature, _, _ in reader.features()]
+        return reader, features
+    return asyncio.run(run())
+
+
+def collection(n):
+    return {
+        "type": "FeatureCollection",
+        "name": "wilkerstat",
+        "features": [
+            {"type": "Feature", "properties": {"kode": i},
+             "geometry": {"type": "Polygon", "coordinates": [[[i, 0], [i + 1, 0], [i + 1, 1], [i, 0]]]}}
+            for i in range(n)
+        ],
+    }
+
+
+def test_features_stream_across_small_chunks():
+    reader, features = read_all(json.dumps(collection(20)).encode())
+    assert [f["properties"]["kode"] for f in features] == list(range(20))
+    assert reader.feature_count == 20
+    assert reader.vertex_count == 80
+    assert reader.bbox == [0, 0, 20, 1]
+    assert reader.header["name"] == "wilkerstat"
+
+
+def test_multibyte_text_split_between_chunks():
+    data = collection(1)
+    data["features"][0]["properties"]["nama"] = "Kelurahan Cempaka Putih Timur – ✓"
+    _, features = read_all(json.dumps(data, ensure_ascii=False).encode(), chunk_size=3)
+    assert features[0]["properties"]["nama"].endswith("✓")
+
+
+@pytest.mark.parametrize("data", [
+    b'{"type": "FeatureCollection", "features": [{"type": "Point"}]}',
+    b'{"type": "FeatureCollection", "features": [{"type": "Feature", "geometry": {"type": "Polygon", "coordinates": [[["a", 0]]]}}]}',
+    b'{"type": "FeatureCollection", "features": [',
+    b'[]',
+])
+def test_invalid_content(data):
+    with pytest.raises(geojson_stream.GeoJSONStreamError):
+        read_all(data)
@@ -0,0 +1,172 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+import main
+from jobs import JobCancelled, JobRunner, JobStatus
+
+pytest.importorskip("mongomock")
+from mongo import Database  # noqa: E402
+
+
+async def silent(user_id, data):
+    pass
+
+
+def runner(db, **kwargs):
+    return JobRunner(db.jobs, silent, workers=1, **kwargs)
+
+
+async def wait_for(db, job_id, statuses):
+    for _ in range(200):
+        job = await db.jobs.find_one({"_id": ObjectId(job_id)})
+        if job["status"] in statuses:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job stayed {job['status']}")
+
+
+def test_cancel_while_queued_finishes_and_drops_upload(tmp_path):
+    upload = tmp_path / "upload.csv"
+    upload.write_text("a,b\n")
+
+    async def scenario():
+        db = Database()
+        jobs = runner(db)
+        jobs.register("import", lambda ctx: None)
+        job_id = await jobs.submit("import", "user-1", {"path": str(upload)})
+        assert await jobs.cancel(job_id)
+        assert not await jobs.cancel(job_id)
+        return await db.jobs.find_one({})
+
+    job = asyncio.run(scenario())
+    assert job["status"] == JobStatus.CANCELLED
+    assert "started_at" not in job
+    assert not upload.exists()
+
+
+def test_cancel_stops_running_job_at_next_checkpoint():
+    async def scenario():
+        db = Database()
+        jobs = runner(db)
+        reached = asyncio.Event()
+        go_on = asyncio.Event()
+
+        async def handler(ctx):
+            await ctx.report(checkpoint={"batch": 1})
+            reached.set()
+            await go_on.wait()
+            ctx.progress["written"] = 2
+            await ctx.report(checkpoint={"batch": 2})
+            ctx.progress["written"] = 3  # never reached
+
+        jobs.register("slow", handler)
+        await jobs.start()
+        job_id = await jobs.submit("slow", "user-1")
+        await reached.wait()
+        assert await jobs.cancel(job_id)
+        go_on.set()
+        job = await wait_for(db, job_id, JobStatus.FINISHED)
+        await jobs.stop()
+        return job
+
+    job = asyncio.run(scenario())
+    assert job["status"] == JobStatus.CANCELLED
+    assert job["checkpoint"] == {"batch": 2}
+    assert job["progress"] == {"written": 2}
+
+
+def test_stop_leaves_job_running_and_start_resumes_from_checkpoint():
+    seen = []
+
+    async def scenario():
+        db = Database()
+        reached = asyncio.Event()
+
+        async def first_run(ctx):
+            await ctx.report(checkpoint={"line": 50})
+            reached.set()
+            await asyncio.Event().wait()  # interrupted by stop()
+
+        async def second_run(ctx):
+            seen.append((ctx.resumed, ctx.checkpoint))
+            return {"lines": 100}
+
+        jobs = runner(db)
+        jobs.register("import", first_run)
+        await jobs.start()
+        job_id = await jobs.submit("import", "user-1")
+        await reached.wait()
+        await jobs.stop()
+        interrupted = await db.jobs.find_one({})
+
+        restarted = runner(db)
+        restarted.register("import", second_run)
+        await restarted.start()
+        job = await wait_for(db, job_id, JobStatus.FINISHED)
+        await restarted.stop()
+        return interrupted, job
+
+    interrupted, job = asyncio.run(scenario())
+    assert interrupted["status"] == JobStatus.RUNNING
+    assert seen == [(True, {"line": 50})]
+    assert job["status"] == JobStatus.COMPLETED
+    assert job["resumed_count"] == 1
+    assert job["result"] == {"lines": 100}
+
+
+def test_purge_expired_removes_old_jobs_and_unused_files(tmp_path):
+    now = datetime.utcnow()
+    old = time.time() - 3 * 86400
+    for name in ("expired.csv", "orphan.csv", "recent.csv", "upload.csv"):
+        (tmp_path / name).write_text("x")
+        os.utime(tmp_path / name, (old, old))
+
+    async def scenario():
+        db = Database()
+        db.sync.jobs.insert_many([
+            {"status": JobStatus.COMPLETED, "finished_at": now - timedelta(days=2), "result": {"file": "expired.csv"}},
+            {"status": JobStatus.FAILED, "finished_at": now - timedelta(days=2)},
+            # Finished within retention; its long-running export is older than the cutoff
+            {"status": JobStatus.COMPLETED, "finished_at": now - timedelta(hours=1), "result": {"file": "recent.csv"}},
+            {"status": JobStatus.QUEUED, "params": {"path": str(tmp_path / "upload.csv")}},
+        ])
+        jobs = runner(db, files_dir=str(tmp_path), retention=timedelta(days=1))
+        purged = await jobs.purge_expired()
+        return purged, db.sync.jobs.count_documents({})
+
+    purged, remaining = asyncio.run(scenario())
+    assert purged == {"jobs": 2, "files": 2}
+    assert remaining == 2
+    assert sorted(os.listdir(tmp_path)) == ["recent.csv", "upload.csv"]
+
+
+def test_bulk_user_upload_reports_each_write_batch_and_stops_when_cancelled(app_db, monkeypatch):
+    monkeypatch.setattr(main, "JOB_BATCH_SIZE", 2)
+    monkeypatch.setattr(main, "get_password_hash", lambda password: "hash")
+
+    class Context:
+        def __init__(self):
+            self.progress = {}
+            self.reports = []
+
+        async def report(self, checkpoint=None):
+            self.reports.append(dict(self.progress))
+            if len(self.reports) == 2:
+                raise JobCancelled()
+
+    users = [
+        main.BulkUserData(location="x", supervisor_email="sup@x.id", enumerator_email=f"enum{i}@x.id")
+        for i in range(5)
+    ]
+    ctx = Context()
+    with pytest.raises(JobCancelled):
+        asyncio.run(main.process_bulk_users(ObjectId(), users, ctx))
+
+    # 6 inserts (1 supervisor + 5 enumerators) in batches of 2: cancelled after the second
+    assert ctx.reports == [{"written": 2, "total": 6}, {"written": 4, "total": 6}]
+    assert app_db.sync.users.count_documents({}) == 4
@@ -0,0 +1,51 @@
+import asyncio
+
+import main
+from main import MessageBatch, MessageBatchItem, MessageType, UserRole
+
+ENUMERATOR = {"id": "enum-1", "role": UserRole.ENUMERATOR, "supervisor_id": "sup-1"}
+
+
+def batch(*client_ids):
+    return MessageBatch(messages=[
+        MessageBatchItem(client_id=client_id, message_type=MessageType.SUPERVISOR, content=f"pesan {client_id}")
+        for client_id in client_ids
+    ])
+
+
+def test_batch_keeps_queue_order_at_bson_resolution(app_db):
+    result = asyncio.run(main.create_messages_batch(batch("a", "b", "c", "d"), ENUMERATOR))
+
+    assert result["created"] == 4
+    stored = list(app_db.sync.messages.find().sort([("timestamp", 1), ("_id", 1)]))
+    assert [m["client_id"] for m in stored] == ["a", "b", "c", "d"]
+    timestamps = [m["timestamp"] for m in stored]
+    assert len(set(timestamps)) == 4
+    assert all(t.microsecond % 1000 == 0 for t in timestamps)
+    # Response carries exactly what was stored
+    assert [m["timestamp"] for m in result["messages"]] == timestamps
+
+
+def test_batch_dedupes_client_ids_within_and_across_requests(app_db):
+    first = asyncio.run(main.create_messages_batch(batch("a", "b", "a"), ENUMERATOR))
+    assert (first["created"], first["duplicates"]) == (2, 1)
+
+    retry = asyncio.run(main.create_messages_batch(batch("a", "b", "c"), ENUMERATOR))
+    assert (retry["created"], retry["duplicates"]) == (1, 2)
+    assert retry["accepted"]["a"] == first["accepted"]["a"]
+    assert app_db.sync.messages.count_documents({}) == 3
+
+    conversation = app_db.sync.conversations.find_one()
+    assert sorted(conversation["participants"]) == ["enum-1", "sup-1"]
+    assert conversation["unread_count"]["sup-1"] == 3
+
+
+def test_batch_reports_invalid_items_without_storing_them(app_db):
+    items = batch("a", "b").messages + [
+        MessageBatchItem(client_id="", message_type=MessageType.SUPERVISOR, content="x"),
+        MessageBatchItem(client_id="e", message_type=MessageType.SUPERVISOR, content="  "),
+    ]
+    result = asyncio.run(main.create_messages_batch(MessageBatch(messages=items), ENUMERATOR))
+
+    assert result["created"] == 2
+    assert [e["index"] for e in result["errors"]] == [2, 3]
@@ -0,0 +1,49 @@
+import asyncio
+
+import main
+from main import ConversationRead, MessageBatch, MessageBatchItem, MessageType, UserRole
+
+ENUMERATOR = {"id": "enum-1", "role": UserRole.ENUMERATOR, "supervisor_id": "sup-1"}
+SUPERVISOR = {"id": "sup-1", "role": UserRole.SUPERVISOR}
+
+
+def send(*client_ids):
+    batch = MessageBatch(messages=[
+        MessageBatchItem(client_id=c, message_type=MessageType.SUPERVISOR, content=c) for c in client_ids
+    ])
+    return asyncio.run(main.create_messages_batch(batch, ENUMERATOR))["accepted"]
+
+
+def unread(user):
+    return asyncio.run(main.get_my_conversations(user))["total_unread"]
+
+
+def test_watermark_counts_unread_after_it_and_never_moves_back(app_db):
+    ids = send("a", "b", "c", "d")
+    conversation_id = app_db.sync.conversations.find_one()["_id"]
+    assert unread(SUPERVISOR) == 4
+
+    read = asyncio.run(main.mark_conversation_read(
+        str(conversation_id), ConversationRead(up_to_message_id=ids["c"]), SUPERVISOR
+    ))
+    assert read["unread_count"] == 1
+
+    # An older message does not move the watermark back
+    asyncio.run(main.mark_message_read(ids["a"], SUPERVISOR))
+    assert unread(SUPERVISOR) == 1
+
+    app_db.sync.messages.update_one({"client_id": "d"}, {"$set": {"is_deleted": True}})
+    asyncio.run(main.mark_message_read(ids["b"], SUPERVISOR))
+    assert unread(SUPERVISOR) == 0
+    # The sender's own messages never count as unread for them
+    assert unread(ENUMERATOR) == 0
+
+
+def test_read_all_without_a_bound(app_db):
+    send("a", "b")
+    conversation_id = str(app_db.sync.conversations.find_one()["_id"])
+
+    read = asyncio.run(main.mark_conversation_read(conversation_id, None, SUPERVISOR))
+
+    assert read["unread_count"] == 0
+    assert unread(SUPERVISOR) == 0
@@ -0,0 +1,56 @@
+import pytest
+
+import respondent_import
+from respondent_import import ImportFormatError, iter_rows, normalize_row
+
+ROW = {"name": " Budi ", "phone": 81234567890.0, "address": "Jl. Merdeka 1", "latitude": "-6,2", "longitude": 106.8}
+
+
+def test_normalize_row_cleans_text_numbers_and_decimal_commas():
+    row = normalize_row({**ROW, "region_code": 3201.0})
+    assert row == {
+        "name": "Budi",
+        "phone": "81234567890",
+        "address": "Jl. Merdeka 1",
+        "location": {"latitude": -6.2, "longitude": 106.8},
+        "enumerator_id": None,
+        "enumerator_email": None,
+        "region_code": "3201",
+    }
+
+
+@pytest.mark.parametrize("change, message", [
+    ({"name": "  "}, "name is required"),
+    ({"phone": None}, "phone is required"),
+    ({"latitude": "abc"}, "latitude must be a number"),
+    ({"longitude": 181}, "longitude out of range"),
+    ({"latitude": None}, "latitude must be a number"),
+])
+def test_normalize_row_rejects_bad_rows(change, message):
+    with pytest.raises(ValueError, match=message):
+        normalize_row({**ROW, **change})
+
+
+def test_csv_rows_use_header_aliases_semicolons_and_spreadsheet_lines(tmp_path):
+    path = tmp_path / "responden.csv"
+    path.write_text(
+        "Nama;Telepon;Alamat;Lat;Lng;Email_Enumerator\n"
+        "Budi;0812;Jl. A;-6,2;106,8;e@x.id\n"
+        ";;;;;\n"
+        "Sari;0813;Jl. B;-6,3;106,9;\n",
+        encoding="utf-8-sig",
+    )
+    rows = list(iter_rows(str(path), "csv"))
+
+    assert [line for line, _ in rows] == [2, 4]
+    assert rows[0][1]["enumerator_email"] == "e@x.id"
+    assert normalize_row(rows[1][1])["location"] == {"latitude": -6.3, "longitude": 106.9}
+
+
+def test_missing_required_columns_and_unknown_types_fail_the_whole_file(tmp_path):
+    path = tmp_path / "responden.csv"
+    path.write_text("nama,alamat\nBudi,Jl. A\n")
+    with pytest.raises(ImportFormatError, match="phone, latitude, longitude"):
+        list(iter_rows(str(path), "csv"))
+    with pytest.raises(ImportFormatError):
+        respondent_import.detect_format("responden.xls")
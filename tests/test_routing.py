@@ -0,0 +1,42 @@
+import random
+
+import numpy as np
+
+import routing
+
+
+def stops(n, seed=1):
+    rng = random.Random(seed)
+    return [{"latitude": rng.uniform(-7, -6), "longitude": rng.uniform(106, 107)} for _ in range(n)]
+
+
+def test_haversine_matrix_is_symmetric_with_zero_diagonal():
+    points = stops(20)
+    dist = routing.haversine_matrix([p["latitude"] for p in points], [p["longitude"] for p in points])
+    assert np.allclose(dist, dist.T)
+    assert np.allclose(np.diag(dist), 0)
+
+
+def test_plan_visits_every_stop_once():
+    points = stops(50)
+    plan = routing.plan_route((-6.5, 106.5), points)
+    assert sorted(plan["order"]) == list(range(50))
+    assert plan["skipped"] == 0
+    assert abs(sum(plan["legs_km"]) - plan["total_distance_km"]) < 1e-9
+
+
+def test_route_is_capped_to_nearest_stops():
+    points = stops(1000)
+    start = (-6.5, 106.5)
+    plan = routing.plan_route(start, points, max_stops=100)
+    assert len(plan["order"]) == 100
+    assert plan["skipped"] == 900
+
+    dist = routing.haversine_from(start[0], start[1], [p["latitude"] for p in points], [p["longitude"] for p in points])
+    chosen = dist[plan["order"]]
+    left_out = np.delete(dist, plan["order"])
+    assert chosen.max() <= left_out.min()
+
+
+def test_empty_route():
+    assert routing.plan_route(None, []) == {"order": [], "legs_km": [], "total_distance_km": 0.0, "skipped": 0}
@@ -0,0 +1,37 @@
+import asyncio
+
+import search_index
+
+
+def search(index, kind, q, owners=None, limit=10):
+    return [doc_id for doc_id, _ in asyncio.run(index.search(kind, q, owners, limit))]
+
+
+def respondent(i, name, owner, phone=""):
+    return {"_id": i, "name": name, "address": "", "phone": phone, "enumerator_id": owner}
+
+
+def test_all_terms_must_match_and_owners_scope():
+    index = search_index.InvertedIndexSearch()
+    index.upsert("respondents", respondent(1, "Budi Santoso", "u1"))
+    index.upsert("respondents", respondent(2, "Budi Hartono", "u2"))
+    index.upsert("respondents", respondent(3, "Siti Santoso", "u1"))
+    assert sorted(search(index, "respondents", "budi")) == ["1", "2"]
+    assert search(index, "respondents", "budi santoso") == ["1"]
+    assert search(index, "respondents", "budi", {"u2"}) == ["2"]
+
+
+def test_upsert_replaces_and_remove_drops():
+    index = search_index.InvertedIndexSearch()
+    index.upsert("respondents", respondent(1, "Budi", "u1"))
+    index.upsert("respondents", respondent(1, "Agus", "u1"))
+    assert search(index, "respondents", "budi") == []
+    assert search(index, "respondents", "agus") == ["1"]
+    index.remove("respondents", [1])
+    assert search(index, "respondents", "agus") == []
+
+
+def test_phone_numbers_are_searchable():
+    index = search_index.InvertedIndexSearch()
+    index.upsert("respondents", respondent(1, "Budi", "u1", phone="081234567890"))
+    assert search(index, "respondents", "081234567890") == ["1"]
@@ -0,0 +1,49 @@
+import random
+
+import spatial_index
+
+
+def square(x0, y0, size, code):
+    ring = [[x0, y0], [x0 + size, y0], [x0 + size, y0 + size], [x0, y0 + size], [x0, y0]]
+    return {"code": code, "geometry": {"type": "Polygon", "coordinates": [ring]}}
+
+
+def grid(n):
+    return [square(i, j, 1, f"{i:02d}{j:02d}") for i in range(n) for j in range(n)]
+
+
+def test_resolve_grid_cells():
+    index = spatial_index.PolygonIndex(grid(10), node_capacity=4)
+    assert len(index) == 100
+    assert index.resolve_one(3.5, 7.5) == "0307"
+    assert index.resolve_one(-0.5, 0.5) is None
+    assert index.resolve([0.5, 9.5, 20], [0.5, 9.5, 20]) == ["0000", "0909", None]
+
+
+def test_hole_is_outside():
+    outer = [[0, 0], [10, 0], [10, 10], [0, 10], [0, 0]]
+    hole = [[4, 4], [6, 4], [6, 6], [4, 6], [4, 4]]
+    index = spatial_index.PolygonIndex([{"code": "A", "geometry": {"type": "Polygon", "coordinates": [outer, hole]}}])
+    assert index.resolve_one(2, 2) == "A"
+    assert index.resolve_one(5, 5) is None
+
+
+def test_multipolygon_and_features_without_geometry():
+    features = [
+        {"code": "X", "geometry": None},
+        {"code": "M", "geometry": {"type": "MultiPolygon", "coordinates": [
+            square(0, 0, 1, None)["geometry"]["coordinates"],
+            square(5, 5, 1, None)["geometry"]["coordinates"],
+        ]}},
+    ]
+    index = spatial_index.PolygonIndex(features)
+    assert len(index) == 1
+    assert index.resolve([0.5, 5.5, 3], [0.5, 5.5, 3]) == ["M", "M", None]
+
+
+def test_batch_matches_single_lookups():
+    index = spatial_index.PolygonIndex(grid(6), node_capacity=2)
+    rng = random.Random(7)
+    lons = [rng.uniform(-1, 7) for _ in range(500)]
+    lats = [rng.uniform(-1, 7) for _ in range(500)]
+    assert index.resolve(lons, lats) == [index.resolve_one(x, y) for x, y in zip(lons, lats)]
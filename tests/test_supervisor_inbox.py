@@ -0,0 +1,51 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import main
+from main import MessageBatch, MessageBatchItem, MessageType, UserRole
+
+SUPERVISOR = {"id": "sup-1", "role": UserRole.SUPERVISOR}
+
+
+def add_enumerator(db, name, supervisor_id="sup-1"):
+    return str(db.sync.users.insert_one({
+        "username": name, "role": UserRole.ENUMERATOR, "supervisor_id": supervisor_id, "password": "hash",
+    }).inserted_id)
+
+
+def send(enumerator_id, *contents, supervisor_id="sup-1"):
+    user = {"id": enumerator_id, "role": UserRole.ENUMERATOR, "supervisor_id": supervisor_id}
+    batch = MessageBatch(messages=[
+        MessageBatchItem(client_id=f"{enumerator_id}-{c}", message_type=MessageType.SUPERVISOR, content=c)
+        for c in contents
+    ])
+    asyncio.run(main.create_messages_batch(batch, user))
+
+
+def test_inbox_summarises_each_enumerator_in_one_pass(app_db):
+    budi = add_enumerator(app_db, "budi")
+    sari = add_enumerator(app_db, "sari")
+    quiet = add_enumerator(app_db, "quiet")
+    elsewhere = add_enumerator(app_db, "elsewhere", supervisor_id="sup-2")
+
+    send(budi, "satu", "dua", "tiga")
+    app_db.sync.messages.update_one({"content": "satu"}, {"$set": {"answered": True}})
+    send(sari, "halo")
+    send(elsewhere, "bukan untuk sup-1", supervisor_id="sup-2")
+    # Sari's conversation is the most recent one
+    app_db.sync.messages.update_one({"content": "halo"}, {"$set": {"timestamp": datetime.utcnow() + timedelta(hours=1)}})
+
+    inbox = asyncio.run(main.get_supervisor_conversations(SUPERVISOR))
+
+    assert [c["enumerator"]["username"] for c in inbox] == ["sari", "budi", "quiet"]
+    sari_row, budi_row, quiet_row = inbox
+    assert "password" not in budi_row["enumerator"]
+    assert budi_row["latest_message"]["content"] == "tiga"
+    assert (budi_row["unanswered_count"], budi_row["unread_count"]) == (2, 3)
+    assert (sari_row["unanswered_count"], sari_row["unread_count"]) == (1, 1)
+    assert budi_row["conversation_id"] != sari_row["conversation_id"]
+    assert quiet_row == {
+        "enumerator": quiet_row["enumerator"], "latest_message": None, "conversation_id": None,
+        "unread_count": 0, "unanswered_count": 0,
+    }
+    assert quiet_row["enumerator"]["id"] == quiet
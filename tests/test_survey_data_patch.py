@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+import main
+from main import RespondentUpdate, SurveyDataPatch, survey_data_patch_ops
+
+ADMIN = {"id": "admin-1", "role": main.UserRole.ADMIN}
+
+
+def test_patch_becomes_dotted_set_and_unset():
+    ops = survey_data_patch_ops(SurveyDataPatch(set={"q1": 3, "blok1.q3": "ya"}, unset=["q9"]))
+    assert ops == {
+        "$set": {"survey_data.q1": 3, "survey_data.blok1.q3": "ya"},
+        "$unset": {"survey_data.q9": ""},
+    }
+    assert survey_data_patch_ops(SurveyDataPatch()) == {}
+
+
+@pytest.mark.parametrize("patch, detail", [
+    ({"set": {"$where": 1}}, "Invalid survey_data key"),
+    ({"set": {"blok1..q3": 1}}, "Invalid survey_data key"),
+    ({"unset": ["a.$x"]}, "Invalid survey_data key"),
+    ({"set": {"blok1": {}}, "unset": ["blok1.q3"]}, "Conflicting survey_data keys"),
+    ({"set": {"q1": 1}, "unset": ["q1"]}, "Conflicting survey_data keys"),
+])
+def test_patch_rejects_operator_and_overlapping_keys(patch, detail):
+    with pytest.raises(HTTPException) as e:
+        survey_data_patch_ops(SurveyDataPatch(**patch))
+    assert e.value.status_code == 400
+    assert detail in e.value.detail
+
+
+def test_patch_keeps_answers_it_does_not_mention(app_db):
+    respondent_id = str(app_db.sync.respondents.insert_one({
+        "name": "Budi", "enumerator_id": "enum-1", "survey_data": {"q1": 1, "q2": 2, "q3": 3},
+    }).inserted_id)
+    update = RespondentUpdate(survey_data_patch={"set": {"q2": 20, "q4": 4}, "unset": ["q3"]})
+
+    asyncio.run(main.update_respondent(respondent_id, update, ADMIN))
+
+    assert app_db.sync.respondents.find_one()["survey_data"] == {"q1": 1, "q2": 20, "q4": 4}
+
+
+def test_patch_and_full_survey_data_together_are_rejected(app_db):
+    update = RespondentUpdate(survey_data={"q1": 1}, survey_data_patch={"set": {"q2": 2}})
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(main.update_respondent(str(ObjectId()), update, ADMIN))
+    assert e.value.status_code == 400
@@ -0,0 +1,29 @@
+from datetime import datetime
+
+from bson.decimal128 import Decimal128
+
+import survey_parquet
+
+
+def test_type_for():
+    assert survey_parquet.type_for({"int", "null"}) == "int64"
+    assert survey_parquet.type_for({"int", "double"}) == "float64"
+    assert survey_parquet.type_for({"date", "missing"}) == "timestamp"
+    assert survey_parquet.type_for({"date", "string"}) == "string"
+    assert survey_parquet.type_for({"bool"}) == "bool"
+    assert survey_parquet.type_for({"null"}) == "string"
+
+
+def test_values_that_do_not_fit_become_null():
+    assert survey_parquet._converter("float64")(Decimal128("1.5")) == 1.5
+    assert survey_parquet._converter("float64")("n/a") is None
+    assert survey_parquet._converter("int64")(True) is None
+    assert survey_parquet._converter("timestamp")("2024-01-01") is None
+    assert survey_parquet._converter("bool")(1) is None
+    assert survey_parquet._converter("string")(datetime(2024, 1, 1)) == "2024-01-01T00:00:00"
+    assert survey_parquet._converter("string")([1, "a"]) == '[1, "a"]'
+
+
+def test_partition_dir():
+    assert survey_parquet.partition_dir("out", "s/1", "3201").split("/")[1:] == ["survey_id=s%2F1", "region_code=3201"]
+    assert survey_parquet.partition_dir("out", "s", None).endswith("region_code=" + survey_parquet.NULL_PARTITION)
@@ -0,0 +1,23 @@
+import text_normalize
+
+
+def test_canonicalize_folds_case_punctuation_and_stopwords():
+    assert text_normalize.canonicalize("  Bagaimana cara UPLOAD foto?? ") == "cara upload foto"
+    assert text_normalize.canonicalize("") == ""
+    assert text_normalize.canonicalize(None) == ""
+
+
+def test_negations_and_modals_are_kept():
+    assert text_normalize.canonicalize("Apakah saya boleh mengisi offline?") == "boleh mengisi offline"
+    assert text_normalize.canonicalize("Apakah saya tidak boleh mengisi offline?") == "tidak boleh mengisi offline"
+    assert text_normalize.canonicalize("Data sudah bisa dikirim") != text_normalize.canonicalize("Data belum bisa dikirim")
+    assert not (text_normalize.NEGATIONS | text_normalize.MODALS) & text_normalize.STOPWORDS
+
+
+def test_contractions_stay_one_token():
+    assert text_normalize.tokenize("I can't upload") == ["cant", "upload"]
+    assert text_normalize.tokenize("I can’t upload") == ["cant", "upload"]
+
+
+def test_tokenize_can_keep_stopwords():
+    assert text_normalize.tokenize("Di mana lokasi", drop_stopwords=False) == ["di", "mana", "lokasi"]
@@ -0,0 +1,57 @@
+import asyncio
+from datetime import timedelta
+
+from bson import ObjectId
+
+import main
+from main import UserProfileCache
+
+
+def add_user(db, name):
+    return str(db.sync.users.insert_one({"username": name, "password": "hash", "role": "enumerator"}).inserted_id)
+
+
+def test_profiles_are_cached_and_returned_as_copies(app_db):
+    budi, sari = add_user(app_db, "budi"), add_user(app_db, "sari")
+    cache = UserProfileCache(max_size=10)
+
+    first = asyncio.run(cache.get_many([budi, sari, budi, None, "not-an-id"]))
+    assert {p["username"] for p in first.values()} == {"budi", "sari"}
+    assert "password" not in first[budi]
+    first[budi]["username"] = "changed"
+
+    # Served from the cache: the database is not read again
+    app_db.sync.users.delete_many({})
+    second = asyncio.run(cache.get_many([budi]))
+    assert second[budi]["username"] == "budi"
+
+
+def test_invalidated_expired_and_evicted_profiles_are_reloaded(app_db):
+    budi, sari = add_user(app_db, "budi"), add_user(app_db, "sari")
+    cache = UserProfileCache(max_size=1)
+    asyncio.run(cache.get_many([budi, sari]))
+    assert len(cache._profiles) == 1
+
+    app_db.sync.users.update_one({"username": "budi"}, {"$set": {"username": "budi2"}})
+    cache.invalidate(budi)
+    assert asyncio.run(cache.get_many([budi]))[budi]["username"] == "budi2"
+
+    expired = UserProfileCache(ttl=timedelta(0))
+    asyncio.run(expired.get_many([sari]))
+    app_db.sync.users.update_one({"username": "sari"}, {"$set": {"username": "sari2"}})
+    assert asyncio.run(expired.get_many([sari]))[sari]["username"] == "sari2"
+
+
+def test_enrich_messages_attaches_sender_and_optional_receiver(app_db):
+    budi, sari = add_user(app_db, "budi"), add_user(app_db, "sari")
+    messages = [
+        {"_id": ObjectId(), "sender_id": budi, "receiver_id": sari, "content": "halo"},
+        {"_id": ObjectId(), "sender_id": sari, "receiver_id": None, "content": "ai"},
+    ]
+
+    enriched = asyncio.run(main.enrich_messages(messages))
+
+    assert [(m["sender"]["username"], (m.get("receiver") or {}).get("username")) for m in enriched] == [
+        ("budi", "sari"), ("sari", None),
+    ]
+    assert "receiver" not in enriched[1]